@@ -1,5 +1,7 @@
 import numpy as np
 
+from sampling_distributions import simulate_sampling, simulate_standard_error_curve
+
 '''
 1) Sampling the Population: 
     you first take samples from the population. For instance, from a population of 1,000,000, 
@@ -24,29 +26,22 @@ SE= s/√n
 
 This process estimates how much variability you can expect in the sample means compared to the true population mean.'''
 
-# Function to simulate sampling and calculate standard error
-def simulate_sampling(population_mean, population_std, sample_size, num_samples):
-    # Generate random samples
-    samples = np.random.normal(population_mean, population_std, (num_samples, sample_size))
-    
-    # Calculate sample means
-    sample_means = np.mean(samples, axis=1)
-    
-    # Calculate standard deviation of the sample means
-    sample_means_std = np.std(sample_means)
-    
-    # Calculate standard error
-    standard_error = sample_means_std / np.sqrt(sample_size)
-    
-    return sample_means, standard_error
-
-# Parameters
-population_mean = 175  # Population mean (e.g., average height in cm)
-population_std = 10   # Estimated population standard deviation
-sample_size = 10      # Number of individuals in each sample
-num_samples = 5       # Number of samples
-
-# Simulate sampling and calculate standard error
-sample_means, standard_error = simulate_sampling(population_mean, population_std, sample_size, num_samples)
-
-sample_means, standard_error
\ No newline at end of file
+if __name__ == '__main__':
+    # Parameters
+    population_mean = 175  # Population mean (e.g., average height in cm)
+    population_std = 10   # Estimated population standard deviation
+    sample_size = 10      # Number of individuals in each sample
+    num_samples = 5       # Number of samples
+
+    # Simulate sampling and calculate standard error
+    sample_means, standard_error = simulate_sampling(population_mean, population_std, sample_size, num_samples)
+
+    sample_means, standard_error
+
+    # Sweep sample sizes and population standard deviations in one call
+    sample_sizes = np.array([10, 30, 100, 300, 1000])
+    population_stds = np.array([5, 10, 20])
+    sample_means_std, standard_errors = simulate_standard_error_curve(
+        population_mean, population_stds[None, :], sample_sizes[:, None], num_samples=10000)
+
+    sample_means_std, standard_errors
@@ -31,36 +31,26 @@ NOTE: Computationally intensive, but can be done in parallel.
 
 import numpy as np
 
-# Function to perform bootstrap resampling and store both samples and their means
-def bootstrap_resample_and_store_samples(original_sample, num_bootstrap_samples, sample_size):
-    # Arrays to store the bootstrap samples and their means
-    bootstrap_samples = np.zeros((num_bootstrap_samples, sample_size))
-    bootstrap_sample_means = np.zeros(num_bootstrap_samples)
+from sampling_distributions import bootstrap_resample_and_store_samples
 
-    for i in range(num_bootstrap_samples):
-        # Resample with replacement from the original sample
-        bootstrap_sample = np.random.choice(original_sample, size=sample_size, replace=True)
-        # Store the bootstrap sample
-        bootstrap_samples[i] = bootstrap_sample
-        # Calculate and store the mean of the bootstrap sample
-        bootstrap_sample_means[i] = np.mean(bootstrap_sample)
+if __name__ == '__main__':
+    # Example Usage
+    np.random.seed(0) # For reproducibility
 
-    return bootstrap_samples, bootstrap_sample_means
+    # Parameters
+    population_mean = 170  # Mean height
+    population_std = 10    # Standard deviation
+    sample_size = 1000000     # Size of the initial sample
+    num_bootstrap_samples = 100  # Number of bootstrap samples to generate for demonstration
 
-# Example Usage
-np.random.seed(0) # For reproducibility
+    # Generate an initial sample
+    original_sample = np.random.normal(population_mean, population_std, sample_size)
 
-# Parameters
-population_mean = 170  # Mean height
-population_std = 10    # Standard deviation
-sample_size = 1000000     # Size of the initial sample
-num_bootstrap_samples = 100  # Number of bootstrap samples to generate for demonstration
+    # Perform bootstrap resampling; only the means are kept, the resamples are streamed
+    _, bootstrap_means = bootstrap_resample_and_store_samples(original_sample, num_bootstrap_samples, sample_size)
 
-# Generate an initial sample
-original_sample = np.random.normal(population_mean, population_std, sample_size)
+    # Keep the samples too for a small demonstration (store_samples=True builds the full matrix)
+    bootstrap_samples, _ = bootstrap_resample_and_store_samples(original_sample[:1000], 5, 1000, store_samples=True)
 
-# Perform bootstrap resampling and store the samples and their means
-bootstrap_samples, bootstrap_means = bootstrap_resample_and_store_samples(original_sample, num_bootstrap_samples, sample_size)
-
-# Display the first bootstrap sample and its mean for demonstration
-bootstrap_samples[:10], bootstrap_means[:10]
\ No newline at end of file
+    # Display the first bootstrap sample and the first bootstrap means for demonstration
+    bootstrap_samples[:10], bootstrap_means[:10]
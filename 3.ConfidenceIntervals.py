@@ -23,37 +23,21 @@ Algorithm for a bootstrap confidence interval is as follows:
 import numpy as np
 import matplotlib.pyplot as plt
 
-def bootstrap_confidence_interval(data, statistic_func, R, confidence_level):
-    # Initialize an array to store the bootstrap statistics
-    bootstrap_statistics = np.zeros(R)
-
-    # Perform R bootstrap resamples using a for loop
-    for i in range(R):
-        # Resample with replacement from the original data
-        resample = np.random.choice(data, size=len(data), replace=True)
-        # Calculate and store the statistic for this resample
-        bootstrap_statistics[i] = statistic_func(resample)
-
-    # Calculate the confidence interval
-    lower_percentile = (100 - confidence_level) / 2
-    upper_percentile = 100 - lower_percentile
-    confidence_interval = np.percentile(bootstrap_statistics, [lower_percentile, upper_percentile])
-
-    return bootstrap_statistics, confidence_interval
-
-# Example data and usage
-data = np.array([85, 90, 78, 92, 88, 75, 84, 82, 89, 91])
-bootstrap_stats, confidence_interval = bootstrap_confidence_interval(data, np.mean, R=1000, confidence_level=90)
-
-# Plotting
-plt.hist(bootstrap_stats, bins=20, color='skyblue', edgecolor='black', alpha=0.7)
-plt.axvline(confidence_interval[0], color='red', linestyle='dashed', linewidth=2, label=f'90% CI Lower: {confidence_interval[0]:.2f}')
-plt.axvline(confidence_interval[1], color='green', linestyle='dashed', linewidth=2, label=f'90% CI Upper: {confidence_interval[1]:.2f}')
-plt.axvline(np.mean(data), color='purple', linestyle='solid', linewidth=2, label=f'Actual Mean: {np.mean(data):.2f}')
-plt.title('Bootstrap Statistics with 90% Confidence Interval')
-plt.xlabel('Mean Value')
-plt.ylabel('Frequency')
-plt.tight_layout() # Tight layout often provides a better layout
-plt.grid(True) # Improve the appearance Add gridlines
-plt.legend()
-plt.show()
\ No newline at end of file
+from sampling_distributions import (bootstrap_ci_figure, bootstrap_confidence_interval, bootstrap_confidence_intervals,
+                                    draw_figure, quantile)
+
+if __name__ == '__main__':
+    # Example data and usage
+    data = np.array([85, 90, 78, 92, 88, 75, 84, 82, 89, 91])
+    bootstrap_stats, confidence_interval = bootstrap_confidence_interval(data, np.mean, R=1000, confidence_level=90)
+
+    # Plotting: the statistics are binned once and drawn from the counts
+    spec = bootstrap_ci_figure(bootstrap_stats, confidence_interval, np.mean(data), confidence_level=90)
+    draw_figure(spec, plt.figure())
+    plt.show()
+
+    # Several statistics and confidence levels from one set of resamples (each resample is sorted once)
+    statistics = {'mean': np.mean, 'median': np.median, 'std': np.std, 'p10': quantile(0.1), 'p90': quantile(0.9)}
+    _, confidence_intervals = bootstrap_confidence_intervals(data, statistics, R=1000, confidence_levels=[90, 95])
+    for name, intervals in confidence_intervals.items():
+        print(name, {level: interval.round(2).tolist() for level, interval in intervals.items()})
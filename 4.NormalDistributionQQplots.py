@@ -18,7 +18,8 @@ to the quantiles of the specified theoretical distribution
 
 import numpy as np 
 import matplotlib.pyplot as plt 
-import scipy.stats as stats
+
+from sampling_distributions import QuantileSketch, build_quantile_sketch, draw_figure, qq_figure
 
 '''
 NOTE: The resulting image shows that the normally distributed data 
@@ -29,102 +30,65 @@ QQ-Plot would deviate from this line, providing a visual indication
 of how the data distribution differs from the normal distribution.
 '''
 
-# Generate a normally distributed random sample
-np.random.seed(0)
-normal_data = np.random.normal(loc=0, scale=1, size=1000)
-
-# Set up the matplotlib figure with two subplots
-fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
-
-# Plot a histogram of the normally distributed data on the left subplot (ax1)
-ax1.hist(normal_data, bins=30, alpha=0.7, color='blue', edgecolor='black')
-ax1.set_title('Histogram of Normal Distribution')
-ax1.set_xlabel('Value')
-ax1.set_ylabel('Frequency')
-ax1.grid(True)  # Optional: add gridlines
-
-# Generate a QQ plot of the normally distributed data on the right subplot (ax2)
-stats.probplot(normal_data, dist="norm", plot=ax2)
-ax2.set_title('QQ Plot of Normal Distribution')
-ax2.get_lines()[1].set_color('red')  # Optional: change the color of the line
-ax2.grid(True)  # Optional: add gridlines
-
-# Show the plots side by side
-plt.tight_layout()
-plt.show()
-
-#######################################################################
-#NOTE: If the distribution is non-normal and plotted on normal QQ-Plot,
-# the points will deviate from the diagonal line
-
-# Generate a non-normal distribution sample (for example, exponential)
-np.random.seed(0)
-non_normal_data = np.random.exponential(scale=1, size=1000)
-
-# Create subplots
-fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
-
-# Plot histogram for the non-normal distribution
-ax1.hist(non_normal_data, bins=30, alpha=0.7, color='blue', edgecolor='black')
-ax1.set_title('Histogram of Non-Normal Distribution')
-ax1.set_xlabel('Value')
-ax1.set_ylabel('Frequency')
-ax1.grid(True)  
-
-# Plot QQ-Plot for the non-normal distribution against a normal theoretical distribution
-stats.probplot(non_normal_data, dist="norm", plot=ax2)
-ax2.set_title('QQ Plot Against Normal Distribution')
-ax2.set_xlabel('Theoretical Quantiles')
-ax2.set_ylabel('Sample Quantiles')
-ax2.grid(True)
-
-# Adjust layout to prevent overlap
-plt.tight_layout()
-plt.show()
-
-#######################################################################
-# Generate a sample from an exponential distribution
-np.random.seed(0)
-exponential_data = np.random.exponential(scale=1, size=1000)
-
-# Create subplots for the exponential distribution
-fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
-
-# Plot histogram for the Exponential distribution
-ax1.hist(exponential_data, bins=30, alpha=0.7, color='skyblue', edgecolor='black')
-ax1.set_title('Histogram of Exponential Distribution')
-ax1.set_xlabel('Value')
-ax1.set_ylabel('Frequency')
-ax2.grid(True) 
-
-# Plot QQ-Plot for the Exponential distribution
-stats.probplot(exponential_data, dist="expon", plot=ax2)
-ax2.set_title('QQ Plot of Exponential Distribution')
-ax2.grid(True)
-
-# Adjust layout to prevent overlap
-plt.tight_layout()
-plt.show()
-#######################################################################
-# Generate a sample from a Weibull distribution
-np.random.seed(0)
-weibull_data = np.random.weibull(a=1.5, size=1000)  # 'a' is the shape parameter of the Weibull distribution
-
-aaa# Create subplots for the Weibull distribution
-fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
-
-# Plot histogram for the Weibull distribution
-ax1.hist(weibull_data, bins=30, alpha=0.7, color='purple', edgecolor='black')
-ax1.set_title('Histogram of Weibull Distribution')
-ax1.set_xlabel('Value')
-ax1.set_ylabel('Frequency')
-ax1.grid(True)
-
-# Plot QQ-Plot for the Weibull distribution
-stats.probplot(weibull_data, dist="weibull_min", sparams=(1.5,), plot=ax2)
-ax2.set_title('QQ Plot of Weibull Distribution')
-ax2.grid(True)
-
-# Adjust layout to prevent overlap
-plt.tight_layout()
-plt.show()
\ No newline at end of file
+if __name__ == '__main__':
+    # Generate a normally distributed random sample
+    np.random.seed(0)
+    normal_data = np.random.normal(loc=0, scale=1, size=1000)
+
+    # Histogram (left) and QQ plot (right); both are drawn from the pre-computed spec
+    spec = qq_figure(normal_data, dist="norm", histogram_title='Histogram of Normal Distribution',
+                     qq_title='QQ Plot of Normal Distribution')
+    draw_figure(spec, plt.figure(figsize=(14, 6)))
+    plt.show()
+
+    #######################################################################
+    #NOTE: If the distribution is non-normal and plotted on normal QQ-Plot,
+    # the points will deviate from the diagonal line
+
+    # Generate a non-normal distribution sample (for example, exponential)
+    np.random.seed(0)
+    non_normal_data = np.random.exponential(scale=1, size=1000)
+
+    # Histogram and QQ-Plot against a normal theoretical distribution
+    spec = qq_figure(non_normal_data, dist="norm", histogram_title='Histogram of Non-Normal Distribution',
+                     qq_title='QQ Plot Against Normal Distribution')
+    draw_figure(spec, plt.figure(figsize=(14, 6)))
+    plt.show()
+
+    #######################################################################
+    # Generate a sample from an exponential distribution
+    np.random.seed(0)
+    exponential_data = np.random.exponential(scale=1, size=1000)
+
+    # Histogram and QQ-Plot for the Exponential distribution
+    spec = qq_figure(exponential_data, dist="expon", color='skyblue',
+                     histogram_title='Histogram of Exponential Distribution',
+                     qq_title='QQ Plot of Exponential Distribution')
+    draw_figure(spec, plt.figure(figsize=(14, 6)))
+    plt.show()
+    #######################################################################
+    # Generate a sample from a Weibull distribution
+    np.random.seed(0)
+    weibull_data = np.random.weibull(a=1.5, size=1000)  # 'a' is the shape parameter of the Weibull distribution
+
+    # Histogram and QQ-Plot for the Weibull distribution
+    spec = qq_figure(weibull_data, dist="weibull_min", sparams=(1.5,), color='purple',
+                     histogram_title='Histogram of Weibull Distribution', qq_title='QQ Plot of Weibull Distribution')
+    draw_figure(spec, plt.figure(figsize=(14, 6)))
+    plt.show()
+
+    #######################################################################
+    #NOTE: For millions of points probplot becomes unusable. Instead, build a quantile
+    # sketch per shard in one streaming pass, merge the sketches and compare quantiles
+    # only at a fixed set of probability levels.
+    np.random.seed(0)
+    shards = [np.random.exponential(scale=1, size=1_000_000) for _ in range(4)]
+
+    # One sketch per shard (e.g. per machine), merged without gathering the data
+    sketch = QuantileSketch()
+    for shard in shards:
+        sketch.merge(build_quantile_sketch(shard))
+
+    spec = qq_figure(sketch, dist="expon", qq_title=f'Sketch QQ Plot of {sketch.count:,.0f} Exponential Values')
+    draw_figure(spec, plt.figure(figsize=(7, 6)))
+    plt.show()
@@ -16,92 +16,124 @@ Implications in Data Analysis
 """
 
 import numpy as np
-import scipy.stats as stats
 import matplotlib.pyplot as plt
 
-# Generate a sample from a Pareto distribution
-alpha = 3.0  # Shape parameter
-size = 1000  # Sample size
-samples = np.random.pareto(alpha, size)
-
-# Create a histogram of the sample
-plt.figure(figsize=(10, 6))
-count, bins, ignored = plt.hist(samples, 100, density=True, alpha=0.7, color="blue")
-
-# Fit a line to the histogram to show the long tail
-fit = alpha * size * (bins ** (alpha - 1)) / (bins**alpha).sum()
-plt.plot(bins, max(count) * fit / max(fit), linewidth=2, color="red")
-
-# Annotations
-plt.title("Pareto Distribution Histogram (Long-Tailed Distribution)")
-plt.xlabel("Value")
-plt.ylabel("Frequency")
-plt.text(
-    5,
-    0.05,
-    "Long Tail\nRegion",
-    horizontalalignment="center",
-    verticalalignment="center",
-    bbox=dict(facecolor="red", alpha=0.5),
-)
-plt.axvline(
-    x=1, linestyle="--", color="green", label="x_min (minimum value for Pareto)"
-)
-plt.legend()
-plt.tight_layout()
-# Show the plot
-plt.show()
-
-
-"""
-* The x-axis represents the values of the distribution.
-* The y-axis shows the frequency of these values.
-* The red line is a fit to the histogram, highlighting the long-tail characteristic.
-* The green dashed line represents the minimum value (x_min) for the Pareto distribution, 
-    beyond which the long-tail behavior is observed.
-* The area labeled 'Long Tail Region' indicates where the tail of the distribution extends, 
-    demonstrating that values far from the mean are more frequent than they would be in a 
-    short-tailed distribution (like a normal distribution).
-"""
-
-
-# NOTE QQ-PLOT
-
-# Generate a sample from a Pareto distribution
-alpha = 3.0  # Shape parameter
-size = 1000  # Sample size
-samples = np.random.pareto(alpha, size)
-
-# Generate QQ-plot for the Pareto samples against normal distribution
-plt.figure(figsize=(10, 6))
-(stats.probplot(samples, dist="norm", plot=plt))
-
-# Updated title and axis labels
-plt.title("Modified QQ-plot: Pareto vs. Normal Distribution")
-plt.xlabel("Quantiles of Normal Distribution")
-plt.ylabel("Z-score (Pareto Samples)")
-
-# Additional annotations or changes
-plt.grid(True)  # Keep the grid for better readability
-# plt.axhline(y=0, color="r", linestyle="-")  # Add a horizontal line at y=0
-plt.axvline(x=0, color="green", linestyle="--")  # Add a vertical line at x=0
-plt.text(
-    0, 3, "Center Point", horizontalalignment="center", verticalalignment="center"
-)  # Add text annotation
-
-# Show the modified plot
-plt.show()
-
-
-"""
-for QQ-Plots
-If the points are far below the line for low values and far above the line 
-for high values, indicating the data are not normally distributed. 
-
-This means that we are much more likely to observe extreme values than would 
-be expected if the data had a normal distribution. 
-
-Another common phenomenon: the points are close to the line for the data within 
-one standard deviation of the mean. Tukey refers to this phenomenon as 
-data being “normal in the middle” but having much longer tails
-"""
+from sampling_distributions import (TailSketch, draw_figure, hill_estimates, histogram_figure, qq_figure,
+                                    tail_threshold_plot)
+
+if __name__ == '__main__':
+    # Generate a sample from a Pareto distribution
+    alpha = 3.0  # Shape parameter
+    size = 1000  # Sample size
+    samples = np.random.pareto(alpha, size)
+
+    # Create a histogram of the sample (binned by histogram_figure, drawn from the counts)
+    spec = histogram_figure(samples, bins=100, density=True, color="blue",
+                            title="Pareto Distribution Histogram (Long-Tailed Distribution)")
+    ax = draw_figure(spec, plt.figure(figsize=(10, 6))).axes[0]
+    bins = spec['edges']
+    count = spec['counts'] / (spec['counts'].sum() * np.diff(bins))
+
+    # Fit a line to the histogram to show the long tail
+    fit = alpha * size * (bins ** (alpha - 1)) / (bins**alpha).sum()
+    ax.plot(bins, max(count) * fit / max(fit), linewidth=2, color="red")
+
+    # Annotations
+    ax.text(
+        5,
+        0.05,
+        "Long Tail\nRegion",
+        horizontalalignment="center",
+        verticalalignment="center",
+        bbox=dict(facecolor="red", alpha=0.5),
+    )
+    ax.axvline(
+        x=1, linestyle="--", color="green", label="x_min (minimum value for Pareto)"
+    )
+    ax.legend()
+    # Show the plot
+    plt.show()
+
+
+    """
+    * The x-axis represents the values of the distribution.
+    * The y-axis shows the frequency of these values.
+    * The red line is a fit to the histogram, highlighting the long-tail characteristic.
+    * The green dashed line represents the minimum value (x_min) for the Pareto distribution,
+        beyond which the long-tail behavior is observed.
+    * The area labeled 'Long Tail Region' indicates where the tail of the distribution extends,
+        demonstrating that values far from the mean are more frequent than they would be in a
+        short-tailed distribution (like a normal distribution).
+    """
+
+
+    # NOTE QQ-PLOT
+
+    # Generate a sample from a Pareto distribution
+    alpha = 3.0  # Shape parameter
+    size = 1000  # Sample size
+    samples = np.random.pareto(alpha, size)
+
+    # Generate QQ-plot for the Pareto samples against normal distribution
+    spec = qq_figure(samples, dist="norm", histogram_title="Histogram of Pareto Samples",
+                     qq_title="Modified QQ-plot: Pareto vs. Normal Distribution")
+    qq_ax = draw_figure(spec, plt.figure(figsize=(14, 6))).axes[1]
+
+    # Updated axis labels
+    qq_ax.set_xlabel("Quantiles of Normal Distribution")
+    qq_ax.set_ylabel("Z-score (Pareto Samples)")
+
+    # Additional annotations or changes
+    # qq_ax.axhline(y=0, color="r", linestyle="-")  # Add a horizontal line at y=0
+    qq_ax.axvline(x=0, color="green", linestyle="--")  # Add a vertical line at x=0
+    qq_ax.text(
+        0, 3, "Center Point", horizontalalignment="center", verticalalignment="center"
+    )  # Add text annotation
+
+    # Show the modified plot
+    plt.show()
+
+
+    """
+    for QQ-Plots
+    If the points are far below the line for low values and far above the line
+    for high values, indicating the data are not normally distributed.
+
+    This means that we are much more likely to observe extreme values than would
+    be expected if the data had a normal distribution.
+
+    Another common phenomenon: the points are close to the line for the data within
+    one standard deviation of the mean. Tukey refers to this phenomenon as
+    data being “normal in the middle” but having much longer tails
+    """
+
+
+    # NOTE ESTIMATING THE TAIL INDEX
+    """
+    Above, alpha is known. On real data (e.g. latencies) it has to be estimated, usually
+    from a stream. Only the largest values matter for the tail, so a TailSketch keeps the
+    top k values of everything it has seen (memory O(k), not O(n)); sketches built on
+    different shards can be merged.
+    """
+
+    # Stream 5 chunks of Pareto samples (x_min = 1) through one sketch
+    sketch = TailSketch(k=5000)
+    for _ in range(5):
+        sketch.update(np.random.pareto(alpha, 200_000) + 1)
+
+    # Hill estimate using the top 1,000 values
+    j, hill = hill_estimates(sketch)
+    print(f"Hill estimate of alpha from the top 1,000 of {sketch.count:,} values: {hill[999]:.2f}")
+
+    # Threshold selection plot: pick k where the estimates are flat
+    plt.figure(figsize=(10, 6))
+    tail_threshold_plot(sketch, true_alpha=alpha)
+    plt.show()
+
+
+    """
+    For the threshold selection plot
+    The estimate is noisy for very small k (few values) and biased for very large k
+    (values from the body of the distribution sneak in). Choose k in the flat region
+    between the two; here the Hill line settles near the true alpha of 3.
+    """
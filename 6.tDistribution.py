@@ -19,26 +19,21 @@ For larger samples, it behaves almost like the normal distribution.
 '''
 
 import numpy as np
-import scipy.stats as stats
 import matplotlib.pyplot as plt
 
-# Sample values for degrees of freedom
-# As the degrees of freedom increase, 
-# the t-distribution becomes closer to the normal distribution.
-dfs = [0.25, 1, 5, 10, 30]
+from sampling_distributions import draw_figure, pdf_curves_figure
 
-# Generate a range of t-values
-t_values = np.linspace(-5, 5, 100)
+if __name__ == '__main__':
+    # Sample values for degrees of freedom
+    # As the degrees of freedom increase,
+    # the t-distribution becomes closer to the normal distribution.
+    dfs = [0.25, 1, 5, 10, 30]
 
-# Plot the t-distributions for different degrees of freedom
-plt.figure(figsize=(10, 6))
+    # Generate a range of t-values
+    t_values = np.linspace(-5, 5, 100)
 
-for df in dfs:
-    plt.plot(t_values, stats.t.pdf(t_values, df), label=f'DF={df}')
-
-plt.title('Student\'s t-Distributions for Different Degrees of Freedom')
-plt.xlabel('t-value')
-plt.ylabel('Probability Density')
-plt.legend()
-plt.grid(True)
-plt.show()
\ No newline at end of file
+    # Plot the t-distributions for different degrees of freedom
+    spec = pdf_curves_figure('t', t_values, dfs, title='Student\'s t-Distributions for Different Degrees of Freedom',
+                             xlabel='t-value')
+    draw_figure(spec, plt.figure(figsize=(10, 6)))
+    plt.show()
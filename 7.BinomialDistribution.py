@@ -32,71 +32,73 @@ NOTE: PROBLEM
         number of successes (k) = ? -> what we are trying to measure
 """
 
-from scipy.stats import binom
+import numpy as np
 import matplotlib.pyplot as plt
 
-# Define the parameters for the binomial distribution
-n = 10  # Number of trials
-p = 0.7  # Probability of success on a single trial
-
-# Generate a range of possible number of successes (from 0 to n)
-k = range(0, n + 1)
-
-# Calculate the probability for each number of successes
-probabilities = binom.pmf(k, n, p)
-
-# Create a bar chart to visualize the probability distribution
-plt.bar(k, probabilities, color="teal", alpha=0.7)
-plt.title("Binomial Distribution - Probability of Completing a Climb within 5 Minutes")
-plt.xlabel("Number of Successful Climbs out of 10 Attempts")
-plt.ylabel("Probability")
-plt.xticks(k)
-plt.grid(axis="y", linestyle="--", alpha=0.7)
-plt.tight_layout()
-plt.show()
-
-"""
-NOTE: the height of the bar over 7 successful climbs is just over 0.25, 
-it means that, given your scenario of 10 climbing attempts with a 70% success 
-rate for each climb, you have slightly more than a 25% chance 
-of completing exactly 7 climbs within 5 minutes.
-"""
-
-# Example 2
-"""
-PROBLEM:
-    Suppose you want to calculate the probability 
-    of getting a certain 3 heads
-    when flipping a fair coin 5 times.
-"""
-# Define the parameters for the binomial distribution
-n = 5  # Number of trials (coin flips)
-p = 0.5  # Probability of success on a single trial (getting a head)
-
-# Generate a range of possible number of successes (from 0 to n)
-k = range(0, n + 1)
-
-# Calculate the probability for each number of successes
-probabilities = binom.pmf(k, n, p)
-
-# Create a bar chart to visualize the probability distribution
-plt.bar(k, probabilities, color="skyblue", alpha=0.7)
-plt.title("Binomial Distribution - Probability of Getting Heads in 5 Coin Flips")
-plt.xlabel("Number of Heads")
-plt.ylabel("Probability")
-plt.xticks(k)
-plt.grid(axis="y", linestyle="--", alpha=0.7)
-plt.tight_layout()
-plt.show()
-
-"""
-NOTE: calculate each probability of getting 0, 1, 2, 3, 4, or 5 heads
-        and then visualize the distribution using a bar chart.
-
-        The probability of getting 0 head in 5 coin flips is 0.03125,
-        the probability of getting 1 head in 5 coin flips is 0.15625,
-        the probability of getting 2 heads (3 tails) in 5 coin flips is 0.3125,
-        the probability of getting 3 heads in 5 coin flips is 0.3125,
-        the probability of getting 4 heads in 5 coin flips is 0.15625,
-        the probability of getting 5 heads in 5 coin flips is 0.03125.
-"""
\ No newline at end of file
+from sampling_distributions import binomial_confidence_interval, binomial_pmf_figure, binomial_tail, draw_figure
+
+if __name__ == '__main__':
+    # Define the parameters for the binomial distribution
+    n = 10  # Number of trials
+    p = 0.7  # Probability of success on a single trial
+
+    # Calculate the probability for each number of successes (from 0 to n)
+    # and lay it out as a bar chart
+    spec = binomial_pmf_figure(n, p, title="Binomial Distribution - Probability of Completing a Climb within 5 Minutes",
+                               xlabel="Number of Successful Climbs out of 10 Attempts")
+    draw_figure(spec, plt.figure())
+    plt.show()
+
+    """
+    NOTE: the height of the bar over 7 successful climbs is just over 0.25,
+    it means that, given your scenario of 10 climbing attempts with a 70% success
+    rate for each climb, you have slightly more than a 25% chance
+    of completing exactly 7 climbs within 5 minutes.
+    """
+
+    # Example 2
+    """
+    PROBLEM:
+        Suppose you want to calculate the probability
+        of getting a certain 3 heads
+        when flipping a fair coin 5 times.
+    """
+    # Define the parameters for the binomial distribution
+    n = 5  # Number of trials (coin flips)
+    p = 0.5  # Probability of success on a single trial (getting a head)
+
+    # Calculate the probability for each number of successes (from 0 to n)
+    # and lay it out as a bar chart
+    spec = binomial_pmf_figure(n, p, title="Binomial Distribution - Probability of Getting Heads in 5 Coin Flips",
+                               xlabel="Number of Heads", color="skyblue")
+    draw_figure(spec, plt.figure())
+    plt.show()
+
+    """
+    NOTE: calculate each probability of getting 0, 1, 2, 3, 4, or 5 heads
+            and then visualize the distribution using a bar chart.
+
+            The probability of getting 0 head in 5 coin flips is 0.03125,
+            the probability of getting 1 head in 5 coin flips is 0.15625,
+            the probability of getting 2 heads (3 tails) in 5 coin flips is 0.3125,
+            the probability of getting 3 heads in 5 coin flips is 0.3125,
+            the probability of getting 4 heads in 5 coin flips is 0.15625,
+            the probability of getting 5 heads in 5 coin flips is 0.03125.
+    """
+
+    # Example 3
+    """
+    PROBLEM:
+        For many A/B test rows at once, how likely is it to see at least this many
+        conversions if the true rate were 5%, and what is the 95% interval for each rate?
+        Everything works on arrays of (successes, trials), with trials up to 1e9.
+    """
+
+    trials = np.array([1_000, 50_000, 2_000_000, 1_000_000_000])
+    successes = np.array([62, 2_600, 101_000, 50_010_000])
+
+    # P(X >= successes) under p = 0.05; accuracy target 1e-6 picks exact or approximate per row
+    p_values = binomial_tail(successes, trials, 0.05, tail="upper", tolerance=1e-6)
+    lower, upper = binomial_confidence_interval(successes, trials, confidence_level=95, method="wilson")
+    for row in zip(successes, trials, p_values, lower, upper):
+        print("{} / {}: P(X >= k) = {:.3g}, 95% CI [{:.5f}, {:.5f}]".format(*row))
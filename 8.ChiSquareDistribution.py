@@ -6,23 +6,24 @@ is the chi-square statistic.
 """
 
 import numpy as np
-from scipy.stats import chi2
 import matplotlib.pyplot as plt
 
-# Values for degrees of freedom
-dfs = [1, 2, 3, 5, 10]
+from sampling_distributions import chi2_independence_test, draw_figure, pdf_curves_figure
 
-# Generate values from 0 to 20 for x-axis
-x = np.linspace(0, 20, 1000)
+if __name__ == '__main__':
+    # Values for degrees of freedom
+    dfs = [1, 2, 3, 5, 10]
 
-# Plot the chi-square distribution for each degrees of freedom
-plt.figure(figsize=(10, 6))
-for df in dfs:
-    plt.plot(x, chi2.pdf(x, df), label=f'DF={df}')
+    # Generate values from 0 to 20 for x-axis
+    x = np.linspace(0, 20, 1000)
 
-plt.title('Chi-square Distribution for Different Degrees of Freedom')
-plt.xlabel('Value')
-plt.ylabel('Probability Density')
-plt.legend()
-plt.grid(True)
-plt.show()
\ No newline at end of file
+    # Plot the chi-square distribution for each degrees of freedom
+    spec = pdf_curves_figure('chi2', x, dfs, title='Chi-square Distribution for Different Degrees of Freedom')
+    draw_figure(spec, plt.figure(figsize=(10, 6)))
+    plt.show()
+
+    # Test independence for many segments at once: one 2x3 table (e.g. variant x outcome) per segment
+    np.random.seed(0)
+    tables = np.random.poisson(lam=[[20, 30, 50], [25, 30, 45]], size=(10000, 2, 3))
+    statistics, p_values, dof, expected = chi2_independence_test(tables)
+    print(f'DF={dof}, segments with p < 0.05: {np.mean(p_values < 0.05):.1%}')
@@ -0,0 +1,14 @@
+'''
+Benchmark suite for the hot paths of sampling_distributions.
+
+Run from the repository root:
+
+    python -m benchmarks run --profile quick --output benchmarks/baselines/quick.json
+    python -m benchmarks compare benchmarks/baselines/quick.json current.json
+
+Every case is timed over several repeats (best and median wall time, work units per
+second) and then run once more under tracemalloc for its peak traced allocation, which
+belongs to that case alone (the process peak RSS would carry over from earlier cases,
+so it is not recorded). compare exits with status 1 when a case got
+slower or hungrier than the baseline by more than the given thresholds.
+'''
@@ -0,0 +1,60 @@
+'''
+Command line entry point: run the benchmark suite, compare two reports or measure compact-mode drift.
+'''
+
+import argparse
+import os
+import sys
+
+from . import drift, runner
+from .cases import PROFILES
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the benchmarks and write a JSON report')
+    run_parser.add_argument('--profile', choices=sorted(PROFILES), default='quick')
+    run_parser.add_argument('--repeats', type=int, default=5)
+    run_parser.add_argument('--filter', dest='name_filter', help='only run cases whose name contains this')
+    run_parser.add_argument('--output', default=None,
+                            help='report path (default: benchmarks/baselines/<profile>.json)')
+    run_parser.add_argument('--trace', dest='trace_path', default=None,
+                            help='also write a Chrome trace of one instrumented call per case to this path')
+
+    compare_parser = commands.add_parser('compare', help='flag regressions of a report against a baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--time-threshold', type=float, default=0.10,
+                                help='allowed relative slowdown of the best time (default 0.10)')
+    compare_parser.add_argument('--memory-threshold', type=float, default=0.10,
+                                help='allowed relative growth of the peak traced memory (default 0.10)')
+
+    drift_parser = commands.add_parser('drift', help='measure the numerical drift of compact=True')
+    drift_parser.add_argument('--profile', choices=sorted(PROFILES), default='quick')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'drift':
+        drift.run(args.profile)
+        return 0
+
+    if args.command == 'run':
+        report = runner.run(args.profile, repeats=args.repeats, name_filter=args.name_filter,
+                            trace_path=args.trace_path)
+        output = args.output or os.path.join(os.path.dirname(__file__), 'baselines', f'{args.profile}.json')
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        runner.save(report, output)
+        print(f'wrote {output}')
+        return 0
+
+    rows, regressions = runner.compare(runner.load(args.baseline), runner.load(args.current),
+                                       args.time_threshold, args.memory_threshold)
+    for row in rows:
+        print(f"{row['case']:<90} time x{row['time_ratio']:.2f}  memory x{row['memory_ratio']:.2f}  "
+              f"{', '.join(row['flags'])}")
+    print(f'{len(regressions)} regression(s) in {len(rows)} shared case(s)')
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+'''
+Benchmark cases: one entry per hot path and point of the size matrix.
+
+Each case prepares its inputs up front (not timed) and returns a zero-argument callable
+plus the number of work units one call performs (resamples, simulated samples, grid
+points), so results can be reported as throughput.
+'''
+
+from collections import namedtuple
+
+import numpy as np
+
+import sampling_distributions as sd
+
+Case = namedtuple('Case', ['name', 'params', 'func', 'units', 'unit'])
+
+# Size matrix per profile: 'quick' finishes in well under a minute, 'full' stresses memory
+PROFILES = {
+    'quick': {
+        'data_sizes': [1_000, 100_000],
+        'resamples': [100, 1_000],
+        'grid_points': [1_000, 100_000],
+        'binomial_trials': [10, 10_000],
+        # Largest number of gathered values (resamples x data size) a case may ask for
+        'max_resampled_values': 10 ** 7,
+    },
+    'full': {
+        'data_sizes': [1_000, 100_000, 1_000_000],
+        'resamples': [100, 1_000, 10_000],
+        'grid_points': [1_000, 100_000, 1_000_000],
+        'binomial_trials': [10, 10_000, 1_000_000],
+        'max_resampled_values': 10 ** 9,
+    },
+}
+
+# Function to generate all benchmark cases of a profile
+def iter_cases(profile='quick'):
+    sizes = PROFILES[profile]
+    rng = np.random.default_rng(0)
+
+    for n in sizes['data_sizes']:
+        for num_samples in sizes['resamples']:
+            if n * num_samples > sizes['max_resampled_values']:
+                continue
+            for compact in (False, True):
+                yield Case('simulate_sampling', {'sample_size': n, 'num_samples': num_samples, 'compact': compact},
+                           lambda n=n, num_samples=num_samples, compact=compact: sd.simulate_sampling(
+                               175, 10, n, num_samples, random_state=0, compact=compact),
+                           num_samples, 'samples')
+
+    for n in sizes['data_sizes']:
+        data = rng.normal(170, 10, n)
+        for R in sizes['resamples']:
+            if n * R > sizes['max_resampled_values']:
+                continue
+            for store_samples in (False, True):
+                for compact in (False, True):
+                    yield Case('bootstrap_resample_and_store_samples',
+                               {'sample_size': n, 'R': R, 'store_samples': store_samples, 'compact': compact},
+                               lambda data=data, R=R, store_samples=store_samples, compact=compact:
+                                   sd.bootstrap_resample_and_store_samples(
+                                       data, R, len(data), store_samples=store_samples, random_state=0,
+                                       compact=compact),
+                               R, 'resamples')
+            for statistic in ('mean', 'median', 'opaque'):
+                statistic_func = {'mean': np.mean, 'median': np.median,
+                                  'opaque': lambda x: float(np.mean(x))}[statistic]
+                yield Case('bootstrap_confidence_interval',
+                           {'sample_size': n, 'R': R, 'statistic': statistic},
+                           lambda data=data, R=R, statistic_func=statistic_func:
+                               sd.bootstrap_confidence_interval(data, statistic_func, R, 95, random_state=0),
+                           R, 'resamples')
+            # Compact mode: narrow indices and float32 resamples
+            yield Case('bootstrap_confidence_interval',
+                       {'sample_size': n, 'R': R, 'statistic': 'mean', 'compact': True},
+                       lambda data=data, R=R: sd.bootstrap_confidence_interval(data, np.mean, R, 95, random_state=0,
+                                                                               compact=True),
+                       R, 'resamples')
+            # Five statistics from one set of resamples (compare with five single-statistic calls)
+            statistics = [np.mean, np.median, np.std, sd.quantile(0.1), sd.quantile(0.9)]
+            yield Case('bootstrap_confidence_intervals', {'sample_size': n, 'R': R, 'statistics': len(statistics)},
+                       lambda data=data, R=R, statistics=statistics:
+                           sd.bootstrap_confidence_intervals(data, statistics, R, [90, 95], random_state=0),
+                       R, 'resamples')
+
+    for n in sizes['data_sizes']:
+        # Groups of ten values each, all bootstrapped in one call
+        data, labels = rng.lognormal(size=n), np.repeat(np.arange(n // 10), 10)
+        for R in sizes['resamples']:
+            if n * R > sizes['max_resampled_values']:
+                continue
+            for statistic in ('mean', 'median'):
+                statistic_func = {'mean': np.mean, 'median': np.median}[statistic]
+                yield Case('grouped_bootstrap_confidence_interval',
+                           {'groups': n // 10, 'R': R, 'statistic': statistic},
+                           lambda data=data, labels=labels, R=R, statistic_func=statistic_func:
+                               sd.grouped_bootstrap_confidence_interval(data, statistic_func, R, 95, groups=labels,
+                                                                        random_state=0),
+                           R * (n // 10), 'group resamples')
+
+    for n in sizes['grid_points']:
+        data = rng.exponential(size=n)
+        for dist in ('norm', 'expon'):
+            yield Case('qq_plot_points', {'sample_size': n, 'dist': dist},
+                       lambda data=data, dist=dist: sd.qq_plot_points(data, dist=dist),
+                       n, 'points')
+
+    for n in sizes['grid_points']:
+        data = rng.exponential(size=n)
+        yield Case('build_quantile_sketch', {'sample_size': n},
+                   lambda data=data: sd.build_quantile_sketch(data), n, 'points')
+
+    for n in sizes['grid_points']:
+        data = rng.normal(size=n)
+        yield Case('histogram_counts', {'sample_size': n},
+                   lambda data=data: sd.histogram_counts(data, bins=30, chunk_size=max(1, n // 10)), n, 'points')
+
+    for n in sizes['grid_points']:
+        data = rng.pareto(3, size=n) + 1
+        yield Case('build_tail_sketch', {'sample_size': n},
+                   lambda data=data: sd.build_tail_sketch(data, k=1000), n, 'points')
+
+    for n in sizes['grid_points']:
+        for num_dfs in (5, 100):
+            # Same total number of evaluated points, spread over more or fewer curves
+            x = np.linspace(-5, 5, max(1, n // num_dfs))
+            dfs = np.linspace(0.25, 30, num_dfs)
+            yield Case('t_pdf_curves', {'grid_points': n, 'dfs': num_dfs},
+                       lambda x=x, dfs=dfs: sd.t_pdf_curves(x, dfs), len(x) * num_dfs, 'points')
+            yield Case('chi2_pdf_curves', {'grid_points': n, 'dfs': num_dfs},
+                       lambda x=x + 5, dfs=dfs: sd.chi2_pdf_curves(x, dfs), len(x) * num_dfs, 'points')
+
+        # Off-grid lookups in a cached table (built once, outside the timed call)
+        table = sd.distribution_table('t', 'cdf', (1, 1000), (-5, 5), cache_dir=False)
+        dfs, x = np.exp(rng.uniform(0, np.log(1000), n)), rng.uniform(-5, 5, n)
+        yield Case('distribution_table_lookup', {'queries': n},
+                   lambda table=table, dfs=dfs, x=x: table(dfs, x), n, 'points')
+
+    for n in sizes['grid_points']:
+        tables = rng.poisson(20, size=(n // 10, 3, 3))
+        yield Case('chi2_independence_test', {'tables': len(tables)},
+                   lambda tables=tables: sd.chi2_independence_test(tables), len(tables), 'tables')
+
+    for n in sizes['binomial_trials']:
+        yield Case('binomial_pmf', {'n': n}, lambda n=n: sd.binomial_pmf(n, 0.7), n + 1, 'points')
+
+    for rows in sizes['grid_points']:
+        trials = rng.integers(1, 10 ** 6, size=rows)
+        p = rng.uniform(0.01, 0.99, size=rows)
+        successes = rng.binomial(trials, p)
+        for tolerance in (1e-6, 1e-3):
+            yield Case('binomial_tail', {'rows': rows, 'tolerance': tolerance},
+                       lambda successes=successes, trials=trials, p=p, tolerance=tolerance:
+                           sd.binomial_tail(successes, trials, p, tolerance=tolerance),
+                       rows, 'rows')
+        yield Case('binomial_confidence_interval', {'rows': rows},
+                   lambda successes=successes, trials=trials:
+                       sd.binomial_confidence_interval(successes, trials), rows, 'rows')
@@ -0,0 +1,47 @@
+'''
+Numerical drift of the compact (narrow index, float32) resampling mode against the default one,
+measured through the public calls with compact=True and compact=False.
+
+Bootstrap: for n < 2^32 both modes draw the same indices from the same seed, once gathering the
+float64 data and once its float32 copy, so the difference is pure rounding; the largest difference
+of the bootstrap means is reported relative to the bootstrap standard error. Standard error: the
+compact simulation draws float32 standard normals, a different stream than the float64 one, so
+the relative difference of the two SE estimates is Monte Carlo noise plus rounding; it is reported
+next to the Monte Carlo error of that difference, 1/sqrt(num_samples - 1), for scale.
+'''
+
+import numpy as np
+
+from sampling_distributions import bootstrap_confidence_interval, simulate_sampling
+
+from .cases import PROFILES
+
+# Function to measure the drift of the compact mode for every data size and R of a profile
+def run(profile='quick', log=print):
+    sizes = PROFILES[profile]
+    rng = np.random.default_rng(0)
+    rows = []
+    for n in sizes['data_sizes']:
+        data = rng.normal(170, 10, n)
+        for R in sizes['resamples']:
+            if n * R > sizes['max_resampled_values']:
+                continue
+            exact, _ = bootstrap_confidence_interval(data, np.mean, R, 95, random_state=1)
+            compact, _ = bootstrap_confidence_interval(data, np.mean, R, 95, random_state=1, compact=True)
+            row = {'case': f'bootstrap_means[R={R},sample_size={n}]',
+                   'drift': float(np.max(np.abs(compact - exact)) / np.std(exact)),
+                   'reference': 'bootstrap standard error'}
+            rows.append(row)
+            log(f"{row['case']:<60} max |compact - default| = {row['drift']:.2e} x {row['reference']}")
+
+        for num_samples in sizes['resamples']:
+            if n * num_samples > sizes['max_resampled_values']:
+                continue
+            _, exact = simulate_sampling(0, 1, n, num_samples, return_means=False, random_state=1)
+            _, compact = simulate_sampling(0, 1, n, num_samples, return_means=False, random_state=1, compact=True)
+            row = {'case': f'standard_error[num_samples={num_samples},sample_size={n}]',
+                   'drift': float(abs(compact - exact) / exact),
+                   'reference': f'Monte Carlo error {1 / np.sqrt(num_samples - 1):.2e}'}
+            rows.append(row)
+            log(f"{row['case']:<60} |compact - default| / SE = {row['drift']:.2e} ({row['reference']})")
+    return rows
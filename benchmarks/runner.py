@@ -0,0 +1,111 @@
+'''
+Timing, memory measurement, JSON baselines and regression comparison.
+'''
+
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from sampling_distributions.instrumentation import Recorder, instrument
+
+from .cases import iter_cases
+
+# Function to build the key a case is stored under, e.g. "bootstrap_confidence_interval[R=100,sample_size=1000]"
+def case_key(name, params):
+    return f"{name}[{','.join(f'{key}={value}' for key, value in sorted(params.items()))}]"
+
+# Function to time one case and measure its peak traced allocation
+def measure(case, repeats=5, warmup=1):
+    for _ in range(warmup):
+        case.func()
+
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        case.func()
+        timings.append(time.perf_counter() - started)
+
+    # Separate run: tracemalloc slows allocations down, so it must not pollute the timings
+    tracemalloc.start()
+    try:
+        case.func()
+        _, peak_traced = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = min(timings)
+    return {
+        'name': case.name,
+        'params': case.params,
+        'repeats': repeats,
+        'best_seconds': best,
+        'median_seconds': statistics.median(timings),
+        'units': case.units,
+        'unit': case.unit,
+        'units_per_second': case.units / best if best > 0 else float('inf'),
+        'peak_traced_bytes': peak_traced,
+    }
+
+# Function to run every case of a profile (optionally only those whose name contains a filter).
+# With trace_path, every case runs once more under instrumentation and all of them go into one Chrome trace.
+def run(profile='quick', repeats=5, name_filter=None, log=print, trace_path=None):
+    results = {}
+    recorder = Recorder() if trace_path is not None else None
+    for case in iter_cases(profile):
+        if name_filter and name_filter not in case.name:
+            continue
+        key = case_key(case.name, case.params)
+        results[key] = measure(case, repeats=repeats)
+        log(f"{key}: {results[key]['best_seconds'] * 1e3:.3f} ms, "
+            f"{results[key]['units_per_second']:.4g} {case.unit}/s, "
+            f"peak {results[key]['peak_traced_bytes'] / 2**20:.1f} MiB")
+        if recorder is not None:
+            # Separate run, so the instrumentation never touches the timings
+            with instrument(recorder), recorder.phase(key):
+                case.func()
+    if recorder is not None:
+        recorder.write_chrome_trace(trace_path)
+        log(f'wrote {trace_path}')
+    return {
+        'meta': {
+            'profile': profile,
+            'created': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+
+def save(report, path):
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+
+def load(path):
+    with open(path) as file:
+        return json.load(file)
+
+# Function to compare two reports; returns (rows, regressions) where each row describes one shared case
+def compare(baseline, current, time_threshold=0.10, memory_threshold=0.10):
+    rows, regressions = [], []
+    for key in sorted(set(baseline['results']) & set(current['results'])):
+        before, after = baseline['results'][key], current['results'][key]
+        time_ratio = after['best_seconds'] / before['best_seconds'] if before['best_seconds'] else 1.0
+        memory_ratio = (after['peak_traced_bytes'] / before['peak_traced_bytes']
+                        if before['peak_traced_bytes'] else 1.0)
+        flags = []
+        if time_ratio > 1 + time_threshold:
+            flags.append('slower')
+        if memory_ratio > 1 + memory_threshold:
+            flags.append('more memory')
+        row = {'case': key, 'time_ratio': time_ratio, 'memory_ratio': memory_ratio, 'flags': flags}
+        rows.append(row)
+        if flags:
+            regressions.append(row)
+    return rows, regressions
@@ -0,0 +1,78 @@
+'''
+Applied sampling distributions as an importable package.
+
+The numbered scripts in the repository root are demos; the compute functions they use
+live here. Nothing heavy is imported up front: each public name is loaded from its
+submodule on first access, and scipy/matplotlib are only imported by the functions
+that need them, so a worker that only bootstraps pays for numpy and nothing else.
+'''
+
+import importlib
+
+# Public name -> submodule defining it
+_EXPORTS = {
+    'simulate_sampling': 'standard_error',
+    'simulate_standard_error_curve': 'standard_error',
+    'sample_standard_error': 'standard_error',
+    'bootstrap_resample_and_store_samples': 'bootstrap',
+    'poisson_bootstrap_means': 'bootstrap',
+    'bootstrap_confidence_interval': 'confidence_intervals',
+    'poisson_bootstrap_confidence_interval': 'confidence_intervals',
+    'bootstrap_confidence_intervals': 'confidence_intervals',
+    'quantile': 'confidence_intervals',
+    'qq_plot_points': 'distributions',
+    't_pdf_curves': 'distributions',
+    'chi2_pdf_curves': 'distributions',
+    'binomial_pmf': 'distributions',
+    'evaluate_grid': 'tables',
+    'distribution_table': 'tables',
+    'critical_value': 'tables',
+    'DistributionTable': 'tables',
+    'binomial_log_pmf': 'binomial',
+    'binomial_tail': 'binomial',
+    'binomial_confidence_interval': 'binomial',
+    'chi2_independence_test': 'contingency',
+    'expected_counts': 'contingency',
+    'TailSketch': 'tail_index',
+    'build_tail_sketch': 'tail_index',
+    'hill_estimates': 'tail_index',
+    'pickands_estimates': 'tail_index',
+    'tail_threshold_plot': 'tail_index',
+    'histogram_counts': 'rendering',
+    'histogram_figure': 'rendering',
+    'bootstrap_ci_figure': 'rendering',
+    'qq_figure': 'rendering',
+    'pdf_curves_figure': 'rendering',
+    'binomial_pmf_figure': 'rendering',
+    'draw_figure': 'rendering',
+    'render_figure': 'rendering',
+    'render_figures': 'rendering',
+    'CSVColumn': 'sources',
+    'raw_binary': 'sources',
+    'open_source': 'sources',
+    'to_random_access': 'sources',
+    'BootstrapStore': 'checkpoint',
+    'merge_bootstrap_shards': 'checkpoint',
+    'grouped_bootstrap_confidence_interval': 'grouped',
+    'BootstrapService': 'service',
+    'Recorder': 'instrumentation',
+    'instrument': 'instrumentation',
+    'ResultCache': 'cache',
+    'default_result_cache': 'cache',
+    'QuantileSketch': 'qq',
+    'build_quantile_sketch': 'qq',
+    'qq_sketch_points': 'qq',
+}
+
+__all__ = sorted(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+    # Cache on the package so later lookups skip __getattr__
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,168 @@
+'''
+Helpers shared by the resampling and simulation routines: random state handling,
+the default memory ceiling for temporary blocks, index dtypes, chunked reading of data sources
+and the on-disk cache directory.
+'''
+
+import os
+
+import numpy as np
+
+from .instrumentation import active_recorder, phase
+from .sources import open_source
+
+# Default ceiling for the temporary index/value or weight blocks used while resampling (256 MB)
+DEFAULT_MAX_MEMORY_BYTES = 256 * 1024 ** 2
+
+# Number of resamples per seeded chunk; fixed so results don't depend on the worker count or memory ceiling
+DEFAULT_CHUNK_SIZE = 1000
+
+# Observations per Poisson weight block; fixed so results don't depend on the memory ceiling or source chunking
+POISSON_BLOCK_VALUES = 4096
+
+# Environment variable that overrides the on-disk cache directory (distribution tables, cached results)
+CACHE_DIR_ENV = 'SAMPLING_DISTRIBUTIONS_CACHE_DIR'
+
+# Function to resolve the on-disk cache directory; False disables the disk tier
+def resolve_cache_dir(cache_dir):
+    if cache_dir is False:
+        return None
+    if cache_dir is None:
+        cache_dir = os.environ.get(CACHE_DIR_ENV) or os.path.join(
+            os.path.expanduser('~'), '.cache', 'sampling_distributions')
+    return cache_dir
+
+# Function to pick the narrowest unsigned integer dtype whose values cover indices 0..n-1
+def narrow_index_dtype(n):
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if n <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+# Function to draw indices 0..n-1 in the given dtype. numpy buffers uint8/uint16 draws within each call,
+# so their stream would depend on how the draws are split into calls (block size, per-resample loop);
+# uint32 and int64 draws do not, so narrower indices are drawn as uint32 and narrowed afterwards.
+def draw_indices(rng, n, size, dtype=np.int64):
+    dtype = np.dtype(dtype)
+    if dtype.itemsize >= 4:
+        return rng.integers(0, n, size=size, dtype=dtype)
+    return rng.integers(0, n, size=size, dtype=np.uint32).astype(dtype)
+
+# Function to count the bytes per drawn index, including the uint32 draw a narrower dtype is cast from
+def index_draw_bytes(dtype):
+    dtype = np.dtype(dtype)
+    return dtype.itemsize if dtype.itemsize >= 4 else dtype.itemsize + 4
+
+# Function to draw a seed from the global state so np.random.seed() still makes runs reproducible
+def _global_seed():
+    return np.random.randint(0, 2**31 - 1)
+
+# Function to turn None/int/SeedSequence/Generator into a numpy Generator
+def as_generator(random_state):
+    if isinstance(random_state, np.random.Generator):
+        return random_state
+    if random_state is None:
+        random_state = _global_seed()
+    return np.random.default_rng(random_state)
+
+# Function to turn None/int/SeedSequence/Generator into the SeedSequence child streams are spawned from
+def as_seed_sequence(random_state):
+    if isinstance(random_state, np.random.SeedSequence):
+        # A copy, since spawn() advances the caller's sequence and a second call would get other children
+        return np.random.SeedSequence(random_state.entropy, spawn_key=random_state.spawn_key,
+                                      pool_size=random_state.pool_size,
+                                      n_children_spawned=random_state.n_children_spawned)
+    if isinstance(random_state, np.random.Generator):
+        # Entropy drawn from the generator: a seeded generator gives reproducible streams, and moves on
+        return np.random.SeedSequence(random_state.integers(0, 2 ** 63, size=4).tolist())
+    if random_state is None:
+        random_state = _global_seed()
+    return np.random.SeedSequence(random_state)
+
+# Function to accumulate the Poisson(1)-weighted count, sum and (optionally) sum of squares of every
+# replicate in one pass over a source. Values are shifted by the first observation so the variance
+# does not suffer from cancellation. As for index resampling, the replicates are cut into chunks of
+# DEFAULT_CHUNK_SIZE with one child stream each, and the data into blocks of POISSON_BLOCK_VALUES
+# observations whatever the source's own chunking, so a seeded run draws the same weights for any
+# max_memory_bytes (the ceiling only splits each (replicates, block) draw into row bands) and gives
+# the same replicates up to the rounding of the weighted sums.
+# A replicate that drew no observation at all (only likely for tiny samples) has no mean or
+# variance; with drop_empty=True it is left out, so fewer than num_replicates may come back.
+def poisson_moments(source, num_replicates, random_state=None, max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES,
+                    squares=True, drop_empty=True):
+    chunk_sizes = [min(DEFAULT_CHUNK_SIZE, num_replicates - start)
+                   for start in range(0, num_replicates, DEFAULT_CHUNK_SIZE)]
+    rngs = [np.random.default_rng(seed) for seed in as_seed_sequence(random_state).spawn(len(chunk_sizes))]
+    # Rows per weight draw so the (rows, block) weights and their float64 copy stay under the ceiling
+    band = max(1, int(max_memory_bytes) // (16 * POISSON_BLOCK_VALUES))
+
+    weight_totals = np.zeros(num_replicates)
+    weighted_sums = np.zeros(num_replicates)
+    weighted_squares = np.zeros(num_replicates) if squares else None
+    shift = None
+
+    recorder = active_recorder()
+    for block in _iter_fixed_blocks(source, POISSON_BLOCK_VALUES):
+        block = block.astype(np.float64, copy=False)
+        if shift is None:
+            shift = block[0]
+        centred = block - shift
+        centred_squares = centred * centred if squares else None
+        first = 0
+        for rng, chunk_size in zip(rngs, chunk_sizes):
+            # Row bands of one chunk continue its stream, so the band height does not change the draws
+            for start in range(first, first + chunk_size, band):
+                rows = slice(start, min(start + band, first + chunk_size))
+                # How many times each observation appears in each replicate
+                with phase(recorder, 'weights'):
+                    weights = rng.poisson(1.0, size=(rows.stop - rows.start, len(block))).astype(np.float64)
+                with phase(recorder, 'accumulate'):
+                    weight_totals[rows] += weights.sum(axis=1)
+                    weighted_sums[rows] += weights @ centred
+                    if squares:
+                        weighted_squares[rows] += weights @ centred_squares
+                if recorder is not None:
+                    recorder.peak('peak_block_bytes', weights.nbytes)
+            first += chunk_size
+        if recorder is not None:
+            recorder.add('values_read', len(block))
+
+    if shift is None:
+        raise ValueError('the data source has no values')
+    if not drop_empty:
+        return weight_totals, weighted_sums, weighted_squares, shift
+    drawn = weight_totals > 0
+    if not drawn.any():
+        raise ValueError('no Poisson bootstrap replicate drew any observation: the sample is too small, '
+                         'use index resampling (bootstrap_confidence_interval) instead')
+    return (weight_totals[drawn], weighted_sums[drawn], weighted_squares[drawn] if squares else None, shift)
+
+# Function to iterate over a data source in blocks of exactly block_size values (the last one may be shorter),
+# however the source itself is chunked
+def _iter_fixed_blocks(source, block_size):
+    pending, filled = [], 0
+    for chunk in iter_chunks(source, block_size):
+        pending.append(chunk)
+        filled += len(chunk)
+        if filled >= block_size:
+            joined = np.concatenate(pending)
+            for start in range(0, len(joined) - block_size + 1, block_size):
+                yield joined[start:start + block_size]
+            rest = joined[len(joined) - len(joined) % block_size:]
+            pending, filled = [rest], len(rest)
+    if filled:
+        yield np.concatenate(pending)
+
+# Function to iterate over a data source in chunks: array, np.memmap, file path (.npy, raw binary, CSV)
+# or iterable of arrays such as a CSVColumn
+def iter_chunks(source, chunk_size):
+    # Files are memory-mapped or parsed chunk by chunk, so only the chunk being processed is read
+    source = open_source(source)
+    if isinstance(source, np.ndarray):
+        for start in range(0, len(source), chunk_size):
+            yield np.asarray(source[start:start + chunk_size])
+    else:
+        for chunk in source:
+            chunk = np.asarray(chunk).ravel()
+            for start in range(0, len(chunk), chunk_size):
+                yield chunk[start:start + chunk_size]
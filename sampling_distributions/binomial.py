@@ -0,0 +1,136 @@
+'''
+Vectorized binomial tail probabilities and confidence intervals for arrays of (k, n, p).
+
+NOTE: Summing the pmf over range(0, n + 1) is fine for n = 10 but not for millions of
+    A/B rows with n up to 1e9. Everything here works element-wise on arrays and never
+    builds a range of length n: the pmf is evaluated in log space with gammaln, exact
+    tails come from the regularized incomplete beta function, and tails too small for
+    float64 are returned in log space from pmf(k) / (1 - r), r being the ratio of
+    successive pmf terms. With method='auto' each element uses the cheapest of the
+    Poisson approximation (error at most p * (1 - exp(-n p)), Barbour-Hall), the normal
+    approximation with continuity correction (error at most 0.4748 (p^2 + q^2) / sqrt(n p q),
+    Berry-Esseen) or the exact value whose error bound meets the accuracy target.
+'''
+
+import numpy as np
+
+# Interval and tail methods
+BINOMIAL_METHODS = ('auto', 'exact', 'normal', 'poisson')
+INTERVAL_METHODS = ('wilson', 'clopper-pearson')
+
+# Default accuracy target of method='auto' (absolute error of the tail probability)
+DEFAULT_TOLERANCE = 1e-6
+
+# Berry-Esseen constant for sums of independent identically distributed variables (Shevtsova)
+BERRY_ESSEEN_CONSTANT = 0.4748
+
+def _arrays(k, n, p):
+    return np.broadcast_arrays(np.asarray(k, dtype=np.float64), np.asarray(n, dtype=np.float64),
+                               np.asarray(p, dtype=np.float64))
+
+# Function to compute log P(X = k) for X ~ Binomial(n, p), element-wise
+def binomial_log_pmf(k, n, p):
+    from scipy.special import gammaln, xlog1py, xlogy
+    k, n, p = _arrays(k, n, p)
+    with np.errstate(invalid='ignore'):
+        log_pmf = gammaln(n + 1) - gammaln(k + 1) - gammaln(n - k + 1) + xlogy(k, p) + xlog1py(n - k, -p)
+    return np.where((k < 0) | (k > n), -np.inf, log_pmf)
+
+# Function to compute log P(X >= k) exactly, falling back to the geometric tail bound where it underflows
+def _log_upper_tail_exact(k, n, p):
+    from scipy.special import betainc
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tail = np.where(k <= 0, 1.0, betainc(np.maximum(k, 1), n - k + 1, p))
+        log_tail = np.log(tail)
+        # Underflowed tails: pmf(k) <= P(X >= k) <= pmf(k) / (1 - r), r = (n - k) p / ((k + 1) q),
+        # and the upper bound is tight this far into the tail
+        underflow = (tail < 1e-300) & (k <= n)
+        if underflow.any():
+            ratio = (n - k) * p / ((k + 1) * (1 - p))
+            log_bound = binomial_log_pmf(k, n, p) - np.log1p(-np.minimum(ratio, 1 - 1e-16))
+            log_tail = np.where(underflow, log_bound, log_tail)
+    return np.where(k > n, -np.inf, log_tail)
+
+# Function to choose a method per element: the cheapest one whose error bound meets the tolerance
+def _auto_methods(n, p, tolerance):
+    q = 1 - p
+    # Count whichever outcome is rarer, so the Poisson bound applies to both p near 0 and near 1
+    rare = np.minimum(p, q)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        poisson_error = rare * -np.expm1(-n * rare)
+        normal_error = BERRY_ESSEEN_CONSTANT * (p ** 2 + q ** 2) / np.sqrt(n * p * q)
+    # Indices into BINOMIAL_METHODS
+    methods = np.full(n.shape, BINOMIAL_METHODS.index('exact'))
+    methods[normal_error <= tolerance] = BINOMIAL_METHODS.index('normal')
+    methods[poisson_error <= tolerance] = BINOMIAL_METHODS.index('poisson')
+    return methods
+
+# Function to compute log P(X >= k) with one approximation (or the exact value)
+def _log_upper_tail(k, n, p, method):
+    from scipy.special import log_ndtr, pdtr, pdtrc
+    if method == 'exact':
+        return _log_upper_tail_exact(k, n, p)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if method == 'normal':
+            mean, sd = n * p, np.sqrt(n * p * (1 - p))
+            # Continuity correction: P(X >= k) ~ P(Z >= (k - 0.5 - np) / sd)
+            return np.where(k <= 0, 0.0, log_ndtr(-(k - 0.5 - mean) / sd))
+        # Poisson: count the rarer outcome; P(X >= k) = P(failures <= n - k) when p > 1/2
+        flip = p > 0.5
+        rate = n * np.where(flip, 1 - p, p)
+        upper = np.where(k <= 0, 1.0, pdtrc(np.maximum(k - 1, 0), rate))
+        # Computed directly: 1 - pdtrc(...) cancels to 0 deep in the tail, and log(0) is -inf
+        lower = np.where(n - k < 0, 0.0, pdtr(np.maximum(n - k, 0), rate))
+        return np.log(np.where(flip, lower, upper))
+
+def binomial_tail(k, n, p, tail='upper', method='auto', tolerance=DEFAULT_TOLERANCE, log=False):
+    if tail not in ('upper', 'lower'):
+        raise ValueError(f"tail must be 'upper' (P(X >= k)) or 'lower' (P(X <= k)), got {tail!r}")
+    if method not in BINOMIAL_METHODS:
+        raise ValueError(f'method must be one of {BINOMIAL_METHODS}, got {method!r}')
+    k, n, p = _arrays(k, n, p)
+
+    # P(X <= k) for Binomial(n, p) is P(Y >= n - k) for the failures Y ~ Binomial(n, 1 - p)
+    if tail == 'lower':
+        k, p = n - k, 1 - p
+
+    if method == 'auto':
+        methods = _auto_methods(n, p, tolerance)
+    else:
+        methods = np.full(n.shape, BINOMIAL_METHODS.index(method))
+    log_tail = np.empty(n.shape)
+    for index, name in enumerate(BINOMIAL_METHODS[1:], start=1):
+        selected = methods == index
+        if selected.any():
+            log_tail[selected] = _log_upper_tail(k[selected], n[selected], p[selected], name)
+
+    log_tail = np.minimum(log_tail, 0.0)
+    result = log_tail if log else np.exp(log_tail)
+    return result[()] if result.ndim == 0 else result
+
+def binomial_confidence_interval(k, n, confidence_level=95, method='wilson'):
+    from scipy.special import betaincinv, ndtri
+    if method not in INTERVAL_METHODS:
+        raise ValueError(f'method must be one of {INTERVAL_METHODS}, got {method!r}')
+    k, n, _ = _arrays(k, n, 0.0)
+    alpha = (100 - confidence_level) / 100
+
+    if method == 'clopper-pearson':
+        # Exact interval from beta quantiles; the bounds are 0 and 1 at k = 0 and k = n
+        with np.errstate(invalid='ignore'):
+            lower = np.where(k > 0, betaincinv(np.maximum(k, 1), n - k + 1, alpha / 2), 0.0)
+            upper = np.where(k < n, betaincinv(k + 1, np.maximum(n - k, 1), 1 - alpha / 2), 1.0)
+    else:
+        z = ndtri(1 - alpha / 2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            proportion = k / n
+            denominator = 1 + z ** 2 / n
+            centre = (proportion + z ** 2 / (2 * n)) / denominator
+            half_width = z * np.sqrt(proportion * (1 - proportion) / n + z ** 2 / (4 * n ** 2)) / denominator
+        # Exactly 0 and 1 at k = 0 and k = n, where centre -/+ half_width only cancels up to rounding
+        lower = np.where(k > 0, np.maximum(centre - half_width, 0.0), 0.0)
+        upper = np.where(k < n, np.minimum(centre + half_width, 1.0), 1.0)
+
+    if lower.ndim == 0:
+        return lower[()], upper[()]
+    return lower, upper
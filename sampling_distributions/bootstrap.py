@@ -0,0 +1,125 @@
+'''
+Bootstrap resampling of an initial sample.
+
+NOTE: Storing every bootstrap sample needs num_bootstrap_samples x sample_size floats
+    (100 x 1,000,000 float64 is already 800 MB). By default only the bootstrap means
+    are kept: resample indices are generated in fixed-size blocks whose size is bounded
+    by max_memory_bytes, so memory stays flat no matter how large R or n get.
+    Pass store_samples=True to keep the full matrix of resamples as well.
+
+NOTE: Compact mode (compact=True) for memory-bandwidth-bound runs.
+    Indices are kept in the narrowest unsigned dtype that covers the sample (uint8,
+    uint16 or uint32) and the data is gathered as float32, so every resampled element
+    moves 8 bytes or fewer instead of 16 and twice as many replicates fit in a block.
+    uint8/uint16 indices are drawn as uint32 and then narrowed: numpy buffers narrow
+    draws within a call, so their stream would depend on the block size.
+    Fancy indexing with a narrow index array is buffered, so it never materialises an
+    int64 copy of the indices. Sums are still accumulated in float64. For samples under
+    2^32 values both modes draw the same indices from the same seed, so the only drift
+    is the float32 rounding of the data (relative 6e-8); results are close to the
+    default mode's but not bit-identical. Stored samples are float32.
+
+NOTE: Poisson bootstrap for data that does not fit in memory.
+    Drawing n values with replacement is the same as giving every observation a
+    multinomial count; for large n those counts are practically independent Poisson(1).
+    poisson_bootstrap_means reads the data once, chunk by chunk (an array, np.memmap,
+    a .npy file or any iterable of arrays), draws Poisson(1) weights for every
+    replicate and updates R weighted running sums, so the data never has to be in RAM.
+    The weights are drawn in fixed blocks from one child stream per chunk of replicates,
+    so a seeded run draws the same weights for any max_memory_bytes. A replicate that draws no
+    observation at all (likely only for tiny samples) has no mean and is dropped, so
+    fewer than R means may come back: their number is the length of the result.
+
+NOTE: original_sample may be a file path (.npy, raw binary, CSV), an np.memmap or a
+    CSVColumn. Resample values are gathered from a memmap in sorted, block-coalesced
+    order (see sources.py), so random draws become mostly sequential reads.
+'''
+
+import numpy as np
+
+from ._common import (DEFAULT_MAX_MEMORY_BYTES, as_generator, draw_indices, index_draw_bytes, narrow_index_dtype,
+                      poisson_moments)
+from .instrumentation import active_recorder, instrumented, phase
+from .sources import GATHER_OVERHEAD_BYTES, gather, to_random_access
+
+# Function to work out how many replicates and elements fit in one resampling block
+def _block_shape(num_bootstrap_samples, sample_size, max_memory_bytes, bytes_per_element=16):
+    # Every drawn element costs one index plus one gathered value (int64 + float64 by default)
+    budget = max(1, int(max_memory_bytes) // bytes_per_element)
+    # Whole resamples fit in the budget: batch several replicates per block
+    if sample_size <= budget:
+        return max(1, min(num_bootstrap_samples, budget // sample_size)), sample_size
+    # A single resample is bigger than the budget: split it into column chunks
+    return 1, budget
+
+# Function to generate resampled values block by block without building the full matrix
+def _iter_resample_blocks(original_sample, num_bootstrap_samples, sample_size, max_memory_bytes, rng,
+                          index_dtype=np.int64):
+    index_dtype = np.dtype(index_dtype)
+    bytes_per_element = index_draw_bytes(index_dtype) + original_sample.dtype.itemsize
+    if isinstance(original_sample, np.memmap):
+        bytes_per_element += GATHER_OVERHEAD_BYTES
+    rows, cols = _block_shape(num_bootstrap_samples, sample_size, max_memory_bytes, bytes_per_element)
+    recorder = active_recorder()
+    for start in range(0, num_bootstrap_samples, rows):
+        stop = min(start + rows, num_bootstrap_samples)
+        for offset in range(0, sample_size, cols):
+            width = min(cols, sample_size - offset)
+            # Resample with replacement by drawing indices into the original sample
+            with phase(recorder, 'indices'):
+                indices = draw_indices(rng, len(original_sample), (stop - start, width), index_dtype)
+            with phase(recorder, 'gather'):
+                block = gather(original_sample, indices)
+            if recorder is not None:
+                recorder.add('bytes_gathered', block.nbytes)
+                recorder.peak('peak_block_bytes', indices.nbytes + block.nbytes)
+            yield start, stop, offset, block
+        if recorder is not None:
+            recorder.add('resamples', stop - start)
+
+# Function to perform bootstrap resampling and (optionally) store both samples and their means
+@instrumented('bootstrap_resample_and_store_samples')
+def bootstrap_resample_and_store_samples(original_sample, num_bootstrap_samples, sample_size,
+                                         store_samples=False, max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES,
+                                         random_state=None, compact=False):
+    original_sample = to_random_access(original_sample)
+    rng = as_generator(random_state)
+
+    # Compact mode: narrow indices and float32 values halve the bytes moved per resampled element
+    index_dtype, sample_dtype = np.int64, np.float64
+    if compact:
+        # A memmap is not converted up front (that would read all of it); its stored samples are cast instead
+        if not isinstance(original_sample, np.memmap):
+            original_sample = original_sample.astype(np.float32, copy=False)
+        index_dtype, sample_dtype = narrow_index_dtype(len(original_sample)), np.float32
+
+    # The full matrix of bootstrap samples is only allocated when explicitly requested
+    bootstrap_samples = np.zeros((num_bootstrap_samples, sample_size), dtype=sample_dtype) if store_samples else None
+    bootstrap_sample_sums = np.zeros(num_bootstrap_samples)
+
+    recorder = active_recorder()
+    for start, stop, offset, block in _iter_resample_blocks(
+            original_sample, num_bootstrap_samples, sample_size, max_memory_bytes, rng, index_dtype):
+        # Store the bootstrap samples
+        if store_samples:
+            with phase(recorder, 'store'):
+                bootstrap_samples[start:stop, offset:offset + block.shape[1]] = block
+        # Accumulate the sums in float64 so chunked means match the one-shot ones
+        with phase(recorder, 'statistic'):
+            bootstrap_sample_sums[start:stop] += block.sum(axis=1, dtype=np.float64)
+
+    # Calculate the mean of each bootstrap sample
+    bootstrap_sample_means = bootstrap_sample_sums / sample_size
+
+    return bootstrap_samples, bootstrap_sample_means
+
+# Function to compute bootstrap means in a single pass with Poisson(1) resampling weights
+@instrumented('poisson_bootstrap_means')
+def poisson_bootstrap_means(source, num_bootstrap_samples, max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES,
+                            random_state=None):
+    # One running weight total and weighted sum per bootstrap replicate, as the Poisson bootstrap CI keeps them
+    weight_totals, weighted_sums, _, shift = poisson_moments(source, num_bootstrap_samples, random_state,
+                                                             max_memory_bytes, squares=False)
+
+    # Calculate the mean of each bootstrap replicate
+    return weighted_sums / weight_totals + shift
@@ -0,0 +1,312 @@
+'''
+Content-addressed cache of bootstrap confidence intervals and standard-error simulations.
+
+NOTE: A result is keyed by a hash of everything that decides it: the input data (its bytes,
+    dtype and shape, hashed in chunks with BLAKE2b so memory-mapped inputs are not loaded
+    at once), the statistic, the parameters, and the seed. Pass cache=True (the shared
+    default cache) or a ResultCache to bootstrap_confidence_interval or simulate_sampling;
+    a hit returns the stored replicate statistics (bootstrap statistics or sample means)
+    together with the interval or standard error, without resampling.
+
+NOTE: Only reproducible calls are cached. Without a seed (random_state None, or a
+    Generator whose state moves on with every use), with a time budget, a checkpoint or
+    a shard, or with a statistic whose identity cannot be pinned down (lambdas, closures,
+    other local functions, bound methods, other objects carrying state, or a
+    functools.partial of one), the call simply runs. Module-level Python functions are keyed
+    by their qualified name, bytecode, default arguments and the globals they reference
+    (constants, arrays, modules, other functions), so editing one or a constant it reads
+    invalidates its results; a referenced global that cannot be pinned down makes the call
+    uncached. Compiled functions such as np.median are keyed by the module path they are
+    found under, partials by their function and bound arguments, and other callable objects
+    by their repr, unless it names a memory address.
+
+NOTE: Two tiers. Recent results stay in memory (LRU, bounded by max_memory_bytes);
+    every result is also written to cache_dir (default as for distribution tables, under
+    results/) as an .npz file. The disk tier is bounded by max_disk_bytes and evicts the
+    least recently used files, using the file modification time, which hits refresh.
+'''
+
+import functools
+import hashlib
+import os
+import sys
+import threading
+import types
+from collections import OrderedDict
+
+import numpy as np
+
+from ._common import resolve_cache_dir
+from .sources import data_digest
+
+# Default bounds of the in-memory and on-disk tiers
+DEFAULT_CACHE_MEMORY_BYTES = 256 * 1024 ** 2
+DEFAULT_CACHE_DISK_BYTES = 1024 ** 3
+
+# Memory and disk tiers of cached results, each result a {name: array} dict
+class ResultCache:
+    def __init__(self, max_memory_bytes=DEFAULT_CACHE_MEMORY_BYTES, cache_dir=None,
+                 max_disk_bytes=DEFAULT_CACHE_DISK_BYTES):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        cache_dir = resolve_cache_dir(cache_dir)
+        self.cache_dir = os.path.join(cache_dir, 'results') if cache_dir is not None else None
+        self._entries = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.counts = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.npz')
+
+    # Function to look a key up in memory, then on disk; returns a fresh copy of the arrays or None
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.counts['memory_hits'] += 1
+                return {name: array.copy() for name, array in self._entries[key].items()}
+        if self.cache_dir is not None:
+            try:
+                with np.load(self._path(key)) as stored:
+                    arrays = {name: stored[name] for name in stored.files}
+                # A hit makes the file the most recently used one
+                os.utime(self._path(key))
+            except (OSError, ValueError):
+                arrays = None
+            if arrays is not None:
+                with self._lock:
+                    self.counts['disk_hits'] += 1
+                    self._remember(key, arrays)
+                return {name: array.copy() for name, array in arrays.items()}
+        with self._lock:
+            self.counts['misses'] += 1
+        return None
+
+    def put(self, key, arrays):
+        arrays = {name: np.array(array) for name, array in arrays.items()}
+        with self._lock:
+            self._remember(key, arrays)
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write then rename, so a concurrent reader never sees a half-written file
+            temporary = f'{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp.npz'
+            np.savez(temporary, **arrays)
+            os.replace(temporary, self._path(key))
+            self._evict_disk()
+
+    # Function to add arrays to the memory tier and drop least recently used entries beyond the bound
+    def _remember(self, key, arrays):
+        size = sum(array.nbytes for array in arrays.values())
+        if size > self.max_memory_bytes:
+            return
+        if key in self._entries:
+            self._memory_bytes -= sum(array.nbytes for array in self._entries.pop(key).values())
+        self._entries[key] = arrays
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._memory_bytes -= sum(array.nbytes for array in evicted.values())
+
+    # Function to delete the least recently used result files until the disk tier fits its bound
+    def _evict_disk(self):
+        files = []
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.npz') and '.tmp.' not in entry.name:
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+        if self.cache_dir is not None and os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.npz'):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    def info(self):
+        with self._lock:
+            return {**self.counts, 'memory_entries': len(self._entries), 'memory_bytes': self._memory_bytes}
+
+_default_cache = None
+
+# Function to get the process-wide cache used by cache=True
+def default_result_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResultCache()
+    return _default_cache
+
+# Function to turn a cache argument (None, True or a ResultCache) into a ResultCache or None
+def resolve_cache(cache):
+    if cache is None or cache is False:
+        return None
+    return default_result_cache() if cache is True else cache
+
+# Function to describe a seed by value, or None when the call is not reproducible
+def _seed_key(random_state):
+    if random_state is None or isinstance(random_state, np.random.Generator):
+        return None
+    if isinstance(random_state, np.random.SeedSequence):
+        # Children spawned so far change which children a later spawn() returns
+        return ('SeedSequence', repr(random_state.entropy), tuple(random_state.spawn_key), random_state.pool_size,
+                random_state.n_children_spawned)
+    return int(random_state)
+
+# Function to feed a code object into a digest: bytecode, referenced names and constants, with nested
+# code objects (comprehensions, inner functions) hashed the same way instead of by their repr, which
+# contains a memory address, and sets sorted, since their order changes with the string hash seed
+def _hash_code(code, digest):
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for constant in code.co_consts:
+        _hash_constant(constant, digest)
+
+def _hash_constant(constant, digest):
+    if isinstance(constant, types.CodeType):
+        digest.update(b'code:')
+        _hash_code(constant, digest)
+    elif isinstance(constant, (tuple, frozenset)):
+        items = constant if isinstance(constant, tuple) else sorted(constant, key=repr)
+        digest.update(f'{type(constant).__name__}:{len(constant)}:'.encode())
+        for item in items:
+            _hash_constant(item, digest)
+    else:
+        digest.update(repr(constant).encode() + b';')
+
+# Function to collect the names a code object and the code nested in it refer to
+def _code_names(code):
+    names = set(code.co_names)
+    for constant in code.co_consts:
+        if isinstance(constant, types.CodeType):
+            names |= _code_names(constant)
+    return names
+
+# Function to check that an object is what its module path resolves to (not a bound method or other copy with state)
+def _is_module_attribute(obj):
+    module, qualname = getattr(obj, '__module__', None), getattr(obj, '__qualname__', None)
+    if not isinstance(module, str) or not isinstance(qualname, str) or '<' in qualname:
+        return False
+    target = sys.modules.get(module)
+    for part in qualname.split('.'):
+        target = getattr(target, part, None)
+    return target is obj
+
+# Function to feed a module-level function into a digest: code, defaults and the globals it reads.
+# Returns False when the function or something it reads cannot be pinned down.
+def _hash_function(func, digest, visited):
+    if id(func) in visited:
+        digest.update(f'recursion:{func.__qualname__};'.encode())
+        return True
+    visited.add(id(func))
+    if '<' in func.__qualname__ or func.__closure__ is not None:
+        return False
+    digest.update(f'function:{func.__module__}.{func.__qualname__}:'.encode())
+    _hash_code(func.__code__, digest)
+    defaults = (func.__defaults__ or ()) + tuple(sorted((func.__kwdefaults__ or {}).items()))
+    if not _hash_value(defaults, digest, visited):
+        return False
+    for name in sorted(_code_names(func.__code__)):
+        if name in func.__globals__:
+            digest.update(f'global:{name}='.encode())
+            if not _hash_value(func.__globals__[name], digest, visited):
+                return False
+    return True
+
+# Function to feed a default or global value into a digest, or return False when it cannot be pinned down
+def _hash_value(value, digest, visited):
+    if isinstance(value, (bool, int, float, complex, str, bytes, type(None))):
+        digest.update(f'{type(value).__name__}:{value!r};'.encode())
+    elif isinstance(value, (tuple, frozenset)):
+        items = value if isinstance(value, tuple) else sorted(value, key=repr)
+        digest.update(f'{type(value).__name__}:{len(value)}:'.encode())
+        return all(_hash_value(item, digest, visited) for item in items)
+    elif isinstance(value, types.ModuleType):
+        digest.update(f'module:{value.__name__};'.encode())
+    elif isinstance(value, types.FunctionType):
+        return _hash_function(value, digest, visited)
+    elif isinstance(value, np.ndarray) and value.dtype != object:
+        digest.update(f'array:{data_digest(value)};'.encode())
+    elif _is_module_attribute(value):
+        # Classes and compiled functions, identified by where they live
+        digest.update(f'attribute:{value.__module__}.{value.__qualname__};'.encode())
+    else:
+        return False
+    return True
+
+# Function to describe a statistic by identity, or None when it cannot be pinned down
+def _statistic_key(statistic_func):
+    if isinstance(statistic_func, types.FunctionType):
+        digest = hashlib.blake2b(digest_size=16)
+        if not _hash_function(statistic_func, digest, set()):
+            return None
+        return statistic_func.__module__, statistic_func.__qualname__, digest.hexdigest()
+    if _is_module_attribute(statistic_func):
+        # numpy and other compiled functions, found under their module path; bound methods are not
+        return (statistic_func.__module__, statistic_func.__qualname__)
+    if isinstance(statistic_func, (types.MethodType, types.BuiltinMethodType)):
+        return None
+    if isinstance(statistic_func, functools.partial):
+        # Keyed by the wrapped function and the bound arguments, not by a repr naming the function's address
+        func = _statistic_key(statistic_func.func)
+        digest = hashlib.blake2b(digest_size=16)
+        if func is None or not _hash_value((statistic_func.args, tuple(sorted(statistic_func.keywords.items()))),
+                                           digest, set()):
+            return None
+        return 'functools.partial', func, digest.hexdigest()
+    if type(statistic_func).__repr__ is not object.__repr__:
+        # Callable objects such as quantile(q), described by their repr unless it holds a memory address
+        description = repr(statistic_func)
+        if ' at 0x' in description:
+            return None
+        return (type(statistic_func).__module__, type(statistic_func).__qualname__, description)
+    return None
+
+# Function to turn a statistic's identity into a hex digest (e.g. for checkpoint manifests), or None
+def statistic_digest(statistic_func):
+    key = _statistic_key(statistic_func)
+    return hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest() if key is not None else None
+
+# Function to hash the data and parameters of a call into a cache key
+def result_key(kind, data, **params):
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(repr((kind, sorted(params.items()))).encode())
+    if data is not None:
+        digest.update(data_digest(data).encode())
+    return digest.hexdigest()
+
+# Function to build the key of a bootstrap_confidence_interval call, or None when it must not be cached
+# (the resamples do not depend on max_memory_bytes, so it is not part of the key)
+def bootstrap_cache_key(data, statistic_func, R, confidence_level, random_state, chunk_size, tolerance, method,
+                        compact=False):
+    seed, statistic = _seed_key(random_state), _statistic_key(statistic_func)
+    if seed is None or statistic is None:
+        return None
+    return result_key('bootstrap_confidence_interval', data, statistic=statistic, R=int(R),
+                      confidence_level=float(confidence_level), seed=seed, chunk_size=int(chunk_size),
+                      tolerance=tolerance, method=method, compact=bool(compact))
+
+# Function to build the key of a simulate_sampling call, or None when it must not be cached
+def simulation_cache_key(population_mean, population_std, sample_size, num_samples, return_means, max_memory_bytes,
+                         random_state, compact):
+    seed = _seed_key(random_state)
+    if seed is None:
+        return None
+    return result_key('simulate_sampling', None, population_mean=float(population_mean),
+                      population_std=float(population_std), sample_size=int(sample_size),
+                      num_samples=int(num_samples), return_means=bool(return_means),
+                      max_memory_bytes=int(max_memory_bytes), seed=seed, compact=bool(compact))
@@ -0,0 +1,174 @@
+'''
+Checkpointed, resumable and sharded bootstrap runs.
+
+NOTE: bootstrap_confidence_interval already cuts R into fixed-size chunks, and chunk i
+    always draws from child stream i of one root SeedSequence. The RNG state of a run is
+    therefore fully described by the root seed plus the set of finished chunks. A
+    BootstrapStore keeps exactly that on disk: manifest.json records the root seed, the
+    run's shape (R, chunk size, sample size), a content hash of the data and a digest of the
+    statistic (its code, defaults and globals, as cache.py keys it), so a resume or merge on
+    different data or with a different or edited statistic is refused. Lambdas and closures
+    have no such digest; checkpointing them needs an explicit run_id. statistics.bin is an
+    append-only log with one record per finished chunk (chunk index, length, values),
+    flushed and fsync'ed as each chunk completes. A killed run loses at most the chunks
+    in flight; rerunning with the same checkpoint_dir loads the finished chunks, draws
+    only the missing ones and gives a bit-identical result. A record torn by the kill
+    is detected by its length and cut off.
+
+NOTE: shard=(index, count) runs only the chunks i with i % count == index, so shards on
+    different nodes use disjoint child streams of the same root seed. merge_bootstrap_shards
+    reads the shard stores, checks that they belong to the same run and cover every chunk
+    once, and computes the interval from the chunks in order: the same statistics and
+    interval a single-node run would have produced.
+'''
+
+import json
+import os
+
+import numpy as np
+
+from ._common import DEFAULT_MAX_MEMORY_BYTES
+
+MANIFEST_NAME = 'manifest.json'
+LOG_NAME = 'statistics.bin'
+
+# Manifest fields that must agree between a store and the run resuming (or merging) it
+RUN_FIELDS = ('R', 'chunk_size', 'sample_size', 'data_hash', 'studentized', 'compact', 'statistic',
+              'statistic_hash', 'run_id', 'entropy', 'spawn_key', 'n_children_spawned')
+
+# Function to describe a root SeedSequence so it can be rebuilt exactly
+def seed_fields(seed_sequence):
+    entropy = seed_sequence.entropy
+    return {'entropy': list(entropy) if isinstance(entropy, (list, tuple, np.ndarray)) else int(entropy),
+            'spawn_key': [int(key) for key in seed_sequence.spawn_key],
+            'n_children_spawned': int(seed_sequence.n_children_spawned)}
+
+# On-disk store of one (shard of a) bootstrap run: manifest plus append-only log of chunk statistics
+class BootstrapStore:
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        self._manifest = None
+
+    @property
+    def manifest(self):
+        if self._manifest is None:
+            with open(os.path.join(self.path, MANIFEST_NAME)) as f:
+                self._manifest = json.load(f)
+        return self._manifest
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.path, MANIFEST_NAME))
+
+    # Function to start a new store, or check that an existing one belongs to the same run
+    def open(self, manifest):
+        if not self.exists():
+            os.makedirs(self.path, exist_ok=True)
+            temporary = os.path.join(self.path, MANIFEST_NAME + '.tmp')
+            with open(temporary, 'w') as f:
+                json.dump(manifest, f, indent=1)
+            os.replace(temporary, os.path.join(self.path, MANIFEST_NAME))
+            self._manifest = dict(manifest)
+            return self
+        stored = self.manifest
+        for field in RUN_FIELDS + ('shard',):
+            if stored.get(field) != manifest.get(field):
+                raise ValueError(f'checkpoint {self.path!r} belongs to a different run: {field} is '
+                                 f'{stored.get(field)!r} there, {manifest.get(field)!r} here')
+        return self
+
+    # Function to rebuild the root SeedSequence the run's chunk streams are spawned from
+    def seed_sequence(self):
+        manifest = self.manifest
+        return np.random.SeedSequence(manifest['entropy'], spawn_key=tuple(manifest['spawn_key']),
+                                      n_children_spawned=manifest['n_children_spawned'])
+
+    # Function to read the finished chunks as {chunk index: values}, cutting off a torn last record
+    def completed(self):
+        rows = 2 if self.manifest['studentized'] else 1
+        log = os.path.join(self.path, LOG_NAME)
+        if not os.path.exists(log):
+            return {}
+        chunks, valid = {}, 0
+        with open(log, 'rb') as f:
+            while True:
+                header = np.fromfile(f, dtype=np.int64, count=2)
+                if len(header) < 2:
+                    break
+                chunk_index, length = int(header[0]), int(header[1])
+                values = np.fromfile(f, dtype=np.float64, count=length)
+                if len(values) < length:
+                    break
+                chunks[chunk_index] = values.reshape(rows, -1) if rows > 1 else values
+                valid = f.tell()
+        if valid < os.path.getsize(log):
+            os.truncate(log, valid)
+        return chunks
+
+    # Function to append one finished chunk and make it durable before moving on
+    def append(self, chunk_index, values):
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        with open(os.path.join(self.path, LOG_NAME), 'ab') as f:
+            np.array([chunk_index, values.size], dtype=np.int64).tofile(f)
+            values.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def __repr__(self):
+        return f'BootstrapStore({self.path!r})'
+
+# Function to merge shard stores of one run into its bootstrap statistics and confidence interval.
+# 'bca' and 'studentized' also need the original data and statistic_func; a given statistic_func
+# must be the one the shards were computed with.
+def merge_bootstrap_shards(paths, confidence_level, method='percentile', data=None, statistic_func=None,
+                           max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES):
+    from .cache import statistic_digest
+    from .confidence_intervals import (INTERVAL_METHODS, _bca_interval, _percentile_interval,
+                                       _studentized_interval)
+    from .sources import data_digest, to_random_access
+
+    if method not in INTERVAL_METHODS:
+        raise ValueError(f"method must be one of {INTERVAL_METHODS}, got {method!r}")
+    if method != 'percentile' and (data is None or statistic_func is None):
+        raise ValueError(f"method={method!r} needs the original data and statistic_func")
+
+    stores = [BootstrapStore(path) for path in paths]
+    if not stores:
+        raise ValueError('no shards to merge')
+    first = stores[0].manifest
+    chunks = {}
+    for store in stores:
+        for field in RUN_FIELDS:
+            if store.manifest.get(field) != first.get(field):
+                raise ValueError(f'{store.path!r} is a shard of a different run: {field} differs')
+        for chunk_index, values in store.completed().items():
+            if chunk_index in chunks:
+                raise ValueError(f'chunk {chunk_index} appears in more than one shard')
+            chunks[chunk_index] = values
+    num_chunks = -(-first['R'] // first['chunk_size'])
+    missing = num_chunks - len(chunks)
+    if missing:
+        raise ValueError(f'{missing} of {num_chunks} chunks are missing: resume the unfinished shards first')
+    if data is not None:
+        data = to_random_access(data)
+        if data_digest(data) != first.get('data_hash'):
+            raise ValueError('data differs from the data the shards were computed on')
+    if statistic_func is not None:
+        statistic_hash = statistic_digest(statistic_func)
+        if statistic_hash is None and first.get('run_id') is None:
+            raise ValueError('statistic_func cannot be identified across runs and the shards have no run_id')
+        if statistic_hash != first.get('statistic_hash'):
+            raise ValueError('statistic_func differs from the statistic the shards were computed with')
+    if first['studentized'] != (method == 'studentized'):
+        raise ValueError("studentized runs can only be merged with method='studentized' and vice versa")
+
+    bootstrap_statistics = np.concatenate([chunks[i] for i in range(num_chunks)], axis=-1)
+    if method == 'bca':
+        confidence_interval = _bca_interval(data, statistic_func, bootstrap_statistics,
+                                            confidence_level, max_memory_bytes)
+    elif method == 'studentized':
+        bootstrap_statistics, bootstrap_standard_errors = bootstrap_statistics
+        confidence_interval = _studentized_interval(data, statistic_func, bootstrap_statistics,
+                                                    bootstrap_standard_errors, confidence_level, max_memory_bytes)
+    else:
+        confidence_interval = _percentile_interval(bootstrap_statistics, confidence_level)
+    return bootstrap_statistics, confidence_interval
@@ -0,0 +1,624 @@
+'''
+Bootstrap confidence intervals.
+
+NOTE: The R resamples are independent, so they can be spread over several cores.
+    R is cut into fixed-size chunks and every chunk gets its own random stream spawned
+    from one SeedSequence. Because the chunking does not depend on the number of workers,
+    the same random_state gives a bit-identical interval on 1 or 64 cores.
+
+NOTE: When the data does not fit in memory, poisson_bootstrap_confidence_interval
+    replaces "draw n values with replacement" by giving every observation an
+    independent Poisson(1) count in each replicate. The data is read once, in chunks,
+    from an array, np.memmap, .npy file or any iterable of arrays, while R weighted
+    accumulators are updated online. Only moment statistics (mean, sum, var, std)
+    can be accumulated this way. As with index resampling, a seeded run draws the same
+    weights for any max_memory_bytes. A replicate that drew no observation has a sum of 0 but
+    no mean or variance; for those it is left out, and len(bootstrap_statistics) reports
+    how many replicates were used.
+
+NOTE: Calling statistic_func once per resample costs Python overhead R times, which
+    dominates for small n and large R. Well-known reducers (np.mean, np.sum, np.var,
+    np.std, np.median, proportions of 0/1 data via np.mean, and quantile(q)) are instead
+    evaluated over a whole (replicates, n) block of resamples with one axis-wise call.
+    Any statistic exposing a batched(block) method joins the fast path; other callables
+    keep using the per-resample loop. Both paths draw exactly the same resamples.
+
+NOTE: A fixed R either over-spends or leaves noisy endpoints. Passing tolerance
+    (in units of the statistic) and/or time_budget (seconds) turns R into a maximum:
+    resampling runs chunk by chunk, the Monte Carlo error of both percentile endpoints
+    is estimated after each chunk, and the run stops once it is below tolerance or the
+    time is up. len(bootstrap_statistics) reports how many resamples were actually used.
+
+NOTE: On skewed data (exponential, Pareto) the plain percentile interval undercovers and
+    needs many resamples. method='bca' (bias-corrected and accelerated) and
+    method='studentized' (bootstrap-t) are second-order accurate alternatives.
+    Both need jackknife (leave-one-out) values. For mean, sum, var and std these come
+    in closed form from running sums in O(n); batched statistics get them from blocks
+    of leave-one-out index rows, and only opaque callables fall back to n separate calls.
+    The jackknife standard error is unreliable for non-smooth statistics such as the
+    median (resamples full of ties get a standard error of 0), so 'studentized' refuses
+    median, min, max and quantile(q); use 'bca' for them. Resamples whose standard error
+    is 0 up to rounding are left out of the bootstrap-t distribution.
+
+NOTE: data may also be a file path (.npy, raw binary, CSV), an np.memmap or a CSVColumn.
+    Memory maps are resampled in place with sorted, block-coalesced gathers (see
+    sources.py) and process-pool workers reopen the map instead of receiving a pickled
+    copy; sequential readers are spilled to a temporary memmap once.
+
+NOTE: checkpoint_dir appends every finished chunk to an on-disk store so a killed run
+    resumes where it stopped, and shard=(index, count) splits one run across nodes; see
+    checkpoint.py and merge_bootstrap_shards.
+
+NOTE: compact=True resamples as bootstrap.py's compact mode does: indices are kept in the
+    narrowest unsigned dtype that covers the data (drawn as uint32, so the stream does not
+    depend on the block size) and the resamples are gathered as float32, so each resampled
+    element moves 8 bytes or fewer instead of 16 and a block holds twice as many replicates.
+    Moments still accumulate in float64 and the jackknife of 'bca' and 'studentized' uses
+    the original data. For data under 2^32 values the indices are those of the default
+    mode, so the statistics differ only by the float32 rounding of the data; they are not
+    bit-identical, so compact runs are cached and checkpointed separately.
+
+NOTE: cache=True (or a ResultCache) memoizes seeded calls by a hash of the data and
+    parameters, in memory and on disk; see cache.py.
+
+NOTE: Under instrumentation.instrument() each block of resamples is timed in three phases,
+    indices (drawing), gather and statistic, plus percentile and jackknife, with counters
+    for resamples and bytes gathered; see instrumentation.py.
+
+NOTE: bootstrap_confidence_intervals computes many statistics (and confidence levels) from
+    one set of R resamples instead of redrawing and re-gathering them per statistic.
+    Within a block of resamples the plain statistics are evaluated first; then the block
+    is sorted once, in place, and every order statistic (median, min, max, quantile(q))
+    is read off that sorted buffer with the same linear interpolation np.quantile uses.
+    The resamples are those of bootstrap_confidence_interval with the same random_state
+    and chunk_size, so each interval matches the single-statistic call.
+'''
+import functools
+import os
+import time
+from contextlib import nullcontext
+from contextvars import copy_context
+
+import numpy as np
+
+from ._common import (DEFAULT_CHUNK_SIZE, DEFAULT_MAX_MEMORY_BYTES, as_seed_sequence, draw_indices, index_draw_bytes,
+                      narrow_index_dtype, poisson_moments)
+from .cache import bootstrap_cache_key, resolve_cache, statistic_digest
+from .instrumentation import active_recorder, instrumented, phase
+from .sources import (GATHER_OVERHEAD_BYTES, MemmapReference, data_digest, gather, memmap_reference, open_reference,
+                      to_random_access)
+
+# Moment statistics: accumulated online by the Poisson bootstrap, closed-form leave-one-out values
+MOMENT_STATISTICS = {np.mean: 'mean', np.sum: 'sum', np.var: 'var', np.std: 'std'}
+
+# Interval methods bootstrap_confidence_interval understands
+INTERVAL_METHODS = ('percentile', 'bca', 'studentized')
+
+# Batched versions of well-known reducers: each maps a (replicates, n) block to one value per row.
+# Moments accumulate in float64, so compact (float32) blocks only carry the rounding of the data.
+BATCHED_STATISTICS = {
+    np.mean: lambda block: np.mean(block, axis=1, dtype=np.float64),
+    np.sum: lambda block: np.sum(block, axis=1, dtype=np.float64),
+    np.var: lambda block: np.var(block, axis=1, dtype=np.float64),
+    np.std: lambda block: np.std(block, axis=1, dtype=np.float64),
+    np.median: lambda block: np.median(block, axis=1),
+}
+
+# Data, statistic and memory ceiling held by each process-pool worker, set once by the pool initializer
+_worker_state = {}
+
+# A q-quantile statistic that works both per resample and over a block of resamples
+class quantile:
+    def __init__(self, q):
+        self.q = q
+
+    def __call__(self, resample):
+        return np.quantile(resample, self.q)
+
+    def batched(self, block):
+        return np.quantile(block, self.q, axis=1)
+
+    def __repr__(self):
+        return f'quantile({self.q!r})'
+
+# Function to read the q-quantile of every row of a row-sorted block, as np.quantile's linear method does
+def _sorted_quantile(sorted_block, q):
+    position = q * (sorted_block.shape[1] - 1)
+    lower = int(np.floor(position))
+    upper = min(lower + 1, sorted_block.shape[1] - 1)
+    fraction = position - lower
+    a, b = sorted_block[:, lower], sorted_block[:, upper]
+    difference = b - a
+    return a + difference * fraction if fraction < 0.5 else b - difference * (1 - fraction)
+
+# Function to read the median of every row of a row-sorted block, as np.median does
+def _sorted_median(sorted_block):
+    n = sorted_block.shape[1]
+    if n % 2:
+        return sorted_block[:, n // 2]
+    return (sorted_block[:, n // 2 - 1] + sorted_block[:, n // 2]) / 2
+
+# Function to name a statistic in multi-statistic results
+def _statistic_name(statistic_func):
+    return getattr(statistic_func, '__name__', None) or repr(statistic_func)
+
+# Function to tell whether a statistic can be read off a row-sorted block
+def _is_order_statistic(statistic_func):
+    return (any(statistic_func is order for order in (np.median, np.min, np.max))
+            or (isinstance(statistic_func, quantile) and np.ndim(statistic_func.q) == 0))
+
+# Function to read an order statistic (median, min, max, scalar quantile) off a row-sorted block
+def _order_statistic(statistic_func, sorted_block):
+    if statistic_func is np.median:
+        return _sorted_median(sorted_block)
+    if statistic_func is np.min:
+        return sorted_block[:, 0]
+    if statistic_func is np.max:
+        return sorted_block[:, -1]
+    return _sorted_quantile(sorted_block, statistic_func.q)
+
+# Several statistics evaluated on the same resamples: batched(block) returns one row per statistic.
+# Order statistics share a single in-place sort of the block.
+class _StatisticSet:
+    def __init__(self, statistics):
+        for name, statistic_func in statistics.items():
+            # One row per statistic: several quantiles are several statistics
+            if isinstance(statistic_func, quantile) and np.ndim(statistic_func.q) != 0:
+                raise ValueError(f'statistic {name!r} is quantile({statistic_func.q!r}) with several q: '
+                                 f'pass one quantile(q) per q')
+        self.names = list(statistics)
+        self.functions = list(statistics.values())
+        self.shape = (len(self.functions),)
+
+    # Function to evaluate every statistic on a (replicates, n) block; the block is sorted in place
+    def batched(self, block):
+        values = np.zeros((len(self.functions), block.shape[0]))
+        ordered = []
+        for row, statistic_func in enumerate(self.functions):
+            if _is_order_statistic(statistic_func):
+                ordered.append(row)
+                continue
+            batched = _batched_statistic(statistic_func)
+            values[row] = batched(block) if batched is not None else [statistic_func(resample) for resample in block]
+        if ordered:
+            # One sort serves every order statistic
+            block.sort(axis=1)
+            for row in ordered:
+                values[row] = _order_statistic(self.functions[row], block)
+        return values
+
+    def __call__(self, resample):
+        return self.batched(np.array(resample, ndmin=2))[:, 0]
+
+    def __repr__(self):
+        return f'_StatisticSet({self.names!r})'
+
+# Function to find the block-at-a-time version of a statistic, or None for opaque callables
+def _batched_statistic(statistic_func):
+    try:
+        batched = BATCHED_STATISTICS.get(statistic_func)
+    except TypeError:
+        # Unhashable callables can only be batched through their own method
+        batched = None
+    return batched or getattr(statistic_func, 'batched', None)
+
+# Function to name a moment statistic ('mean', 'sum', 'var', 'std'), or None for anything else
+def _moment_name(statistic_func):
+    try:
+        return MOMENT_STATISTICS.get(statistic_func)
+    except TypeError:
+        return None
+
+# Function to compute the n leave-one-out values of a moment statistic along the last axis in O(n)
+def _leave_one_out_moments(values, name):
+    n = values.shape[-1]
+    if name == 'sum':
+        return values.sum(axis=-1, keepdims=True) - values
+    # Centre first so the variance does not suffer from cancellation
+    mean = values.mean(axis=-1, keepdims=True)
+    centred = values - mean
+    loo_means = (centred.sum(axis=-1, keepdims=True) - centred) / (n - 1)
+    if name == 'mean':
+        return loo_means + mean
+    loo_squares = ((centred ** 2).sum(axis=-1, keepdims=True) - centred ** 2) / (n - 1)
+    loo_vars = np.maximum(loo_squares - loo_means ** 2, 0.0)
+    return loo_vars if name == 'var' else np.sqrt(loo_vars)
+
+# Function to compute the n jackknife (leave-one-out) values of a statistic on 1-D data
+@instrumented('jackknife')
+def _jackknife_values(data, statistic_func, max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES):
+    name = _moment_name(statistic_func)
+    if name is not None:
+        return _leave_one_out_moments(data.astype(np.float64, copy=False), name)
+
+    n = len(data)
+    jackknife_values = np.zeros(n)
+    batched = _batched_statistic(statistic_func)
+    if batched is None:
+        for i in range(n):
+            jackknife_values[i] = statistic_func(np.delete(data, i))
+        return jackknife_values
+
+    # Row i of a block holds the indices 0..n-1 without i
+    positions = np.arange(n - 1)
+    rows = max(1, int(max_memory_bytes) // (16 * max(1, n)))
+    for start in range(0, n, rows):
+        left_out = np.arange(start, min(start + rows, n))[:, None]
+        jackknife_values[start:start + rows] = batched(data[positions + (positions >= left_out)])
+    return jackknife_values
+
+# Function to turn leave-one-out values (along the last axis) into the jackknife standard error
+def _jackknife_standard_error(jackknife_values):
+    n = jackknife_values.shape[-1]
+    deviations = jackknife_values - jackknife_values.mean(axis=-1, keepdims=True)
+    return np.sqrt((n - 1) / n * (deviations ** 2).sum(axis=-1))
+
+# Function to compute the jackknife standard error of every resample in a (replicates, n) block
+def _block_standard_errors(resamples, statistic_func, max_memory_bytes):
+    name = _moment_name(statistic_func)
+    if name is not None:
+        return _jackknife_standard_error(_leave_one_out_moments(resamples.astype(np.float64, copy=False), name))
+    return np.array([_jackknife_standard_error(_jackknife_values(resample, statistic_func, max_memory_bytes))
+                     for resample in resamples])
+
+# Function to compute the statistic for one chunk of resamples from its own random stream.
+# With studentized=True it returns a (2, num_resamples) array: the statistics and their standard errors.
+# With compact=True indices are drawn in the narrowest dtype that covers the data and resamples are float32.
+def _bootstrap_chunk(data, statistic_func, num_resamples, seed_sequence,
+                     max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES, studentized=False, compact=False):
+    rng = np.random.default_rng(seed_sequence)
+    index_dtype = narrow_index_dtype(len(data)) if compact else np.dtype(np.int64)
+    # A memmap is not converted up front (that would read all of it); its gathered values are cast instead
+    take = gather if not compact or data.dtype == np.float32 else (
+        lambda data, indices: gather(data, indices).astype(np.float32, copy=False))
+    recorder = active_recorder()
+    # A statistic set yields several values per resample: one row each
+    chunk_statistics = np.zeros(getattr(statistic_func, 'shape', ()) + (num_resamples,))
+    chunk_standard_errors = np.zeros(num_resamples) if studentized else None
+
+    batched = _batched_statistic(statistic_func)
+    if batched is not None:
+        # Replicates per block so the indices and gathered values stay under the ceiling
+        bytes_per_element = (index_draw_bytes(index_dtype) + (4 if compact else 8)
+                             + (GATHER_OVERHEAD_BYTES if isinstance(data, np.memmap) else 0))
+        rows = max(1, int(max_memory_bytes) // (bytes_per_element * max(1, len(data))))
+        for start in range(0, num_resamples, rows):
+            stop = min(start + rows, num_resamples)
+            # Row-major draws: the same indices the per-resample loop would use
+            with phase(recorder, 'indices'):
+                indices = draw_indices(rng, len(data), (stop - start, len(data)), index_dtype)
+            with phase(recorder, 'gather'):
+                resamples = take(data, indices)
+            with phase(recorder, 'statistic'):
+                chunk_statistics[..., start:stop] = batched(resamples)
+            if studentized:
+                with phase(recorder, 'standard_errors'):
+                    chunk_standard_errors[start:stop] = _block_standard_errors(resamples, statistic_func,
+                                                                               max_memory_bytes)
+            if recorder is not None:
+                recorder.add('resamples', stop - start)
+                recorder.add('bytes_gathered', resamples.nbytes)
+                recorder.peak('peak_block_bytes', indices.nbytes + resamples.nbytes)
+        return chunk_statistics if not studentized else np.stack([chunk_statistics, chunk_standard_errors])
+
+    # One trace event per resample would swamp the trace: time the calls in aggregate instead
+    draw, evaluate = functools.partial(draw_indices, rng, len(data), dtype=index_dtype), statistic_func
+    if recorder is not None:
+        draw, take, evaluate = (recorder.timed('indices', draw), recorder.timed('gather', take),
+                                recorder.timed('statistic', evaluate))
+    for i in range(num_resamples):
+        # Resample with replacement from the original data
+        resample = take(data, draw(len(data)))
+        # Calculate and store the statistic for this resample
+        chunk_statistics[..., i] = evaluate(resample)
+        if studentized:
+            chunk_standard_errors[i] = _jackknife_standard_error(
+                _jackknife_values(resample, statistic_func, max_memory_bytes))
+    if recorder is not None:
+        recorder.add('resamples', num_resamples)
+        recorder.add('bytes_gathered', num_resamples * len(data) * (4 if compact else data.dtype.itemsize))
+    return chunk_statistics if not studentized else np.stack([chunk_statistics, chunk_standard_errors])
+
+# Process-pool initializer: ship the data to each worker once instead of once per chunk
+def _init_worker(data, statistic_func, max_memory_bytes, studentized, compact=False):
+    _worker_state['data'] = open_reference(data) if isinstance(data, MemmapReference) else data
+    _worker_state['statistic_func'] = statistic_func
+    _worker_state['max_memory_bytes'] = max_memory_bytes
+    _worker_state['studentized'] = studentized
+    _worker_state['compact'] = compact
+
+def _bootstrap_chunk_in_worker(num_resamples, seed_sequence):
+    return _bootstrap_chunk(_worker_state['data'], _worker_state['statistic_func'], num_resamples,
+                            seed_sequence, _worker_state['max_memory_bytes'], _worker_state['studentized'],
+                            _worker_state['compact'])
+
+# Function to open the worker pool for a run, or a null context when running serially
+def _open_pool(n_jobs, executor, num_chunks, data, statistic_func, max_memory_bytes, studentized, compact=False):
+    if n_jobs == 1 or num_chunks == 1:
+        return nullcontext(None)
+    # Imported here: concurrent.futures, and multiprocessing above all, add noticeably to the package import time
+    if executor == 'thread':
+        from concurrent.futures import ThreadPoolExecutor
+        return ThreadPoolExecutor(max_workers=n_jobs)
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                               initargs=(memmap_reference(data) or data, statistic_func, max_memory_bytes,
+                                         studentized, compact))
+
+# Function to run a group of chunks, yielding their statistics in chunk order
+def _run_chunks(pool, data, statistic_func, chunk_sizes, chunk_seeds, max_memory_bytes, studentized, compact=False):
+    if pool is None:
+        # Lazy, so an adaptive run stops drawing as soon as it is told to
+        return (_bootstrap_chunk(data, statistic_func, size, seed, max_memory_bytes, studentized, compact)
+                for size, seed in zip(chunk_sizes, chunk_seeds))
+    from concurrent.futures import ThreadPoolExecutor
+    if isinstance(pool, ThreadPoolExecutor):
+        # Each task runs in a copy of the caller's context, so an active recorder follows it into the thread
+        return pool.map(lambda size, seed, context: context.run(_bootstrap_chunk, data, statistic_func, size, seed,
+                                                                max_memory_bytes, studentized, compact),
+                        chunk_sizes, chunk_seeds, [copy_context() for _ in chunk_sizes])
+    return pool.map(_bootstrap_chunk_in_worker, chunk_sizes, chunk_seeds)
+
+# Function to estimate the Monte Carlo standard error of the percentile endpoints.
+# The p-quantile of R draws is bracketed by the order statistics R*p +/- sqrt(R*p*(1-p)),
+# a one-standard-error binomial band, so half their distance is the endpoint's error.
+def _endpoint_monte_carlo_error(bootstrap_statistics, confidence_level):
+    R = len(bootstrap_statistics)
+    sorted_statistics = np.sort(bootstrap_statistics)
+    errors = []
+    for p in ((100 - confidence_level) / 200, 1 - (100 - confidence_level) / 200):
+        half_width = np.sqrt(R * p * (1 - p))
+        lower = int(np.clip(np.floor(R * p - half_width), 0, R - 1))
+        upper = int(np.clip(np.ceil(R * p + half_width), 0, R - 1))
+        errors.append((sorted_statistics[upper] - sorted_statistics[lower]) / 2)
+    return max(errors)
+
+@instrumented('bootstrap_confidence_interval')
+def bootstrap_confidence_interval(data, statistic_func, R, confidence_level,
+                                  n_jobs=1, executor='process', random_state=None,
+                                  chunk_size=DEFAULT_CHUNK_SIZE, max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES,
+                                  tolerance=None, time_budget=None, method='percentile',
+                                  checkpoint_dir=None, shard=None, cache=None, compact=False, run_id=None):
+    data = to_random_access(data)
+    if method not in INTERVAL_METHODS:
+        raise ValueError(f"method must be one of {INTERVAL_METHODS}, got {method!r}")
+    studentized = method == 'studentized'
+    if studentized and _is_order_statistic(statistic_func):
+        # Resamples of an order statistic are mostly ties, whose jackknife standard error is 0
+        raise ValueError(f"method='studentized' needs a smooth statistic, got the order statistic "
+                         f"{_statistic_name(statistic_func)}: use method='bca'")
+    if n_jobs is None or n_jobs < 1:
+        n_jobs = os.cpu_count() or 1
+    if executor not in ('process', 'thread'):
+        raise ValueError(f"executor must be 'process' or 'thread', got {executor!r}")
+    if shard is not None:
+        shard_index, shard_count = shard
+        if not 0 <= shard_index < shard_count:
+            raise ValueError(f'shard must be (index, count) with 0 <= index < count, got {shard!r}')
+        if tolerance is not None:
+            raise ValueError('tolerance judges the endpoints of the whole run and cannot be used with shard')
+    if ((checkpoint_dir is not None or shard is not None) and run_id is None
+            and statistic_digest(statistic_func) is None):
+        # Lambdas and closures all look alike, so only the caller can tell their runs apart
+        raise ValueError(f'the statistic {_statistic_name(statistic_func)} cannot be identified across runs '
+                         f'(lambda, closure or object with state): pass run_id to checkpoint or shard it')
+
+    # Seeded, self-contained runs are looked up by content; the others are not reproducible from the key
+    cache, cache_key = resolve_cache(cache), None
+    if cache is not None and time_budget is None and checkpoint_dir is None and shard is None:
+        cache_key = bootstrap_cache_key(data, statistic_func, R, confidence_level, random_state, chunk_size,
+                                        tolerance, method, compact)
+        cached = cache.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            return cached['bootstrap_statistics'], cached['confidence_interval']
+
+    # Split the R resamples into chunks, each with an independent child seed
+    chunk_sizes = [min(chunk_size, R - start) for start in range(0, R, chunk_size)]
+    root_seed, store, completed = _open_checkpoint(checkpoint_dir, random_state, statistic_func, R, chunk_size,
+                                                   data, studentized, shard, compact, run_id)
+    chunk_seeds = root_seed.spawn(len(chunk_sizes))
+
+    # A shard owns every shard_count-th chunk; finished chunks are loaded from the checkpoint
+    selected = [i for i in range(len(chunk_sizes)) if shard is None or i % shard[1] == shard[0]]
+    num_pending = sum(i not in completed for i in selected)
+
+    # With a stopping rule, R is only the maximum and chunks go to the pool n_jobs at a time
+    adaptive = tolerance is not None or time_budget is not None
+    wave = n_jobs if adaptive else len(selected)
+    started = time.perf_counter()
+
+    # Compact runs resample a float32 copy; the jackknife of 'bca' and 'studentized' still uses the data
+    resampled = data.astype(np.float32, copy=False) if compact and not isinstance(data, np.memmap) else data
+
+    # Perform the bootstrap resamples, serially or across a pool of workers
+    chunks = []
+    with _open_pool(n_jobs, executor, num_pending, resampled, statistic_func, max_memory_bytes,
+                    studentized, compact) as pool:
+        for first in range(0, len(selected), max(1, wave)):
+            group = selected[first:first + max(1, wave)]
+            pending = [i for i in group if i not in completed]
+            computed = iter(_run_chunks(pool, resampled, statistic_func, [chunk_sizes[i] for i in pending],
+                                        [chunk_seeds[i] for i in pending], max_memory_bytes, studentized,
+                                        compact))
+            for i in group:
+                if i in completed:
+                    chunk = completed[i]
+                else:
+                    chunk = next(computed)
+                    # Durable before the run moves on, so a kill loses at most the chunks in flight
+                    if store is not None:
+                        store.append(i, chunk)
+                chunks.append(chunk)
+                # Loaded chunks cost no time, so only the tolerance can stop on them
+                if adaptive and _should_stop(chunks, confidence_level, tolerance,
+                                             None if i in completed else time_budget, started):
+                    break
+            else:
+                continue
+            break
+    bootstrap_statistics = np.concatenate(chunks, axis=-1) if chunks else np.zeros((2, 0) if studentized else 0)
+
+    if method == 'bca':
+        confidence_interval = _bca_interval(data, statistic_func, bootstrap_statistics, confidence_level,
+                                            max_memory_bytes)
+    elif method == 'studentized':
+        bootstrap_statistics, bootstrap_standard_errors = bootstrap_statistics
+        confidence_interval = _studentized_interval(data, statistic_func, bootstrap_statistics,
+                                                    bootstrap_standard_errors, confidence_level,
+                                                    max_memory_bytes)
+    else:
+        confidence_interval = _percentile_interval(bootstrap_statistics, confidence_level)
+
+    if cache_key is not None:
+        cache.put(cache_key, {'bootstrap_statistics': bootstrap_statistics,
+                              'confidence_interval': confidence_interval})
+    return bootstrap_statistics, confidence_interval
+
+# Function to bootstrap several statistics at several confidence levels from one set of resamples.
+# statistics is a {name: statistic} dict or a sequence of statistics (named after the function).
+# Returns ({name: bootstrap statistics}, {name: {confidence level: [lower, upper]}}).
+@instrumented('bootstrap_confidence_intervals')
+def bootstrap_confidence_intervals(data, statistics, R, confidence_levels=(95,),
+                                   n_jobs=1, executor='process', random_state=None,
+                                   chunk_size=DEFAULT_CHUNK_SIZE, max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES,
+                                   method='percentile'):
+    data = to_random_access(data)
+    if method not in ('percentile', 'bca'):
+        raise ValueError(f"method must be 'percentile' or 'bca' for several statistics, got {method!r}")
+    if n_jobs is None or n_jobs < 1:
+        n_jobs = os.cpu_count() or 1
+    if executor not in ('process', 'thread'):
+        raise ValueError(f"executor must be 'process' or 'thread', got {executor!r}")
+    if not isinstance(statistics, dict):
+        statistics = list(statistics)
+        names = [_statistic_name(statistic_func) for statistic_func in statistics]
+        if len(set(names)) < len(names):
+            raise ValueError(f'statistics need distinct names, got {names}: pass a {{name: statistic}} dict')
+        statistics = dict(zip(names, statistics))
+    confidence_levels = np.atleast_1d(confidence_levels).tolist()
+    statistic_set = _StatisticSet(statistics)
+
+    # Same chunks and child seeds as bootstrap_confidence_interval, so the resamples are the same
+    chunk_sizes = [min(chunk_size, R - start) for start in range(0, R, chunk_size)]
+    chunk_seeds = as_seed_sequence(random_state).spawn(len(chunk_sizes))
+    with _open_pool(n_jobs, executor, len(chunk_sizes), data, statistic_set, max_memory_bytes, False) as pool:
+        chunks = list(_run_chunks(pool, data, statistic_set, chunk_sizes, chunk_seeds, max_memory_bytes, False))
+    all_statistics = np.concatenate(chunks, axis=-1) if chunks else np.zeros((len(statistics), 0))
+
+    bootstrap_statistics, confidence_intervals = {}, {}
+    for name, statistic_func, values in zip(statistic_set.names, statistic_set.functions, all_statistics):
+        bootstrap_statistics[name] = values
+        if method == 'bca':
+            confidence_intervals[name] = {level: _bca_interval(data, statistic_func, values, level, max_memory_bytes)
+                                          for level in confidence_levels}
+        else:
+            confidence_intervals[name] = {level: _percentile_interval(values, level) for level in confidence_levels}
+    return bootstrap_statistics, confidence_intervals
+
+# Function to resolve the root seed of a run and, with a checkpoint, its store and finished chunks.
+# Resuming with random_state=None reuses the seed recorded in the checkpoint.
+def _open_checkpoint(checkpoint_dir, random_state, statistic_func, R, chunk_size, data, studentized, shard,
+                     compact=False, run_id=None):
+    if checkpoint_dir is None:
+        return as_seed_sequence(random_state), None, {}
+    from .checkpoint import BootstrapStore, seed_fields
+
+    store = BootstrapStore(checkpoint_dir)
+    if random_state is None and store.exists():
+        root_seed = store.seed_sequence()
+    else:
+        root_seed = as_seed_sequence(random_state)
+    # The data is identified by content, so resuming or merging on different data is refused
+    store.open({'R': R, 'chunk_size': chunk_size, 'sample_size': len(data), 'data_hash': data_digest(data),
+                'studentized': studentized, 'compact': bool(compact), 'statistic': _statistic_name(statistic_func),
+                'statistic_hash': statistic_digest(statistic_func), 'run_id': run_id, **seed_fields(root_seed),
+                'shard': list(shard) if shard else None})
+    return root_seed, store, store.completed()
+
+# Function to decide whether an adaptive run has resampled enough.
+# Chunks are checked one by one in chunk order, so when only a tolerance is given the
+# stopping point (and therefore the result) does not depend on the number of workers.
+def _should_stop(chunks, confidence_level, tolerance, time_budget, started):
+    if time_budget is not None and time.perf_counter() - started >= time_budget:
+        return True
+    # At least two chunks before the endpoint error is trusted
+    if tolerance is None or len(chunks) < 2:
+        return False
+    # Studentized chunks carry their standard errors in a second row; only the statistics matter here
+    bootstrap_statistics = np.concatenate(chunks, axis=-1).reshape(-1, sum(c.shape[-1] for c in chunks))[0]
+    return _endpoint_monte_carlo_error(bootstrap_statistics, confidence_level) <= tolerance
+
+# Function to trim [(100-x) / 2]% of the bootstrap statistics from either end
+@instrumented('percentile')
+def _percentile_interval(bootstrap_statistics, confidence_level):
+    lower_percentile = (100 - confidence_level) / 2
+    upper_percentile = 100 - lower_percentile
+    return np.percentile(bootstrap_statistics, [lower_percentile, upper_percentile])
+
+# Function to compute the BCa interval: percentiles shifted by the bias correction z0
+# and the jackknife acceleration a
+def _bca_interval(data, statistic_func, bootstrap_statistics, confidence_level, max_memory_bytes):
+    from statistics import NormalDist
+    normal = NormalDist()
+    R = len(bootstrap_statistics)
+    observed = statistic_func(data)
+
+    # Bias correction: how far the bootstrap distribution sits from the observed statistic
+    below = np.mean(bootstrap_statistics < observed) + 0.5 * np.mean(bootstrap_statistics == observed)
+    z0 = normal.inv_cdf(float(np.clip(below, 1 / (2 * R), 1 - 1 / (2 * R))))
+
+    # Acceleration: skewness of the jackknife values
+    deviations = _jackknife_values(data, statistic_func, max_memory_bytes)
+    deviations = deviations.mean() - deviations
+    spread = (deviations ** 2).sum()
+    acceleration = (deviations ** 3).sum() / (6 * spread ** 1.5) if spread > 0 else 0.0
+
+    percentiles = []
+    for alpha in ((100 - confidence_level) / 200, 1 - (100 - confidence_level) / 200):
+        z = z0 + normal.inv_cdf(alpha)
+        percentiles.append(100 * normal.cdf(z0 + z / (1 - acceleration * z)))
+    with phase(active_recorder(), 'percentile'):
+        return np.percentile(bootstrap_statistics, percentiles)
+
+# Function to compute the bootstrap-t interval from the studentized resample statistics
+def _studentized_interval(data, statistic_func, bootstrap_statistics, bootstrap_standard_errors,
+                          confidence_level, max_memory_bytes):
+    observed = statistic_func(data)
+    standard_error = _jackknife_standard_error(_jackknife_values(data, statistic_func, max_memory_bytes))
+
+    # Resamples with a zero standard error (all values equal, or ties) carry no t information; a
+    # jackknife over n values that should give 0 leaves rounding noise up to about n * eps * |statistic|
+    rounding = len(data) * np.finfo(np.float64).eps * np.maximum(np.abs(bootstrap_statistics), 1.0)
+    usable = np.isfinite(bootstrap_statistics) & (bootstrap_standard_errors > rounding)
+    t_statistics = (bootstrap_statistics[usable] - observed) / bootstrap_standard_errors[usable]
+    if not len(t_statistics):
+        raise ValueError('every bootstrap resample has a zero standard error, so no t statistic can be formed')
+
+    t_lower, t_upper = _percentile_interval(t_statistics, confidence_level)
+    return np.array([observed - t_upper * standard_error, observed - t_lower * standard_error])
+
+@instrumented('poisson_bootstrap_confidence_interval')
+def poisson_bootstrap_confidence_interval(source, statistic, R, confidence_level,
+                                          max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES, random_state=None):
+    statistic = MOMENT_STATISTICS.get(statistic, statistic)
+    if statistic not in ('mean', 'sum', 'var', 'std'):
+        raise ValueError(f"Poisson bootstrap supports mean, sum, var and std, got {statistic!r}")
+
+    # Weighted count, sum and sum of squares per replicate, shifted by the first observation.
+    # A replicate that drew nothing has a sum of 0 but no mean or variance, so only those drop it.
+    weight_totals, weighted_sums, weighted_squares, shift = poisson_moments(
+        source, R, random_state, max_memory_bytes, squares=statistic in ('var', 'std'),
+        drop_empty=statistic != 'sum')
+
+    # Turn the accumulators into the statistic of each replicate
+    if statistic == 'sum':
+        bootstrap_statistics = weighted_sums + shift * weight_totals
+    elif statistic == 'mean':
+        bootstrap_statistics = weighted_sums / weight_totals + shift
+    else:
+        centred_means = weighted_sums / weight_totals
+        bootstrap_statistics = np.maximum(weighted_squares / weight_totals - centred_means ** 2, 0.0)
+        if statistic == 'std':
+            bootstrap_statistics = np.sqrt(bootstrap_statistics)
+
+    return bootstrap_statistics, _percentile_interval(bootstrap_statistics, confidence_level)
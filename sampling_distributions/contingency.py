@@ -0,0 +1,103 @@
+'''
+Batched chi-square tests of independence over stacked r x c contingency tables.
+
+NOTE: The chi-square statistic measures how far observed counts depart from the counts
+    expected under independence, expected = row total * column total / grand total.
+    chi2_independence_test takes an (m, r, c) stack of tables and computes expected
+    counts, statistics and p-values for all m tables in single array passes, with no
+    per-table Python call. With monte_carlo=S it also simulates S tables per input table
+    with the same margins (sequential hypergeometric draws, one column at a time, for
+    every table and simulation at once) and reports the Monte Carlo p-value. A table with
+    an all-zero row or column has no expected counts to compare with: its statistic and
+    p-value are NaN either way.
+'''
+
+import numpy as np
+
+from ._common import DEFAULT_MAX_MEMORY_BYTES, as_generator
+
+# Function to compute the expected counts under independence for a stack of tables (..., r, c)
+def expected_counts(tables):
+    tables = np.asarray(tables, dtype=np.float64)
+    totals = tables.sum(axis=(-2, -1), keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return tables.sum(axis=-1, keepdims=True) * tables.sum(axis=-2, keepdims=True) / totals
+
+# Function to compute the chi-square statistic of every table against its expected counts
+def _chi2_statistics(tables, expected, correction):
+    deviations = expected - tables
+    if correction:
+        # Yates' continuity correction: move each count up to 0.5 towards its expected value
+        deviations = deviations - np.sign(deviations) * np.minimum(0.5, np.abs(deviations))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (deviations ** 2 / expected).sum(axis=(-2, -1))
+
+# Function to draw tables with the same margins as the given ones under independence.
+# row_totals (..., r) and column_totals (..., c) are integer arrays; the result is (..., r, c).
+def _simulate_tables(row_totals, column_totals, rng):
+    r, c = row_totals.shape[-1], column_totals.shape[-1]
+    remaining_columns = column_totals.copy()
+    simulated = np.zeros(row_totals.shape + (c,), dtype=np.int64)
+    for i in range(r - 1):
+        # Draw row i from the items still in the urn, one column at a time
+        left_in_row = row_totals[..., i].copy()
+        others = remaining_columns.sum(axis=-1)
+        for j in range(c - 1):
+            others = others - remaining_columns[..., j]
+            draw = rng.hypergeometric(remaining_columns[..., j], others, left_in_row)
+            simulated[..., i, j] = draw
+            left_in_row -= draw
+        simulated[..., i, c - 1] = left_in_row
+        remaining_columns -= simulated[..., i, :]
+    # The last row takes whatever is left
+    simulated[..., r - 1, :] = remaining_columns
+    return simulated
+
+def chi2_independence_test(tables, correction=True, monte_carlo=None, random_state=None,
+                           max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES):
+    from scipy.special import chdtrc
+
+    tables = np.asarray(tables)
+    single = tables.ndim == 2
+    tables = tables[None] if single else tables
+    if tables.ndim != 3:
+        raise ValueError(f'tables must have shape (r, c) or (m, r, c), got {tables.shape}')
+
+    # Calculate expected counts, statistics and degrees of freedom for every table at once
+    expected = expected_counts(tables)
+    dof = (tables.shape[1] - 1) * (tables.shape[2] - 1)
+    # Like scipy, the continuity correction only applies to tables with one degree of freedom
+    correction = correction and dof == 1
+    statistics = _chi2_statistics(tables, expected, correction)
+
+    if monte_carlo is None:
+        p_values = chdtrc(dof, statistics) if dof > 0 else np.ones(len(tables))
+    else:
+        p_values = _monte_carlo_p_values(tables, expected, statistics, correction, int(monte_carlo),
+                                         as_generator(random_state), max_memory_bytes)
+
+    if single:
+        return statistics[0], p_values[0], dof, expected[0]
+    return statistics, p_values, dof, expected
+
+# Function to estimate p-values as (1 + #simulated statistics >= observed) / (1 + simulations)
+def _monte_carlo_p_values(tables, expected, statistics, correction, num_simulations, rng, max_memory_bytes):
+    counts = np.asarray(np.rint(tables), dtype=np.int64)
+    row_totals, column_totals = counts.sum(axis=2), counts.sum(axis=1)
+    exceed = np.zeros(len(tables))
+
+    # Tables per block so the simulated (tables, simulations, r, c) arrays stay under the ceiling
+    cells = tables.shape[1] * tables.shape[2]
+    block = max(1, int(max_memory_bytes) // (32 * cells * max(1, num_simulations)))
+    for start in range(0, len(tables), block):
+        stop = min(start + block, len(tables))
+        shape = (stop - start, num_simulations)
+        simulated = _simulate_tables(np.broadcast_to(row_totals[start:stop, None], shape + row_totals.shape[1:]),
+                                     np.broadcast_to(column_totals[start:stop, None], shape + column_totals.shape[1:]),
+                                     rng)
+        simulated_statistics = _chi2_statistics(simulated, expected[start:stop, None], correction)
+        # Tolerance for floating-point ties with the observed statistic
+        threshold = statistics[start:stop, None] * (1 - 1e-12)
+        exceed[start:stop] = (simulated_statistics >= threshold).sum(axis=1)
+    # A table with a zero margin has no statistic (0 / 0 expected counts), so nothing can exceed it
+    return np.where(np.isnan(statistics), np.nan, (1 + exceed) / (1 + num_simulations))
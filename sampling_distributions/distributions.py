@@ -0,0 +1,36 @@
+'''
+Pure compute helpers for the distribution examples (QQ plots, t, chi-square and binomial).
+
+NOTE: scipy.stats takes a few hundred milliseconds to import, so it is only imported
+    inside the functions that need it, never when the package is imported.
+    The t and chi-square curves go through the cached grid evaluator in tables.
+'''
+
+import numpy as np
+
+from .instrumentation import instrumented
+from .tables import evaluate_grid
+
+# Function to compute the points of a QQ plot without drawing it:
+# ((theoretical quantiles, ordered values), (slope, intercept, r)) as returned by scipy's probplot
+@instrumented('qq_plot_points')
+def qq_plot_points(sample, dist='norm', sparams=()):
+    from scipy import stats
+    return stats.probplot(sample, dist=dist, sparams=sparams)
+
+# Function to evaluate the t-distribution pdf for every degrees of freedom: one row per df
+@instrumented('t_pdf_curves')
+def t_pdf_curves(x, dfs):
+    return evaluate_grid('t', 'pdf', dfs, x)
+
+# Function to evaluate the chi-square pdf for every degrees of freedom: one row per df
+@instrumented('chi2_pdf_curves')
+def chi2_pdf_curves(x, dfs):
+    return evaluate_grid('chi2', 'pdf', dfs, x)
+
+# Function to compute the probability of every number of successes (from 0 to n)
+@instrumented('binomial_pmf')
+def binomial_pmf(n, p):
+    from scipy import stats
+    k = np.arange(0, n + 1)
+    return k, stats.binom.pmf(k, n, p)
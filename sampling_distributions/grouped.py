@@ -0,0 +1,191 @@
+'''
+Grouped (and stratified) bootstrap confidence intervals for many segments in one call.
+
+NOTE: Calling bootstrap_confidence_interval once per group costs Python overhead per group,
+    which dominates when there are tens of thousands of small groups. Here every group is
+    resampled at once: the values are laid out group by group (and stratum by stratum
+    within a group), so one replicate is a single vectorized draw of an index inside each
+    element's own cell, start + floor(u * size). Group sums come from np.add.reduceat over
+    the group starts, giving mean, sum, var and std (centred on the group mean for accuracy).
+
+NOTE: Order statistics (median, quantile(q)) need every group sorted in every replicate.
+    Within a group the values are kept in sorted order, so sorting the drawn positions of
+    a whole replicate row sorts each group's segment in place (group ranges are disjoint
+    and ordered): one integer sort per replicate instead of one per group. With strata, a
+    drawn element is first mapped to its position in its group's sorted order.
+
+NOTE: Groups are processed in batches of at most GROUP_BATCH_VALUES values and
+    GROUP_BATCH_GROUPS groups, each batch with its own child seed, and replicates are
+    drawn row by row within a batch, so the result does not depend on max_memory_bytes.
+    Only an (R, groups in batch) matrix of statistics is held at a time.
+'''
+
+import numpy as np
+
+from ._common import DEFAULT_MAX_MEMORY_BYTES, as_seed_sequence
+from .confidence_intervals import _moment_name, _sorted_quantile, quantile
+from .instrumentation import active_recorder, instrumented, phase
+
+# Batch limits; fixed so the seeds of a run do not depend on memory settings
+GROUP_BATCH_VALUES = 2 ** 18
+GROUP_BATCH_GROUPS = 2 ** 12
+
+# Bytes per drawn value in a block: uniform draw, index, gathered value, sort positions
+BYTES_PER_DRAW = 32
+
+# Function to turn group labels or sorted offsets into (group keys, group id of every value)
+def _group_ids(num_values, groups, offsets):
+    if (groups is None) == (offsets is None):
+        raise ValueError('pass exactly one of groups (a label per value) or offsets (start of each group)')
+    if groups is not None:
+        groups = np.asarray(groups)
+        if len(groups) != num_values:
+            raise ValueError(f'groups has {len(groups)} labels for {num_values} values')
+        return np.unique(groups, return_inverse=True)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    if len(offsets) == 0 or offsets[0] != 0 or np.any(np.diff(offsets) <= 0) or offsets[-1] >= max(num_values, 1):
+        raise ValueError('offsets must start at 0 and strictly increase within the values')
+    group_ids = np.zeros(num_values, dtype=np.int64)
+    group_ids[offsets[1:]] = 1
+    return np.arange(len(offsets)), np.cumsum(group_ids)
+
+# Function to compute the statistic of every group in a batch for a block of drawn rows (rows, values in batch).
+# moment is 'mean', 'sum', 'var' or 'std', or None for an order statistic.
+def _segment_statistics(statistic_func, moment, drawn, batch):
+    group_starts, group_sizes = batch['group_starts'], batch['group_sizes']
+    if moment is not None:
+        # Centre on each value's original group mean, so variances do not cancel
+        centred = batch['centred'][drawn]
+        sums = np.add.reduceat(centred, group_starts, axis=1)
+        if moment == 'sum':
+            return sums + batch['group_means'] * group_sizes
+        means = sums / group_sizes
+        if moment == 'mean':
+            return means + batch['group_means']
+        variances = np.maximum(np.add.reduceat(centred ** 2, group_starts, axis=1) / group_sizes - means ** 2, 0.0)
+        return variances if moment == 'var' else np.sqrt(variances)
+
+    # Sorting the positions of a row sorts every group's segment, since group ranges are disjoint and ordered
+    positions = batch['sorted_position'][drawn] if batch['sorted_position'] is not None else drawn
+    positions.sort(axis=1)
+    if statistic_func is np.median:
+        lower = group_starts + (group_sizes - 1) // 2
+        upper = group_starts + group_sizes // 2
+        return (batch['sorted_values'][positions[:, lower]] + batch['sorted_values'][positions[:, upper]]) / 2
+    # Linear interpolation between the two order statistics around q * (size - 1), as np.quantile does
+    position = statistic_func.q * (group_sizes - 1)
+    lower = np.floor(position).astype(np.int64)
+    fraction = position - lower
+    upper = np.minimum(lower + 1, group_sizes - 1)
+    a = batch['sorted_values'][positions[:, group_starts + lower]]
+    b = batch['sorted_values'][positions[:, group_starts + upper]]
+    return np.where(fraction < 0.5, a + (b - a) * fraction, b - (b - a) * (1 - fraction))
+
+# Function to compute per-group bootstrap confidence intervals for all groups in one call.
+# Pass groups (a label per value) or offsets (start index of each group in already grouped values);
+# strata (a label per value) keeps the number of values per stratum fixed inside every group.
+# Returns a table (structured array) with one row per group: group, size, estimate, lower, upper.
+@instrumented('grouped_bootstrap_confidence_interval')
+def grouped_bootstrap_confidence_interval(values, statistic_func, R, confidence_level, groups=None, offsets=None,
+                                          strata=None, random_state=None, max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES):
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim != 1 or len(values) == 0:
+        raise ValueError('values must be a non-empty 1-D array')
+    moment = _moment_name(statistic_func)
+    order_statistic = statistic_func is np.median or (isinstance(statistic_func, quantile)
+                                                      and np.ndim(statistic_func.q) == 0)
+    if moment is None and not order_statistic:
+        raise ValueError('statistic_func must be np.mean, np.sum, np.var, np.std, np.median or quantile(q)')
+    keys, group_ids = _group_ids(len(values), groups, offsets)
+    num_groups = len(keys)
+
+    # Draw layout: by group, then stratum, then value, so every resampling cell is contiguous
+    if strata is not None:
+        strata = np.unique(np.asarray(strata), return_inverse=True)[1]
+        if len(strata) != len(values):
+            raise ValueError(f'strata has {len(strata)} labels for {len(values)} values')
+        cell_ids = strata
+    else:
+        cell_ids = np.zeros(len(values), dtype=np.int64)
+    draw_order = np.lexsort((values, cell_ids, group_ids))
+    group_sizes = np.bincount(group_ids, minlength=num_groups)
+    group_starts = np.concatenate([[0], np.cumsum(group_sizes)[:-1]])
+
+    # Cell boundaries in the draw layout, and every value's cell start and size
+    drawn_groups, drawn_cells = group_ids[draw_order], cell_ids[draw_order]
+    new_cell = np.ones(len(values), dtype=bool)
+    new_cell[1:] = (drawn_groups[1:] != drawn_groups[:-1]) | (drawn_cells[1:] != drawn_cells[:-1])
+    cell_starts = np.flatnonzero(new_cell)
+    cell_sizes = np.diff(np.append(cell_starts, len(values)))
+    value_cell_starts = np.repeat(cell_starts, cell_sizes)
+    value_cell_sizes = np.repeat(cell_sizes, cell_sizes)
+
+    group_means = np.add.reduceat(values[draw_order], group_starts) / group_sizes
+    centred = values[draw_order] - np.repeat(group_means, group_sizes)
+    sorted_values = sorted_position = None
+    if order_statistic:
+        # Values sorted within each group, and (with strata) where each drawn value sits in that order
+        sorted_order = np.lexsort((values, group_ids))
+        sorted_values = values[sorted_order]
+        if strata is not None:
+            sorted_position = np.empty(len(values), dtype=np.int64)
+            sorted_position[sorted_order] = np.arange(len(values))
+            sorted_position = sorted_position[draw_order]
+
+    # Batches of whole groups under the fixed value and group limits
+    value_ends = np.cumsum(group_sizes)
+    batches = []
+    first = 0
+    while first < num_groups:
+        last = int(np.searchsorted(value_ends, group_starts[first] + GROUP_BATCH_VALUES, side='right'))
+        last = max(first + 1, min(last, first + GROUP_BATCH_GROUPS))
+        batches.append((first, last))
+        first = last
+    batch_seeds = as_seed_sequence(random_state).spawn(len(batches))
+
+    estimates = np.zeros(num_groups)
+    lower = np.zeros(num_groups)
+    upper = np.zeros(num_groups)
+    lower_percentile = (100 - confidence_level) / 2
+    recorder = active_recorder()
+    for (first, last), seed in zip(batches, batch_seeds):
+        rng = np.random.default_rng(seed)
+        start, stop = int(group_starts[first]), int(value_ends[last - 1])
+        # Everything below is relative to the batch's first value
+        batch = {'group_starts': group_starts[first:last] - start, 'group_sizes': group_sizes[first:last],
+                 'group_means': group_means[first:last], 'centred': centred[start:stop],
+                 'sorted_values': sorted_values[start:stop] if order_statistic else None,
+                 'sorted_position': sorted_position[start:stop] - start if sorted_position is not None else None}
+
+        # The statistic on the original data: the identity "resample"
+        estimates[first:last] = _segment_statistics(statistic_func, moment, np.arange(stop - start)[None, :],
+                                                    batch)[0]
+
+        # Replicates drawn row by row, a memory-bounded block at a time
+        cell_start, cell_size = value_cell_starts[start:stop] - start, value_cell_sizes[start:stop]
+        rows = max(1, int(max_memory_bytes) // (BYTES_PER_DRAW * (stop - start)))
+        # One row of R replicate statistics per group, sorted once for both percentiles
+        replicates = np.zeros((last - first, R))
+        for row in range(0, R, rows):
+            block_rows = min(rows, R - row)
+            # start + floor(u * size), in place to keep temporaries out of the hot loop
+            with phase(recorder, 'indices'):
+                uniforms = rng.random((block_rows, stop - start))
+                uniforms *= cell_size
+                drawn = uniforms.astype(np.int64)
+                drawn += cell_start
+            with phase(recorder, 'statistic'):
+                replicates[:, row:row + block_rows] = _segment_statistics(statistic_func, moment, drawn, batch).T
+            if recorder is not None:
+                recorder.add('resamples', block_rows * (last - first))
+                recorder.peak('peak_block_bytes', BYTES_PER_DRAW * drawn.size)
+        with phase(recorder, 'percentile'):
+            replicates.sort(axis=1)
+            lower[first:last] = _sorted_quantile(replicates, lower_percentile / 100)
+            upper[first:last] = _sorted_quantile(replicates, 1 - lower_percentile / 100)
+
+    table = np.zeros(num_groups, dtype=[('group', keys.dtype), ('size', np.int64), ('estimate', np.float64),
+                                        ('lower', np.float64), ('upper', np.float64)])
+    table['group'], table['size'], table['estimate'] = keys, group_sizes, estimates
+    table['lower'], table['upper'] = lower, upper
+    return table
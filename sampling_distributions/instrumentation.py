@@ -0,0 +1,189 @@
+'''
+Low-overhead instrumentation of the resampling, simulation and distribution routines.
+
+NOTE: Inside "with instrument() as recorder:" every instrumented routine called from that
+    context (including threads of a thread pool it starts) reports to the recorder:
+        phases    nested timers such as bootstrap_confidence_interval > indices / gather /
+                  statistic / percentile, with call counts and total seconds
+        counters  resamples, bytes_gathered, samples, values_drawn, points, ...
+        peaks     peak_block_bytes (largest resampling block), and with trace_memory=True
+                  peak_allocated_bytes per phase, measured by tracemalloc
+    recorder.summary() aggregates them, recorder.write_chrome_trace(path) (or
+    instrument(trace_path=path)) writes a Chrome trace (chrome://tracing, Perfetto), and
+    callback(event) is called with every finished phase and counter update as it happens.
+
+NOTE: Disabled cost. The recorder lives in a ContextVar; without one, a phase is a shared
+    no-op context manager and an instrumented function is one extra call and lookup, paid
+    per call or per memory block, never per resampled element. The per-resample loop of
+    opaque statistics is timed by swapping in timing wrappers only when a recorder is active,
+    so the disabled loop is unchanged. Process-pool workers do not report (their phases run
+    in another process); time them with n_jobs=1 or executor='thread'. tracemalloc slows
+    allocation-heavy code noticeably, so trace_memory is off by default.
+'''
+
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_active = ContextVar('sampling_distributions_recorder', default=None)
+
+# Shared do-nothing phase, used whenever no recorder is active
+class _NoPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NO_PHASE = _NoPhase()
+
+# Function to get the recorder of the current context, or None when nothing is instrumented
+def active_recorder():
+    return _active.get()
+
+# Function to time a block under recorder, or do nothing when recorder is None
+def phase(recorder, name, **args):
+    return _NO_PHASE if recorder is None else _Phase(recorder, name, args)
+
+# Decorator that times every call of a routine as a phase of the active recorder
+def instrumented(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            recorder = _active.get()
+            if recorder is None:
+                return func(*args, **kwargs)
+            with _Phase(recorder, name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class _Phase:
+    __slots__ = ('recorder', 'name', 'args', 'start')
+
+    def __init__(self, recorder, name, args):
+        self.recorder, self.name, self.args = recorder, name, args
+
+    def __enter__(self):
+        if self.recorder.trace_memory and tracemalloc.is_tracing():
+            self.recorder._enter_memory()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter_ns()
+        if self.recorder.trace_memory and tracemalloc.is_tracing():
+            self.args['peak_allocated_bytes'] = self.recorder._exit_memory()
+        self.recorder._finish(self.name, self.start, end, self.args)
+        return False
+
+# Collector of phases, counters and peaks; thread-safe, so thread-pool workers can share one
+class Recorder:
+    def __init__(self, callback=None, trace_memory=False):
+        self.callback = callback
+        self.trace_memory = trace_memory
+        self.events = []
+        self.phases = {}
+        self.counters = {}
+        self.peaks = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._origin = time.perf_counter_ns()
+
+    def _emit(self, event):
+        with self._lock:
+            self.events.append(event)
+        if self.callback is not None:
+            self.callback(event)
+
+    def _finish(self, name, start, end, args):
+        with self._lock:
+            totals = self.phases.setdefault(name, [0, 0])
+            totals[0] += 1
+            totals[1] += end - start
+            if 'peak_allocated_bytes' in args:
+                self.peaks['peak_allocated_bytes'] = max(self.peaks.get('peak_allocated_bytes', 0),
+                                                         args['peak_allocated_bytes'])
+        self._emit({'name': name, 'cat': 'phase', 'ph': 'X', 'ts': (start - self._origin) / 1000,
+                    'dur': (end - start) / 1000, 'pid': os.getpid(), 'tid': threading.get_ident(), 'args': args})
+
+    # Function to time a block: "with recorder.phase('gather'):"
+    def phase(self, name, **args):
+        return _Phase(self, name, args)
+
+    # Function to wrap a function so its calls add to a phase's totals, without one trace event per call
+    def timed(self, name, func):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter_ns() - start
+                with self._lock:
+                    totals = self.phases.setdefault(name, [0, 0])
+                    totals[0] += 1
+                    totals[1] += elapsed
+        return wrapper
+
+    def add(self, name, value):
+        with self._lock:
+            total = self.counters[name] = self.counters.get(name, 0) + value
+        self._emit({'name': name, 'cat': 'counter', 'ph': 'C', 'ts': (time.perf_counter_ns() - self._origin) / 1000,
+                    'pid': os.getpid(), 'tid': threading.get_ident(), 'args': {name: total}})
+
+    def peak(self, name, value):
+        with self._lock:
+            self.peaks[name] = max(self.peaks.get(name, 0), value)
+
+    # tracemalloc has one global peak, so nested phases save it, reset it, and hand their peak to the parent
+    def _enter_memory(self):
+        stack = self._local.__dict__.setdefault('stack', [])
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak)
+        stack.append([current, 0])
+        tracemalloc.reset_peak()
+
+    def _exit_memory(self):
+        start, child_peak = self._local.stack.pop()
+        peak = max(tracemalloc.get_traced_memory()[1], child_peak)
+        if self._local.stack:
+            self._local.stack[-1][1] = max(self._local.stack[-1][1], peak)
+        return max(0, peak - start)
+
+    def summary(self):
+        with self._lock:
+            phases = {name: {'calls': calls, 'seconds': total / 1e9} for name, (calls, total) in self.phases.items()}
+            return {'phases': phases, 'counters': dict(self.counters), 'peaks': dict(self.peaks)}
+
+    def chrome_trace(self):
+        with self._lock:
+            events = list(self.events)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': self.summary()}
+
+    def write_chrome_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+# Context manager that makes a recorder active for the code inside it (and the threads it starts)
+@contextmanager
+def instrument(recorder=None, callback=None, trace_memory=False, trace_path=None):
+    if recorder is None:
+        recorder = Recorder(callback=callback, trace_memory=trace_memory)
+    started_tracing = recorder.trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    token = _active.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _active.reset(token)
+        if started_tracing:
+            tracemalloc.stop()
+        if trace_path is not None:
+            recorder.write_chrome_trace(trace_path)
@@ -0,0 +1,119 @@
+'''
+QQ plots for very large samples from a mergeable quantile sketch.
+
+NOTE: An exact QQ plot (scipy's probplot) sorts every point, evaluates the theoretical
+    ppf once per point and hands all n points to matplotlib, which stops working beyond
+    a few million rows. QuantileSketch is a merging t-digest: one streaming pass keeps a
+    few hundred weighted centroids, sized by the k1 scale function so centroids near both
+    tails stay small and extreme quantiles stay accurate. Sketches built on different
+    shards merge into the sketch of the combined data, so distributed data can be
+    QQ-checked without gathering it. qq_sketch_points then evaluates sample and theoretical
+    quantiles only at a fixed set of probability levels (norm, expon, weibull_min, pareto
+    or any other scipy.stats distribution with a ppf).
+'''
+
+from statistics import NormalDist
+
+import numpy as np
+
+from ._common import iter_chunks
+
+# Default t-digest compression: about compression / 2 centroids are kept
+DEFAULT_COMPRESSION = 500
+
+# Default number of probability levels a sketch QQ plot is evaluated at
+DEFAULT_NUM_LEVELS = 512
+
+# Values read per chunk when building a sketch from a data source
+DEFAULT_SKETCH_CHUNK_SIZE = 1_000_000
+
+class QuantileSketch:
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means = np.zeros(0)
+        self.weights = np.zeros(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    # Add a chunk of raw values
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.min = min(self.min, values.min())
+            self.max = max(self.max, values.max())
+            self._compress(np.concatenate([self.means, values]),
+                           np.concatenate([self.weights, np.ones(len(values))]))
+        return self
+
+    # Fold another sketch (e.g. from another shard) into this one
+    def merge(self, other):
+        if len(other.weights):
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self._compress(np.concatenate([self.means, other.means]),
+                           np.concatenate([self.weights, other.weights]))
+        return self
+
+    # Function to group sorted points into centroids spanning at most one unit of the k1 scale
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+
+        # k1(q) = compression / (2 pi) * asin(2q - 1) is steep near q = 0 and 1, so tail groups stay small
+        left = (np.cumsum(weights) - weights) / total
+        k = self.compression / (2 * np.pi) * np.arcsin(np.clip(2 * left - 1, -1, 1))
+        groups = np.floor(k - k[0]).astype(np.int64)
+        starts = np.flatnonzero(np.diff(groups, prepend=groups[0] - 1))
+
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    # Estimate the q-quantile(s) by interpolating between centroid centres and the exact extremes
+    def quantile(self, q):
+        if not len(self.weights):
+            return np.full(np.shape(q), np.nan)
+        total = self.weights.sum()
+        centres = np.cumsum(self.weights) - self.weights / 2
+        positions = np.concatenate([[0.0], centres, [total]])
+        values = np.concatenate([[self.min], self.means, [self.max]])
+        return np.interp(np.asarray(q, dtype=np.float64) * total, positions, values)
+
+    def __repr__(self):
+        return f'QuantileSketch(compression={self.compression!r}, count={self.count:g}, centroids={len(self.weights)})'
+
+# Function to build a sketch in one streaming pass over an array, np.memmap, .npy path or iterable of arrays
+def build_quantile_sketch(source, compression=DEFAULT_COMPRESSION, chunk_size=DEFAULT_SKETCH_CHUNK_SIZE):
+    sketch = QuantileSketch(compression)
+    for chunk in iter_chunks(source, chunk_size):
+        sketch.update(chunk)
+    return sketch
+
+# Function to choose probability levels evenly spaced on the normal scale, so both tails are covered,
+# from the Hazen plotting position of the smallest point to that of the largest
+def qq_probabilities(count, num_levels=DEFAULT_NUM_LEVELS):
+    normal = NormalDist()
+    lowest = 0.5 / max(count, 1)
+    z = np.linspace(normal.inv_cdf(lowest), normal.inv_cdf(1 - lowest), num_levels)
+    return np.array([normal.cdf(value) for value in z])
+
+# Function to compute QQ plot points from a sketch:
+# ((theoretical quantiles, sample quantiles), (slope, intercept, r)) in the same layout as probplot
+def qq_sketch_points(sketch, dist='norm', sparams=(), probabilities=None):
+    from scipy import stats
+
+    if probabilities is None:
+        probabilities = qq_probabilities(sketch.count)
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+
+    theoretical = getattr(stats, dist).ppf(probabilities, *sparams)
+    sample = sketch.quantile(probabilities)
+
+    # Least-squares line through the points, as probplot draws it
+    slope, intercept, r, _, _ = stats.linregress(theoretical, sample)
+    return (theoretical, sample), (slope, intercept, r)
@@ -0,0 +1,198 @@
+'''
+Headless batch rendering of the diagnostic figures.
+
+NOTE: plt.hist on a raw sample re-bins the whole array inside matplotlib, and
+    plt.show() blocks on a display. Here the compute side and the drawing side are split:
+    the *_figure builders reduce the data to what is drawn (bin counts from chunked
+    np.histogram passes, QQ points at fixed probability levels, pdf/pmf grids) and return
+    a small, picklable figure spec. draw_figure draws a spec into any matplotlib Figure
+    (e.g. one from pyplot for interactive use); render_figure draws it into a pyplot-free
+    Figure and writes it with the Agg (PNG) or SVG backend, chosen from the file
+    extension, so no display is needed. render_figures renders many specs across a
+    process pool. matplotlib is only imported when something is drawn.
+'''
+
+from collections.abc import Iterator
+
+import numpy as np
+
+from ._common import iter_chunks
+from .sources import open_source
+
+# Values read per chunk while binning
+DEFAULT_HISTOGRAM_CHUNK_SIZE = 1_000_000
+
+# Above this many points a QQ figure is computed from a quantile sketch instead of probplot
+EXACT_QQ_LIMIT = 10_000
+
+# Function to find the (NaN-ignoring) range of a re-iterable source, such as a CSV column, in one chunked pass
+def _chunked_value_range(source, chunk_size):
+    low, high = np.nan, np.nan
+    for chunk in iter_chunks(source, chunk_size):
+        if len(chunk):
+            low, high = np.fmin(low, np.fmin.reduce(chunk)), np.fmax(high, np.fmax.reduce(chunk))
+    return float(low), float(high)
+
+# Function to bin a data source in chunks; value_range is required for one-shot iterables
+def histogram_counts(source, bins=30, value_range=None, chunk_size=DEFAULT_HISTOGRAM_CHUNK_SIZE):
+    # Paths are opened by suffix: .npy and raw binary files are memory-mapped, CSV columns parsed in chunks
+    source = open_source(source)
+    if value_range is None:
+        if isinstance(source, np.ndarray):
+            value_range = (float(np.nanmin(source)), float(np.nanmax(source)))
+        elif isinstance(source, Iterator):
+            raise ValueError('value_range is required when binning an iterator: it can only be read once')
+        else:
+            value_range = _chunked_value_range(source, chunk_size)
+    edges = np.histogram_bin_edges(np.zeros(0), bins=bins, range=value_range)
+    counts = np.zeros(len(edges) - 1, dtype=np.int64)
+    for chunk in iter_chunks(source, chunk_size):
+        counts += np.histogram(chunk, bins=edges)[0]
+    return counts, edges
+
+def histogram_figure(source, path=None, bins=30, value_range=None, title='Histogram', xlabel='Value',
+                     ylabel='Frequency', color='blue', density=False):
+    counts, edges = histogram_counts(source, bins, value_range)
+    return {'kind': 'histogram', 'path': path, 'counts': counts, 'edges': edges, 'title': title,
+            'xlabel': xlabel, 'ylabel': ylabel, 'color': color, 'density': density}
+
+def bootstrap_ci_figure(bootstrap_statistics, confidence_interval, observed, confidence_level, path=None,
+                        bins=20, xlabel='Mean Value', observed_label='Actual Mean'):
+    counts, edges = histogram_counts(np.asarray(bootstrap_statistics), bins)
+    return {'kind': 'bootstrap_ci', 'path': path, 'counts': counts, 'edges': edges,
+            'interval': tuple(map(float, confidence_interval)), 'observed': float(observed),
+            'confidence_level': confidence_level, 'xlabel': xlabel, 'observed_label': observed_label}
+
+# QQ figure spec from a sample (histogram plus QQ panel) or from a QuantileSketch (QQ panel only)
+def qq_figure(sample, dist='norm', sparams=(), path=None, bins=30, color='blue',
+              histogram_title='Histogram', qq_title='QQ Plot'):
+    from .distributions import qq_plot_points
+    from .qq import QuantileSketch, build_quantile_sketch, qq_sketch_points
+
+    counts = edges = None
+    if isinstance(sample, QuantileSketch):
+        (theoretical, ordered), (slope, intercept, _) = qq_sketch_points(sample, dist, sparams)
+    else:
+        counts, edges = histogram_counts(sample, bins)
+        if isinstance(sample, np.ndarray) and len(sample) <= EXACT_QQ_LIMIT:
+            (theoretical, ordered), (slope, intercept, _) = qq_plot_points(sample, dist, sparams)
+        else:
+            (theoretical, ordered), (slope, intercept, _) = qq_sketch_points(
+                build_quantile_sketch(sample), dist, sparams)
+    return {'kind': 'qq', 'path': path, 'counts': counts, 'edges': edges, 'theoretical': theoretical,
+            'ordered': ordered, 'slope': slope, 'intercept': intercept, 'color': color,
+            'histogram_title': histogram_title, 'qq_title': qq_title}
+
+# pdf curves of the t or chi-square distribution for several degrees of freedom
+def pdf_curves_figure(dist, x, dfs, path=None, title=None, xlabel='Value', ylabel='Probability Density'):
+    from .tables import evaluate_grid
+    return {'kind': 'curves', 'path': path, 'x': np.asarray(x), 'curves': evaluate_grid(dist, 'pdf', dfs, x),
+            'labels': [f'DF={df}' for df in dfs], 'title': title, 'xlabel': xlabel, 'ylabel': ylabel}
+
+def binomial_pmf_figure(n, p, path=None, title='Binomial Distribution', xlabel='Number of Successes',
+                        ylabel='Probability', color='teal'):
+    from .distributions import binomial_pmf
+    k, probabilities = binomial_pmf(n, p)
+    return {'kind': 'pmf', 'path': path, 'k': k, 'probabilities': probabilities, 'title': title,
+            'xlabel': xlabel, 'ylabel': ylabel, 'color': color}
+
+# Default figure sizes per kind
+FIGURE_SIZES = {'histogram': (10, 6), 'bootstrap_ci': (6.4, 4.8), 'qq': (14, 6), 'curves': (10, 6), 'pmf': (6.4, 4.8)}
+
+# Function to draw pre-binned counts: each bin edge is one weighted point, so matplotlib never sees the raw data
+def _draw_binned(ax, counts, edges, **kwargs):
+    ax.hist(edges[:-1], bins=edges, weights=counts, **kwargs)
+
+def _draw_histogram(figure, spec):
+    ax = figure.add_subplot()
+    _draw_binned(ax, spec['counts'], spec['edges'], density=spec['density'], alpha=0.7, color=spec['color'],
+                 edgecolor='black')
+    ax.set_title(spec['title'])
+    ax.set_xlabel(spec['xlabel'])
+    ax.set_ylabel(spec['ylabel'])
+    ax.grid(True)
+
+def _draw_bootstrap_ci(figure, spec):
+    ax = figure.add_subplot()
+    lower, upper = spec['interval']
+    level = spec['confidence_level']
+    _draw_binned(ax, spec['counts'], spec['edges'], color='skyblue', edgecolor='black', alpha=0.7)
+    ax.axvline(lower, color='red', linestyle='dashed', linewidth=2, label=f'{level}% CI Lower: {lower:.2f}')
+    ax.axvline(upper, color='green', linestyle='dashed', linewidth=2, label=f'{level}% CI Upper: {upper:.2f}')
+    ax.axvline(spec['observed'], color='purple', linestyle='solid', linewidth=2,
+               label=f"{spec['observed_label']}: {spec['observed']:.2f}")
+    ax.set_title(f'Bootstrap Statistics with {level}% Confidence Interval')
+    ax.set_xlabel(spec['xlabel'])
+    ax.set_ylabel('Frequency')
+    ax.grid(True)
+    ax.legend()
+
+def _draw_qq(figure, spec):
+    if spec['counts'] is None:
+        qq_ax = figure.add_subplot()
+    else:
+        hist_ax, qq_ax = figure.subplots(1, 2)
+        _draw_binned(hist_ax, spec['counts'], spec['edges'], alpha=0.7, color=spec['color'], edgecolor='black')
+        hist_ax.set_title(spec['histogram_title'])
+        hist_ax.set_xlabel('Value')
+        hist_ax.set_ylabel('Frequency')
+        hist_ax.grid(True)
+    theoretical = np.asarray(spec['theoretical'])
+    qq_ax.plot(theoretical, spec['ordered'], 'bo', markersize=3)
+    qq_ax.plot(theoretical, spec['slope'] * theoretical + spec['intercept'], 'r-')
+    qq_ax.set_title(spec['qq_title'])
+    qq_ax.set_xlabel('Theoretical Quantiles')
+    qq_ax.set_ylabel('Sample Quantiles')
+    qq_ax.grid(True)
+
+def _draw_curves(figure, spec):
+    ax = figure.add_subplot()
+    for curve, label in zip(spec['curves'], spec['labels']):
+        ax.plot(spec['x'], curve, label=label)
+    if spec['title']:
+        ax.set_title(spec['title'])
+    ax.set_xlabel(spec['xlabel'])
+    ax.set_ylabel(spec['ylabel'])
+    ax.legend()
+    ax.grid(True)
+
+def _draw_pmf(figure, spec):
+    ax = figure.add_subplot()
+    ax.bar(spec['k'], spec['probabilities'], color=spec['color'], alpha=0.7)
+    ax.set_title(spec['title'])
+    ax.set_xlabel(spec['xlabel'])
+    ax.set_ylabel(spec['ylabel'])
+    # One tick per outcome only while that stays readable
+    if len(spec['k']) <= 30:
+        ax.set_xticks(spec['k'])
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+
+_DRAWERS = {'histogram': _draw_histogram, 'bootstrap_ci': _draw_bootstrap_ci, 'qq': _draw_qq,
+            'curves': _draw_curves, 'pmf': _draw_pmf}
+
+# Function to draw a figure spec into a matplotlib Figure (pyplot or not)
+def draw_figure(spec, figure):
+    if spec['kind'] not in _DRAWERS:
+        raise ValueError(f"unknown figure kind {spec['kind']!r}, expected one of {sorted(_DRAWERS)}")
+    _DRAWERS[spec['kind']](figure, spec)
+    figure.tight_layout()
+    return figure
+
+# Function to render a spec to spec['path'] without pyplot; the file extension picks PNG (Agg) or SVG
+def render_figure(spec):
+    from matplotlib.figure import Figure
+    if not spec.get('path'):
+        raise ValueError('a figure spec needs a path to be rendered')
+    figure = Figure(figsize=spec.get('figsize', FIGURE_SIZES[spec['kind']]))
+    draw_figure(spec, figure)
+    figure.savefig(spec['path'])
+    return spec['path']
+
+# Function to render many specs, across a process pool unless n_jobs is 1; returns the written paths
+def render_figures(specs, n_jobs=None):
+    specs = list(specs)
+    if n_jobs == 1 or len(specs) <= 1:
+        return [render_figure(spec) for spec in specs]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        return list(pool.map(render_figure, specs))
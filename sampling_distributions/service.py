@@ -0,0 +1,400 @@
+'''
+Local asyncio service for bootstrap confidence intervals and standard-error simulations.
+
+NOTE: Run it with python -m sampling_distributions.service [--port 8765 | --unix PATH].
+    It speaks plain HTTP/1.1 with JSON bodies (one request per connection):
+        POST /bootstrap        {"data": [...], "statistics": ["mean", "quantile(0.9)"], "R": 1000,
+                                "confidence_levels": [95], "random_state": 42, "method": "percentile"}
+        POST /standard-error   {"population_mean": 170, "population_std": 10, "sample_size": 100,
+                                "num_samples": 10000, "random_state": 42}
+        GET  /stats            request counts, batch counts and recent latency percentiles (ms)
+        GET  /health
+    Every response carries latency_ms (arrival to response), queue_ms (waiting to be
+    batched and for a worker) and compute_ms, also as the X-Latency-Ms header.
+
+NOTE: Micro-batching. Requests arriving within batch_window seconds of each other are
+    merged only when they have identical data and the same seed (random_state), since
+    only then are the draws they need the same. Bootstrap requests with identical data
+    (by content hash), seed, R, chunk size and method become one
+    bootstrap_confidence_intervals call: the resamples are drawn once and every requested
+    statistic and level is read from them. Standard-error requests with the same seed,
+    sample size and num_samples become one simulate_standard_error_curve call that scales
+    one set of standardized draws to every (mean, std). Requests on different data or
+    seeds are never merged and run as batches of their own. With a seed, each response
+    equals what the request would get on its own; unseeded requests only merge with other
+    unseeded ones, and such a batch draws one fresh seed, returned as random_state.
+
+NOTE: CPU work runs on a bounded worker pool (spawned processes by default, so the event
+    loop stays responsive). At most max_pending requests are admitted at a time; beyond that
+    the service answers 503 with Retry-After instead of queueing without bound. A running
+    worker job cannot be interrupted, so requests whose work (R x len(data), plus len(data)^2
+    for the BCa jackknife, or num_samples x sample_size) exceeds max_work values are refused
+    with 400 up front.
+    close() runs batches still inside their window at once and waits for every running
+    batch before shutting the pool down, so admitted requests are answered.
+'''
+
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from .confidence_intervals import DEFAULT_CHUNK_SIZE, bootstrap_confidence_intervals, quantile
+from .standard_error import simulate_standard_error_curve
+
+# How long the first request of a batch waits for others to join it (seconds)
+DEFAULT_BATCH_WINDOW = 0.005
+
+# Requests admitted at once before the service starts answering 503
+DEFAULT_MAX_PENDING = 256
+
+# Largest accepted request body
+MAX_BODY_BYTES = 64 * 1024 ** 2
+
+# Most values a single request may draw or evaluate (a few seconds of CPU per 10^9)
+DEFAULT_MAX_WORK = 2 * 10 ** 9
+
+# Number of recent latencies kept for /stats
+LATENCY_HISTORY = 1000
+
+# Statistics a request may name; quantiles are written quantile(q)
+STATISTICS = {'mean': np.mean, 'median': np.median, 'std': np.std, 'var': np.var, 'sum': np.sum,
+              'min': np.min, 'max': np.max}
+QUANTILE_PATTERN = re.compile(r'quantile\(\s*([0-9.eE+-]+)\s*\)')
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large', 500: 'Internal Server Error',
+           503: 'Service Unavailable'}
+
+# Function to turn a statistic name from a request into the statistic
+def parse_statistic(name):
+    if name in STATISTICS:
+        return STATISTICS[name]
+    match = QUANTILE_PATTERN.fullmatch(name)
+    if match and 0 <= float(match.group(1)) <= 1:
+        return quantile(float(match.group(1)))
+    raise ValueError(f'unknown statistic {name!r}: use one of {sorted(STATISTICS)} or quantile(q)')
+
+# Function to read a JSON integer request field that must be at least minimum (1e3 or 1000.0 is not an integer)
+def _integer_field(body, name, default=None, minimum=1):
+    value = body.get(name, default)
+    if value is None:
+        raise KeyError(name)
+    if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+        raise ValueError(f'{name} must be an integer >= {minimum}, got {value!r}')
+    return value
+
+# Function to read a list-valued request field, falling back to its singular form or default
+def _list_field(body, name, singular, default, kind, description):
+    values = body.get(name)
+    if values is None:
+        values = [body.get(singular, default)]
+    if not isinstance(values, list) or not values or not all(isinstance(value, kind) for value in values):
+        raise ValueError(f'{name} must be a non-empty list of {description}, got {values!r}')
+    return values
+
+# Function to read an optional seed: None or a non-negative integer
+def _seed_field(body):
+    random_state = body.get('random_state')
+    if random_state is not None:
+        random_state = _integer_field(body, 'random_state', minimum=0)
+    return random_state
+
+# Worker job: one shared set of resamples for every statistic and level of a batch
+def _bootstrap_batch(data, statistic_names, confidence_levels, R, random_state, chunk_size, method):
+    statistics = {name: parse_statistic(name) for name in statistic_names}
+    _, intervals = bootstrap_confidence_intervals(data, statistics, R, confidence_levels, random_state=random_state,
+                                                  chunk_size=chunk_size, method=method)
+    return {name: {level: interval.tolist() for level, interval in by_level.items()}
+            for name, by_level in intervals.items()}
+
+# Worker job: one set of standardized draws scaled to every (mean, std) of a batch
+def _standard_error_batch(population_means, population_stds, sample_size, num_samples, random_state):
+    sample_means_std, standard_error = simulate_standard_error_curve(
+        np.asarray(population_means), np.asarray(population_stds), sample_size, num_samples,
+        random_state=random_state)
+    return sample_means_std.tolist(), standard_error.tolist()
+
+# Function to draw a fresh seed for an unseeded batch (not from np.random: forked workers share its state)
+def _fresh_seed():
+    return int(np.random.SeedSequence().entropy % (2 ** 63))
+
+class BootstrapService:
+    def __init__(self, max_workers=None, executor='process', batch_window=DEFAULT_BATCH_WINDOW,
+                 max_pending=DEFAULT_MAX_PENDING, max_work=DEFAULT_MAX_WORK):
+        if executor not in ('process', 'thread'):
+            raise ValueError(f"executor must be 'process' or 'thread', got {executor!r}")
+        self.max_workers = max_workers
+        self.executor = executor
+        self.batch_window = batch_window
+        self.max_pending = max_pending
+        self.max_work = max_work
+        self._pool = None
+        self._server = None
+        self._pending = {}
+        self._timers = {}
+        self._batch_tasks = set()
+        self._in_flight = 0
+        self._counts = {'requests': 0, 'rejected': 0, 'errors': 0, 'batches': 0, 'batched_requests': 0}
+        self._latencies = deque(maxlen=LATENCY_HISTORY)
+
+    # Function to start listening on a TCP port (port=0 picks a free one) or a Unix socket
+    async def start(self, host='127.0.0.1', port=0, unix_path=None):
+        if self.executor == 'process':
+            # Spawned, not forked: a forked worker would inherit open client sockets and keep them from closing
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        if unix_path is not None:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=unix_path)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server
+
+    @property
+    def port(self):
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        # Batches still waiting for their window run now, and the pool outlives every running batch
+        for key in list(self._timers):
+            self._start_batch(key)
+        if self._batch_tasks:
+            await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+    # Function to read one HTTP request, answer it and close the connection
+    async def _handle_connection(self, reader, writer):
+        arrived = time.perf_counter()
+        try:
+            status, payload = await self._read_and_dispatch(reader, arrived)
+        except (ValueError, KeyError, TypeError) as error:
+            status, payload = 400, {'error': str(error)}
+        except Exception as error:
+            self._counts['errors'] += 1
+            status, payload = 500, {'error': f'{type(error).__name__}: {error}'}
+        latency_ms = (time.perf_counter() - arrived) * 1000
+        payload['latency_ms'] = latency_ms
+        if status == 200:
+            self._latencies.append(latency_ms)
+
+        body = json.dumps(payload).encode()
+        headers = [f'HTTP/1.1 {status} {REASONS[status]}', 'Content-Type: application/json',
+                   f'Content-Length: {len(body)}', f'X-Latency-Ms: {latency_ms:.3f}', 'Connection: close']
+        if status == 503:
+            headers.append('Retry-After: 1')
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    async def _read_and_dispatch(self, reader, arrived):
+        request_line = (await reader.readline()).decode('latin-1').split()
+        if len(request_line) < 2:
+            raise ValueError('malformed request line')
+        method, path = request_line[0].upper(), request_line[1]
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length', 0))
+        if length > MAX_BODY_BYTES:
+            return 413, {'error': f'request body larger than {MAX_BODY_BYTES} bytes'}
+        try:
+            body = json.loads(await reader.readexactly(length)) if length else {}
+        except asyncio.IncompleteReadError as error:
+            raise ValueError(f'request body ended after {len(error.partial)} of {length} bytes') from None
+
+        if method == 'GET' and path == '/health':
+            return 200, {'status': 'ok'}
+        if method == 'GET' and path == '/stats':
+            return 200, self.stats()
+        handlers = {'/bootstrap': self._bootstrap, '/standard-error': self._standard_error}
+        if method != 'POST' or path not in handlers:
+            return 404, {'error': f'no route for {method} {path}'}
+
+        # Backpressure: refuse instead of queueing without bound
+        self._counts['requests'] += 1
+        if self._in_flight >= self.max_pending:
+            self._counts['rejected'] += 1
+            return 503, {'error': 'too many requests in flight, retry later'}
+        self._in_flight += 1
+        try:
+            return 200, await handlers[path](body, arrived)
+        finally:
+            self._in_flight -= 1
+
+    # Every field is checked here, before batching, so one bad request cannot fail the batch it would join
+    async def _bootstrap(self, body, arrived):
+        data = np.asarray(body['data'], dtype=np.float64)
+        if data.ndim != 1 or len(data) == 0 or not np.all(np.isfinite(data)):
+            raise ValueError('data must be a non-empty list of finite numbers')
+        names = _list_field(body, 'statistics', 'statistic', 'mean', str, 'statistic names')
+        for name in names:
+            parse_statistic(name)
+        levels = _list_field(body, 'confidence_levels', 'confidence_level', 95, (int, float), 'numbers')
+        for level in levels:
+            if isinstance(level, bool) or not 0 < level < 100:
+                raise ValueError(f'confidence levels must be numbers in (0, 100), got {level!r}')
+        method = body.get('method', 'percentile')
+        if method not in ('percentile', 'bca'):
+            raise ValueError(f"method must be 'percentile' or 'bca', got {method!r}")
+        R = _integer_field(body, 'R', 1000)
+        chunk_size = _integer_field(body, 'chunk_size', DEFAULT_CHUNK_SIZE)
+        if method == 'bca':
+            # The jackknife of an order statistic evaluates n leave-one-out samples of n - 1 values
+            self._check_work(R * len(data) + len(data) ** 2, 'R x len(data) + len(data)^2')
+        else:
+            self._check_work(R * len(data), 'R x len(data)')
+        key = ('bootstrap', hashlib.blake2b(data.tobytes(), digest_size=16).hexdigest(), len(data), R,
+               _seed_field(body), chunk_size, method)
+        result, timing = await self._submit(key, {'data': data, 'statistics': names, 'levels': levels}, arrived)
+        intervals = {name: {str(level): result['intervals'][name][level] for level in levels} for name in names}
+        return {'intervals': intervals, 'random_state': result['random_state'], **timing}
+
+    async def _standard_error(self, body, arrived):
+        item = {'population_mean': float(body['population_mean']), 'population_std': float(body['population_std'])}
+        if not (np.isfinite(item['population_mean']) and np.isfinite(item['population_std'])
+                and item['population_std'] >= 0):
+            raise ValueError('population_mean must be finite and population_std finite and >= 0')
+        sample_size, num_samples = _integer_field(body, 'sample_size'), _integer_field(body, 'num_samples')
+        self._check_work(num_samples * sample_size, 'num_samples x sample_size')
+        key = ('standard-error', sample_size, num_samples, _seed_field(body))
+        result, timing = await self._submit(key, item, arrived)
+        return {'sample_means_std': result['sample_means_std'], 'standard_error': result['standard_error'],
+                'random_state': result['random_state'], **timing}
+
+    # Function to refuse a request whose worker job could not be stopped once running
+    def _check_work(self, work, description):
+        if work > self.max_work:
+            raise ValueError(f'request too large: {description} is {work} values, '
+                             f'the limit is {self.max_work}')
+
+    # Function to add a request to the batch for its key; the first request of a batch schedules the flush
+    async def _submit(self, key, item, arrived):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if key not in self._pending:
+            self._pending[key] = []
+            self._timers[key] = loop.call_later(self.batch_window, self._start_batch, key)
+        self._pending[key].append((item, future, arrived))
+        return await future
+
+    # Function to start the batch for a key as a task the service keeps a reference to until it finishes
+    def _start_batch(self, key):
+        self._timers.pop(key).cancel()
+        task = asyncio.get_running_loop().create_task(self._run_batch(key))
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+
+    # Function to run one coalesced batch on the worker pool and hand every request its part
+    async def _run_batch(self, key):
+        batch = self._pending.pop(key)
+        self._counts['batches'] += 1
+        self._counts['batched_requests'] += len(batch)
+        random_state = key[-1] if key[0] == 'standard-error' else key[4]
+        if random_state is None:
+            random_state = _fresh_seed()
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+        try:
+            if key[0] == 'bootstrap':
+                _, _, _, R, _, chunk_size, method = key
+                names = list(dict.fromkeys(name for item, _, _ in batch for name in item['statistics']))
+                levels = list(dict.fromkeys(level for item, _, _ in batch for level in item['levels']))
+                intervals = await loop.run_in_executor(self._pool, _bootstrap_batch, batch[0][0]['data'], names,
+                                                       levels, R, random_state, chunk_size, method)
+                results = [{'intervals': intervals, 'random_state': random_state}] * len(batch)
+            else:
+                _, sample_size, num_samples, _ = key
+                sample_means_std, standard_error = await loop.run_in_executor(
+                    self._pool, _standard_error_batch, [item['population_mean'] for item, _, _ in batch],
+                    [item['population_std'] for item, _, _ in batch], sample_size, num_samples, random_state)
+                results = [{'sample_means_std': sample_means_std[i], 'standard_error': standard_error[i],
+                            'random_state': random_state} for i in range(len(batch))]
+        except Exception as error:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        finished = time.perf_counter()
+        for result, (_, future, arrived) in zip(results, batch):
+            timing = {'queue_ms': (submitted - arrived) * 1000, 'compute_ms': (finished - submitted) * 1000,
+                      'batch_size': len(batch)}
+            if not future.done():
+                future.set_result((result, timing))
+
+    def stats(self):
+        latencies = np.array(self._latencies)
+        summary = {}
+        if len(latencies):
+            summary = dict(zip(('p50', 'p90', 'p99'), np.percentile(latencies, [50, 90, 99]).tolist()))
+            summary['max'] = float(latencies.max())
+        return {**self._counts, 'in_flight': self._in_flight, 'recent_latency_ms': summary}
+
+# Function to send one JSON request to a running service (TCP or Unix socket) and return (status, body)
+async def request_json(method, path, payload=None, host='127.0.0.1', port=8765, unix_path=None):
+    if unix_path is not None:
+        reader, writer = await asyncio.open_unix_connection(unix_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    body = json.dumps(payload).encode() if payload is not None else b''
+    writer.write((f'{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n'
+                  f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n').encode('latin-1') + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, content = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(content)
+
+async def serve(host='127.0.0.1', port=8765, unix_path=None, **options):
+    service = BootstrapService(**options)
+    server = await service.start(host, port, unix_path)
+    where = unix_path or f'http://{host}:{service.port}'
+    print(f'serving on {where}', flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sampling_distributions.service', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', dest='unix_path', help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--workers', dest='max_workers', type=int, default=None, help='worker pool size')
+    parser.add_argument('--executor', choices=('process', 'thread'), default='process')
+    parser.add_argument('--batch-window', type=float, default=DEFAULT_BATCH_WINDOW,
+                        help='seconds a batch waits for more requests (default %(default)s)')
+    parser.add_argument('--max-pending', type=int, default=DEFAULT_MAX_PENDING,
+                        help='requests admitted at once before answering 503 (default %(default)s)')
+    parser.add_argument('--max-work', type=int, default=DEFAULT_MAX_WORK,
+                        help='most values one request may draw before it is refused (default %(default)s)')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(**vars(args)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
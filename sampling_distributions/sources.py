@@ -0,0 +1,175 @@
+'''
+Data sources on disk: memory-mapped .npy and raw binary files, chunked CSV columns, and
+block-coalesced gathers from memory-mapped data.
+
+NOTE: Nothing here loads a file. .npy and raw binary files are opened as np.memmap, so
+    only the pages that are touched are read. CSV columns cannot be mapped; CSVColumn
+    parses them chunk by chunk for the single-pass routines (Poisson bootstrap, standard
+    error, histograms), and to_random_access spills any sequential source to a temporary
+    raw file once, chunk by chunk, when a routine needs random access (index resampling).
+
+NOTE: Resampling draws indices uniformly over the data, which on a large memmap turns
+    into random page reads. gather buckets the indices of a resampling block by file block
+    (a linear-time radix sort on uint16 block ids), walks the blocks in file order and
+    reads every densely hit one with a single contiguous read; sparsely hit blocks are
+    read element by element within that block, so data that is not needed is not copied.
+    The values are then put back in draw order.
+'''
+
+import hashlib
+import itertools
+import mmap
+import os
+import tempfile
+import weakref
+from collections import namedtuple
+from collections.abc import Iterator
+
+import numpy as np
+
+# Rows parsed per chunk when reading a CSV column
+DEFAULT_CSV_CHUNK_ROWS = 1_000_000
+
+# Size of the file blocks a gather reads with one contiguous request
+DEFAULT_GATHER_BLOCK_BYTES = 4 * 1024 ** 2
+
+# A block is read contiguously when at least this fraction of its elements is needed
+DENSE_BLOCK_FRACTION = 1 / 16
+
+# Smaller maps are gathered directly: after the first pass they sit in the page cache anyway
+COALESCE_MIN_BYTES = 64 * 1024 ** 2
+
+# Extra bytes per drawn index a coalesced gather needs (block ids, sort order, sorted indices)
+GATHER_OVERHEAD_BYTES = 24
+
+# File suffixes recognised by open_source; raw binary files are read as float64
+RAW_SUFFIXES = ('.bin', '.raw', '.dat')
+CSV_DELIMITERS = {'.csv': ',', '.tsv': '\t', '.txt': None}
+
+# Enough to reopen a memory map in another process instead of pickling its contents
+MemmapReference = namedtuple('MemmapReference', ['filename', 'dtype', 'offset', 'shape', 'order'])
+
+# Re-iterable reader for one numeric column of a CSV file, yielding float arrays of up to chunk_rows values.
+# With skip_header=None the first line is skipped when its column is not a number (a header row).
+class CSVColumn:
+    def __init__(self, path, column=0, delimiter=',', skip_header=None, dtype=np.float64,
+                 chunk_rows=DEFAULT_CSV_CHUNK_ROWS):
+        self.path = os.fspath(path)
+        self.column = column
+        self.delimiter = delimiter
+        self.skip_header = skip_header
+        self.dtype = dtype
+        self.chunk_rows = chunk_rows
+
+    def __iter__(self):
+        with open(self.path) as lines:
+            if self.skip_header is None:
+                first = next(lines, '')
+                try:
+                    float(first.split(self.delimiter)[self.column])
+                    lines = itertools.chain([first], lines)
+                except (ValueError, IndexError):
+                    pass
+            else:
+                for _ in range(self.skip_header):
+                    next(lines, None)
+            while True:
+                chunk = list(itertools.islice(lines, self.chunk_rows))
+                if not chunk:
+                    return
+                yield np.loadtxt(chunk, delimiter=self.delimiter, usecols=self.column, dtype=self.dtype, ndmin=1)
+
+    def __repr__(self):
+        return f'CSVColumn({self.path!r}, column={self.column!r})'
+
+# Function to memory-map a headerless binary file of one dtype
+def raw_binary(path, dtype=np.float64, offset=0):
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset)
+
+# Function to open a path by its suffix (.npy, raw binary, CSV); anything else is returned unchanged
+def open_source(source):
+    if not isinstance(source, (str, os.PathLike)):
+        return source
+    suffix = os.path.splitext(os.fspath(source))[1].lower()
+    if suffix == '.npy':
+        return np.load(source, mmap_mode='r')
+    if suffix in RAW_SUFFIXES:
+        return raw_binary(source)
+    if suffix in CSV_DELIMITERS:
+        return CSVColumn(source, delimiter=CSV_DELIMITERS[suffix])
+    raise ValueError(f'cannot tell how to read {os.fspath(source)!r}: use a .npy file, raw_binary(path, dtype) '
+                     f'or CSVColumn(path, ...)')
+
+# Function to make a source indexable: arrays and memmaps as they are, sequential readers spilled to a temporary
+# float64 memmap (the dtype of later chunks is not known up front, so the first chunk's dtype could truncate them)
+def to_random_access(source):
+    source = open_source(source)
+    if isinstance(source, np.ndarray):
+        return source
+    if not isinstance(source, (CSVColumn, Iterator)):
+        return np.asarray(source)
+
+    descriptor, path = tempfile.mkstemp(prefix='sampling_distributions_', suffix='.bin')
+    with os.fdopen(descriptor, 'wb') as spill:
+        for chunk in source:
+            np.asarray(chunk, dtype=np.float64).ravel().tofile(spill)
+    if os.path.getsize(path) == 0:
+        os.remove(path)
+        return np.zeros(0)
+    data = np.memmap(path, dtype=np.float64, mode='r')
+    # The spill file lives exactly as long as the map
+    weakref.finalize(data, os.remove, path)
+    return data
+
+# Function to hash the contents of an array (dtype, shape and bytes) with BLAKE2b, a chunk at a time
+# so a memory-mapped file is never loaded at once
+def data_digest(data, chunk_bytes=DEFAULT_GATHER_BLOCK_BYTES * 4):
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(repr((str(data.dtype), data.shape)).encode())
+    flat = data.reshape(-1)
+    step = max(1, chunk_bytes // max(1, data.itemsize))
+    for start in range(0, len(flat), step):
+        digest.update(np.ascontiguousarray(flat[start:start + step]).data)
+    return digest.hexdigest()
+
+# Function to describe a memmap by file, offset and shape, or None when it is not a whole mapped file
+def memmap_reference(data):
+    if (not isinstance(data, np.memmap) or data.filename is None or not isinstance(data.base, mmap.mmap)
+            or not (data.flags.c_contiguous or data.flags.f_contiguous)):
+        return None
+    return MemmapReference(data.filename, data.dtype.str, data.offset, data.shape,
+                           'C' if data.flags.c_contiguous else 'F')
+
+def open_reference(reference):
+    return np.memmap(reference.filename, dtype=reference.dtype, mode='r', offset=reference.offset,
+                     shape=reference.shape, order=reference.order)
+
+# Function to gather data[indices]; from a large memmap the reads are bucketed by file block and coalesced
+def gather(data, indices, block_bytes=DEFAULT_GATHER_BLOCK_BYTES):
+    if not isinstance(data, np.memmap) or data.nbytes < COALESCE_MIN_BYTES or indices.size == 0:
+        return data[indices]
+
+    # At most 2**16 blocks, so the block ids are uint16 and the stable argsort is a linear-time radix sort
+    flat = indices.ravel()
+    block = max(1, int(block_bytes) // data.dtype.itemsize, -(-len(data) // 2 ** 16))
+    # A narrow index dtype cannot hold a larger block size; every index then falls in block 0
+    if block <= np.iinfo(flat.dtype).max:
+        block_ids = (flat // block).astype(np.uint16)
+    else:
+        block_ids = np.zeros(len(flat), dtype=np.uint16)
+    order = np.argsort(block_ids, kind='stable')
+    counts = np.bincount(block_ids, minlength=-(-len(data) // block))
+    bounds = np.concatenate([[0], np.cumsum(counts)])
+    sorted_indices = flat[order]
+
+    # Walk the blocks in file order; the values go back to their draw positions
+    values = np.empty(len(flat), dtype=data.dtype)
+    for b in np.flatnonzero(counts):
+        lo, hi = bounds[b], bounds[b + 1]
+        start, stop = b * block, min((b + 1) * block, len(data))
+        if hi - lo >= DENSE_BLOCK_FRACTION * (stop - start):
+            # Densely hit: one contiguous read, then pick from memory
+            values[order[lo:hi]] = np.array(data[start:stop])[sorted_indices[lo:hi] - start]
+        else:
+            values[order[lo:hi]] = data[sorted_indices[lo:hi]]
+    return values.reshape(indices.shape)
@@ -0,0 +1,159 @@
+'''
+Simulation of the standard error of the sample mean.
+
+NOTE: Memory and parameter sweeps.
+    A sample mean from N(mean, std) is mean + std * (mean of n standard normals), so only
+    standard normal samples are simulated and every (mean, std) pair is obtained by scaling.
+    Samples are drawn in blocks bounded by max_memory_bytes and the sample means are folded
+    into running Welford (count, mean, M2) statistics, so millions of samples per point
+    fit in a flat amount of memory. For a grid of sample sizes, one draw of the largest
+    size is cut at every requested n (prefix sums), giving the whole SE curve in one pass.
+
+NOTE: compact=True draws the standard normals as float32 (half the bytes per value, twice
+    the values per block) and sums them in float64, so the sample means keep full
+    precision; the float32 generator is a different stream than the float64 one.
+
+NOTE: sample_standard_error estimates s / sqrt(n) for observed data instead of a simulated
+    population. The source (array, np.memmap, .npy/raw binary/CSV path or iterable of
+    arrays) is read once in chunks and folded into the same running Welford statistics.
+
+NOTE: simulate_sampling(..., cache=True) (or a ResultCache) memoizes seeded simulations,
+    sample means included; see cache.py.
+'''
+
+import numpy as np
+
+from ._common import DEFAULT_MAX_MEMORY_BYTES, as_generator, iter_chunks
+from .cache import resolve_cache, simulation_cache_key
+from .instrumentation import active_recorder, instrumented, phase
+
+# Function to generate blocks of standardized sample means, one column per requested sample size
+def _iter_standardized_mean_blocks(sample_sizes, num_samples, max_memory_bytes, rng, dtype=np.float64):
+    # sample_sizes must be sorted and unique; the largest one decides how much is drawn
+    largest = int(sample_sizes[-1])
+    budget = max(1, int(max_memory_bytes) // np.dtype(dtype).itemsize)
+    rows = max(1, min(num_samples, budget // largest))
+    cols = min(largest, budget)
+
+    recorder = active_recorder()
+    for start in range(0, num_samples, rows):
+        block_rows = min(rows, num_samples - start)
+        # Sum of the values between consecutive sample sizes, for every sample in the block
+        segment_sums = np.zeros((block_rows, len(sample_sizes)))
+        for offset in range(0, largest, cols):
+            width = min(cols, largest - offset)
+            with phase(recorder, 'draw'):
+                values = rng.standard_normal((block_rows, width), dtype=dtype)
+            # Cut this column chunk wherever a segment ends
+            cuts = sample_sizes[(sample_sizes > offset) & (sample_sizes < offset + width)] - offset
+            starts = np.concatenate([[0], cuts])
+            with phase(recorder, 'reduce'):
+                if values.dtype == np.float64:
+                    pieces = np.add.reduceat(values, starts, axis=1)
+                else:
+                    # reduceat with a wider accumulator is slow; pairwise float64 sums per segment are not
+                    ends = np.append(starts[1:], width)
+                    pieces = np.stack([values[:, a:b].sum(axis=1, dtype=np.float64)
+                                       for a, b in zip(starts, ends)], axis=1)
+            if recorder is not None:
+                recorder.add('values_drawn', values.size)
+                recorder.peak('peak_block_bytes', values.nbytes)
+            first_segment = np.searchsorted(sample_sizes, offset, side='right')
+            segment_sums[:, first_segment:first_segment + pieces.shape[1]] += pieces
+        if recorder is not None:
+            recorder.add('samples', block_rows)
+        # Prefix sums give the total of the first n values for every requested n
+        yield np.cumsum(segment_sums, axis=1) / sample_sizes
+
+# Function to merge a block of values into running Welford statistics (Chan et al. update)
+@instrumented('welford')
+def _welford_update(count, mean, m2, block):
+    block_count = block.shape[0]
+    block_mean = block.mean(axis=0)
+    block_m2 = ((block - block_mean) ** 2).sum(axis=0)
+    total = count + block_count
+    delta = block_mean - mean
+    mean = mean + delta * block_count / total
+    m2 = m2 + block_m2 + delta ** 2 * count * block_count / total
+    return total, mean, m2
+
+# Function to simulate sampling and calculate standard error
+@instrumented('simulate_sampling')
+def simulate_sampling(population_mean, population_std, sample_size, num_samples,
+                      return_means=True, max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES, random_state=None,
+                      compact=False, cache=None):
+    # Seeded simulations are looked up by their parameters; unseeded ones are not reproducible
+    cache, cache_key = resolve_cache(cache), None
+    if cache is not None:
+        cache_key = simulation_cache_key(population_mean, population_std, sample_size, num_samples, return_means,
+                                         max_memory_bytes, random_state, compact)
+        cached = cache.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            return cached.get('sample_means'), cached['standard_error'][()]
+    rng = as_generator(random_state)
+
+    # Keep every sample mean only when asked to; the summary needs just the running statistics
+    sample_means = np.zeros(num_samples) if return_means else None
+    count, mean, m2 = 0, np.zeros(1), np.zeros(1)
+
+    start = 0
+    for block in _iter_standardized_mean_blocks(np.array([sample_size]), num_samples, max_memory_bytes, rng,
+                                                np.float32 if compact else np.float64):
+        # Calculate sample means of the population from the standardized ones
+        block_means = population_mean + population_std * block
+        if return_means:
+            sample_means[start:start + len(block_means)] = block_means[:, 0]
+        start += len(block_means)
+        count, mean, m2 = _welford_update(count, mean, m2, block_means)
+
+    # Calculate standard deviation of the sample means
+    sample_means_std = np.sqrt(m2[0] / count)
+
+    # Calculate standard error
+    standard_error = sample_means_std / np.sqrt(sample_size)
+
+    if cache_key is not None:
+        cache.put(cache_key, {'standard_error': standard_error,
+                              **({'sample_means': sample_means} if return_means else {})})
+    return sample_means, standard_error
+
+# Function to simulate the standard error over a whole grid of sample sizes and population parameters.
+# The arguments broadcast against each other (e.g. sample_sizes[:, None] and population_stds[None, :]).
+@instrumented('simulate_standard_error_curve')
+def simulate_standard_error_curve(population_mean, population_std, sample_sizes, num_samples,
+                                  max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES, random_state=None, compact=False):
+    rng = as_generator(random_state)
+    population_mean, population_std, sample_sizes = np.broadcast_arrays(
+        np.asarray(population_mean, dtype=float), np.asarray(population_std, dtype=float),
+        np.asarray(sample_sizes, dtype=np.int64))
+
+    # Simulate each distinct sample size once, on the standard normal
+    unique_sizes, grid_index = np.unique(sample_sizes, return_inverse=True)
+    count, mean, m2 = 0, np.zeros(len(unique_sizes)), np.zeros(len(unique_sizes))
+    for block in _iter_standardized_mean_blocks(unique_sizes, num_samples, max_memory_bytes, rng,
+                                                np.float32 if compact else np.float64):
+        count, mean, m2 = _welford_update(count, mean, m2, block)
+
+    # Scale to every population standard deviation; the population mean only shifts the means
+    sample_means_std = population_std * np.sqrt(m2 / count)[grid_index.reshape(sample_sizes.shape)]
+
+    # Calculate standard error
+    standard_error = sample_means_std / np.sqrt(sample_sizes)
+
+    return sample_means_std, standard_error
+
+# Function to compute the mean and standard error of the mean of observed data in one chunked pass
+@instrumented('sample_standard_error')
+def sample_standard_error(source, max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES):
+    # Each chunk is read and converted to float64 once
+    chunk_size = max(1, int(max_memory_bytes) // 16)
+    count, mean, m2 = 0, np.zeros(1), np.zeros(1)
+    for chunk in iter_chunks(source, chunk_size):
+        if len(chunk):
+            count, mean, m2 = _welford_update(count, mean, m2, chunk.astype(np.float64, copy=False)[:, None])
+    if count < 2:
+        raise ValueError('the standard error needs at least two observations')
+
+    # Sample standard deviation (n - 1) and the standard error of the mean
+    sample_std = np.sqrt(m2[0] / (count - 1))
+    return mean[0], sample_std / np.sqrt(count)
@@ -0,0 +1,331 @@
+'''
+Cached, broadcast-evaluated tables of the t and chi-square distributions over many
+degrees of freedom.
+
+NOTE: Evaluating pdf/cdf/ppf one df at a time repeats the same work on every run.
+    evaluate_grid evaluates a whole (df x x) grid in one broadcast scipy call and keeps
+    recent grids in an in-process LRU cache bounded by GRID_CACHE_BYTES (grids larger than
+    the bound are returned but not kept). distribution_table builds a uniform grid
+    (in log(df), and in x, or for ppf tables in the normal quantile of the probability,
+    with values interpolated on an asinh scale, so the steep tails are resolved; chi-square
+    pdf/cdf grids are uniform in x + log(x), which is log-spaced near the x^((df-2)/2)
+    behaviour at 0 and evenly spaced in the tail, with pdf values interpolated on a log
+    scale) for a df and x range and refines it until piecewise cubic (4 x 4 Lagrange)
+    interpolation meets the requested tolerance (absolute for values up to 1 in magnitude,
+    relative above), then stores it both in an LRU cache and on disk, so later processes
+    load it instead of recomputing it; a corrupt or incomplete file is rebuilt. The error
+    bound is empirical: interpolation is compared with exact values at
+    CHECK_POINTS_PER_CELL - 1 interior points of every cell in each direction, and a table
+    is accepted only when TABLE_SAFETY_FACTOR times the largest error found is within the
+    tolerance; it is not a proof for points in between.
+    Off-grid queries use O(1) index arithmetic and are interpolated in cache-sized blocks;
+    queries outside the table fall back to exact evaluation.
+    critical_value memoizes exact ppf lookups, so repeated critical values cost a dict hit.
+'''
+
+import hashlib
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+from ._common import resolve_cache_dir
+from .instrumentation import active_recorder, instrumented
+
+# Distributions and functions the tables support
+TABLE_DISTRIBUTIONS = ('t', 'chi2')
+TABLE_FUNCTIONS = ('pdf', 'cdf', 'ppf')
+
+# Default absolute interpolation tolerance of a table
+DEFAULT_TABLE_TOLERANCE = 1e-5
+
+# Grid size a table starts from, and the most values it may grow to while refining
+INITIAL_TABLE_SHAPE = (17, 65)
+MAX_TABLE_VALUES = 2 ** 20
+
+# Points interpolated per block by a table lookup
+LOOKUP_BLOCK = 2 ** 13
+
+# The error is checked at CHECK_POINTS_PER_CELL - 1 points inside every cell and direction, CHECK_BLOCK_VALUES
+# points at a time, and a table is accepted once that measured error times TABLE_SAFETY_FACTOR is within tolerance
+CHECK_POINTS_PER_CELL = 4
+CHECK_BLOCK_VALUES = 2 ** 20
+TABLE_SAFETY_FACTOR = 2
+
+# Version of the stored table layout; part of the on-disk key, so tables built with other coordinates are not reused
+TABLE_FORMAT = 3
+
+# Byte bound of the in-process cache of evaluated grids (evaluate_grid)
+GRID_CACHE_BYTES = 64 * 1024 ** 2
+
+def _check(dist, func):
+    if dist not in TABLE_DISTRIBUTIONS:
+        raise ValueError(f'dist must be one of {TABLE_DISTRIBUTIONS}, got {dist!r}')
+    if func not in TABLE_FUNCTIONS:
+        raise ValueError(f'func must be one of {TABLE_FUNCTIONS}, got {func!r}')
+
+# Function to evaluate dist.func(x, df) exactly, broadcasting df against x
+@instrumented('scipy_evaluate')
+def _evaluate(dist, func, dfs, x):
+    from scipy import stats
+    values = getattr(getattr(stats, dist), func)(x, dfs)
+    recorder = active_recorder()
+    if recorder is not None:
+        recorder.add('points_evaluated', np.size(values))
+    return values
+
+# Recently evaluated grids, least recently used first, and their total size
+_grid_cache = OrderedDict()
+_grid_cache_bytes = 0
+_grid_cache_lock = threading.Lock()
+
+# Function to evaluate a grid, or return it from the in-process LRU cache (bounded by GRID_CACHE_BYTES)
+def _cached_grid(dist, func, dfs_bytes, x_bytes):
+    global _grid_cache_bytes
+    key = (dist, func, dfs_bytes, x_bytes)
+    with _grid_cache_lock:
+        if key in _grid_cache:
+            _grid_cache.move_to_end(key)
+            return _grid_cache[key]
+    values = _evaluate(dist, func, np.frombuffer(dfs_bytes)[:, None], np.frombuffer(x_bytes)[None, :])
+    # Shared between callers, so it must not be modified in place
+    values.setflags(write=False)
+    # The key holds the input bytes too, so they count against the bound
+    size = values.nbytes + len(dfs_bytes) + len(x_bytes)
+    with _grid_cache_lock:
+        if size <= GRID_CACHE_BYTES and key not in _grid_cache:
+            _grid_cache[key] = values
+            _grid_cache_bytes += size
+            while _grid_cache_bytes > GRID_CACHE_BYTES:
+                (_, _, evicted_dfs, evicted_x), evicted = _grid_cache.popitem(last=False)
+                _grid_cache_bytes -= evicted.nbytes + len(evicted_dfs) + len(evicted_x)
+    return values
+
+# Function to evaluate a whole (df x x) grid in one broadcast call: one row per df.
+# Recent grids are kept in an in-process LRU cache bounded by GRID_CACHE_BYTES; the result is read-only.
+@instrumented('evaluate_grid')
+def evaluate_grid(dist, func, dfs, x):
+    _check(dist, func)
+    dfs = np.ascontiguousarray(dfs, dtype=np.float64).ravel()
+    x = np.ascontiguousarray(x, dtype=np.float64).ravel()
+    return _cached_grid(dist, func, dfs.tobytes(), x.tobytes())
+
+# Function to look up an exact critical value (ppf) with memoization, e.g. critical_value('t', 9, 0.975)
+@lru_cache(maxsize=65536)
+def critical_value(dist, df, probability):
+    _check(dist, 'ppf')
+    return float(_evaluate(dist, 'ppf', df, probability))
+
+# Function to invert c = x + log(x) (x = W(e^c), Lambert W) by Newton steps, without overflowing e^c
+def _solve_x_plus_log_x(coordinates):
+    coordinates = np.asarray(coordinates, dtype=np.float64)
+    # exp(c) is accurate where log(x) dominates, c - log(c) where x does
+    x = np.where(coordinates < 1, np.exp(np.minimum(coordinates, 1)), coordinates - np.log(np.maximum(coordinates, 1)))
+    for _ in range(50):
+        step = (x + np.log(x) - coordinates) * x / (x + 1)
+        x = np.maximum(x - step, x / 10)
+        if np.all(np.abs(step) <= 1e-15 * np.maximum(x, 1e-300)):
+            break
+    return x
+
+# Function to compute the cubic Lagrange weights of the 4 stencil points 0, 1, 2, 3 at offset s
+def _cubic_weights(s):
+    low, high = s * (s - 1), (s - 2) * (s - 3)
+    return (high * (1 - s) / 6, high * s / 2, low * (3 - s) / 2, low * (s - 2) / 6)
+
+class DistributionTable:
+    # A grid of dist.func over [df_min, df_max] x [x_min, x_max], uniform in log(df) and the x coordinate
+    def __init__(self, dist, func, df_range, x_range, shape):
+        _check(dist, func)
+        self.dist, self.func = dist, func
+        self.df_range, self.x_range = tuple(map(float, df_range)), tuple(map(float, x_range))
+        self.log_dfs = np.linspace(np.log(self.df_range[0]), np.log(self.df_range[1]), shape[0])
+        # Grid coordinates along x (see _x_coordinate)
+        self.xs = np.linspace(*self._x_coordinate(np.array(self.x_range)), shape[1])
+        # ppf tables store asinh(ppf): heavy-tailed quantiles grow like exp(z^2 / 2), their asinh like z^2;
+        # chi-square pdf tables store log(pdf), which is close to linear in log(df) and x + log(x)
+        self.values = _evaluate(dist, func, self.dfs[:, None], self.x_values[None, :])
+        self.finite = bool(np.all(np.isfinite(self.values)))
+        if func == 'ppf':
+            self.values = np.arcsinh(self.values)
+        elif dist == 'chi2' and func == 'pdf':
+            # Densities that underflow to 0 are stored as the log of the smallest normal double
+            self.values = np.log(np.maximum(self.values, np.finfo(np.float64).tiny))
+        self.error_bound = np.inf
+
+    @property
+    def dfs(self):
+        return np.exp(self.log_dfs)
+
+    @property
+    def x_values(self):
+        return self._x_values_at(self.xs)
+
+    # ppf tables are uniform in the normal quantile of the probability, which straightens the tails;
+    # chi-square pdf/cdf tables are uniform in x + log(x), where a grid uniform in x never converges
+    # on the x^((df-2)/2) behaviour at 0 and one uniform in log(x) is too coarse in the tail
+    def _x_coordinate(self, x):
+        if self.func == 'ppf':
+            from scipy.special import ndtri
+            return ndtri(x)
+        if self.dist == 'chi2':
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return x + np.log(x)
+        return x
+
+    # Function to interpolate the table at (df, x), broadcasting the two against each other
+    @instrumented('table_lookup')
+    def __call__(self, df, x):
+        df, x = np.broadcast_arrays(np.asarray(df, dtype=np.float64), np.asarray(x, dtype=np.float64))
+        inside = ((df >= self.df_range[0]) & (df <= self.df_range[1])
+                  & (x >= self.x_range[0]) & (x <= self.x_range[1]))
+        result = np.empty(df.shape)
+
+        # Cache-sized blocks: the temporaries of a block are reused instead of page-faulted in for every call
+        inside_df, inside_x = df[inside], x[inside]
+        interpolated = np.empty(len(inside_df))
+        for start in range(0, len(inside_df), LOOKUP_BLOCK):
+            stop = start + LOOKUP_BLOCK
+            interpolated[start:stop] = self._interpolate(inside_df[start:stop], inside_x[start:stop])
+        if self.func == 'ppf':
+            interpolated = np.sinh(interpolated)
+        elif self.dist == 'chi2' and self.func == 'pdf':
+            interpolated = np.exp(interpolated)
+        result[inside] = interpolated
+
+        # Anything outside the table is evaluated exactly
+        if not inside.all():
+            result[~inside] = _evaluate(self.dist, self.func, df[~inside], x[~inside])
+        return result[()] if result.ndim == 0 else result
+
+    # Function to interpolate the stored values at points inside the table (before any back-transform).
+    # O(1) cell lookup on the uniform grids; the 4 x 4 stencil around the cell is shifted inwards at the edges.
+    def _interpolate(self, df, x):
+        u = (np.log(df) - self.log_dfs[0]) / (self.log_dfs[1] - self.log_dfs[0])
+        v = (self._x_coordinate(x) - self.xs[0]) / (self.xs[1] - self.xs[0])
+        i = np.clip(np.floor(u).astype(np.int64) - 1, 0, len(self.log_dfs) - 4)
+        j = np.clip(np.floor(v).astype(np.int64) - 1, 0, len(self.xs) - 4)
+        df_weights, x_weights = _cubic_weights(u - i), _cubic_weights(v - j)
+        # Flat offsets into the row-major table, so every stencil point is one 1-D take
+        values, width = self.values.ravel(), self.values.shape[1]
+        corner = i * width + j
+        interpolated = np.zeros(len(u))
+        row, term = np.empty(len(u)), np.empty(len(u))
+        for a in range(4):
+            np.multiply(x_weights[0], values.take(corner + a * width), out=row)
+            for b in range(1, 4):
+                row += np.multiply(x_weights[b], values.take(corner + (a * width + b)), out=term)
+            interpolated += np.multiply(df_weights[a], row, out=row)
+        return interpolated
+
+    # Function to measure the interpolation error at CHECK_POINTS_PER_CELL - 1 points inside every cell in
+    # each direction: along x (df on the grid), along df (x on the grid), and over the interior of the cells
+    def _interpolation_errors(self):
+        fine_log_dfs = np.linspace(self.log_dfs[0], self.log_dfs[-1],
+                                   CHECK_POINTS_PER_CELL * (len(self.log_dfs) - 1) + 1)
+        fine_xs = np.linspace(self.xs[0], self.xs[-1], CHECK_POINTS_PER_CELL * (len(self.xs) - 1) + 1)
+        x_values = np.clip(self._x_values_at(fine_xs), *self.x_range)[None, :]
+        on_x_grid = np.arange(len(fine_xs)) % CHECK_POINTS_PER_CELL == 0
+        along_x = along_df = interior = 0.0
+        # A band of rows at a time, so checking a large table does not build one huge array
+        rows = max(CHECK_POINTS_PER_CELL, CHECK_BLOCK_VALUES // len(fine_xs))
+        for start in range(0, len(fine_log_dfs), rows):
+            block = np.arange(start, min(start + rows, len(fine_log_dfs)))
+            dfs = np.clip(np.exp(fine_log_dfs[block]), *self.df_range)[:, None]
+            exact = _evaluate(self.dist, self.func, dfs, x_values)
+            # Absolute error for values up to 1 in magnitude, relative error above
+            scaled = np.abs(self(dfs, x_values) - exact) / np.maximum(1.0, np.abs(exact))
+            on_df_grid = block % CHECK_POINTS_PER_CELL == 0
+            along_x = max(along_x, np.nanmax(scaled[on_df_grid], initial=0.0))
+            along_df = max(along_df, np.nanmax(scaled[~on_df_grid][:, on_x_grid], initial=0.0))
+            interior = max(interior, np.nanmax(scaled[~on_df_grid][:, ~on_x_grid], initial=0.0))
+        return along_x, along_df, interior
+
+    def _x_values_at(self, coordinates):
+        if self.func == 'ppf':
+            from scipy.special import ndtr
+            return ndtr(coordinates)
+        if self.dist == 'chi2':
+            return _solve_x_plus_log_x(coordinates)
+        return coordinates
+
+    def __repr__(self):
+        return (f'DistributionTable({self.dist!r}, {self.func!r}, df_range={self.df_range}, '
+                f'x_range={self.x_range}, shape={self.values.shape}, error_bound={self.error_bound:.3g})')
+
+# Function to build a table whose interpolation error is within tolerance, refining the grid as needed
+@instrumented('build_table')
+def _build_table(dist, func, df_range, x_range, tolerance):
+    shape = INITIAL_TABLE_SHAPE
+    while True:
+        table = DistributionTable(dist, func, df_range, x_range, shape)
+        if not table.finite:
+            # Refining cannot fix values that are infinite or undefined inside the range
+            raise ValueError(f'{dist}.{func} is not finite everywhere over df {df_range}, x {x_range}: '
+                             f'narrow the ranges (points outside a table are evaluated exactly)')
+        along_x, along_df, interior = table._interpolation_errors()
+        table.error_bound = max(along_x, along_df, interior)
+        if table.error_bound * TABLE_SAFETY_FACTOR <= tolerance:
+            return table
+        # Halve the spacing in whichever direction contributes more error
+        shape = (2 * shape[0] - 1, shape[1]) if along_df >= along_x else (shape[0], 2 * shape[1] - 1)
+        if shape[0] * shape[1] > MAX_TABLE_VALUES:
+            raise ValueError(f'cannot reach tolerance {tolerance:g} for {dist}.{func} over df {df_range}, '
+                             f'x {x_range} within {MAX_TABLE_VALUES} values (best {table.error_bound:.3g})')
+
+# Function to read a stored table, or None when the file is corrupt or incomplete (it is then rebuilt)
+def _load_table(path, dist, func, df_range, x_range):
+    try:
+        with np.load(path) as stored:
+            table = DistributionTable.__new__(DistributionTable)
+            table.dist, table.func, table.df_range, table.x_range = dist, func, df_range, x_range
+            table.log_dfs, table.xs, table.values = stored['log_dfs'], stored['xs'], stored['values']
+            table.error_bound = float(stored['error_bound'])
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        return None
+    if table.values.shape != (len(table.log_dfs), len(table.xs)) or min(table.values.shape) < 4:
+        return None
+    return table
+
+# Function to get a table from the LRU cache, the on-disk cache or by building it
+@lru_cache(maxsize=32)
+def _cached_table(dist, func, df_range, x_range, tolerance, cache_dir):
+    path = None
+    if cache_dir is not None:
+        key = hashlib.sha1(repr((TABLE_FORMAT, dist, func, df_range, x_range, tolerance)).encode()).hexdigest()[:16]
+        path = os.path.join(cache_dir, f'{dist}-{func}-{key}.npz')
+        table = _load_table(path, dist, func, df_range, x_range) if os.path.exists(path) else None
+        if table is not None:
+            return table
+
+    table = _build_table(dist, func, df_range, x_range, tolerance)
+    if path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write then rename, so a concurrent reader never sees a half-written file
+        temporary = f'{path}.{os.getpid()}.tmp.npz'
+        np.savez(temporary, log_dfs=table.log_dfs, xs=table.xs, values=table.values,
+                 error_bound=table.error_bound)
+        os.replace(temporary, path)
+    return table
+
+# Function to reject ranges a table cannot cover, before any refinement is attempted
+def _check_ranges(dist, func, df_range, x_range):
+    if not 0 < df_range[0] < df_range[1] < np.inf:
+        raise ValueError(f'df_range must satisfy 0 < df_min < df_max < inf, got {df_range}')
+    if not x_range[0] < x_range[1]:
+        raise ValueError(f'x_range must satisfy x_min < x_max, got {x_range}')
+    if func == 'ppf' and not 0 < x_range[0] < x_range[1] < 1:
+        raise ValueError(f'ppf tables need probabilities strictly inside (0, 1), got {x_range}: '
+                         f'the quantiles of 0 and 1 are infinite or at the edge of the support')
+    elif dist == 'chi2' and func != 'ppf' and not 0 < x_range[0]:
+        raise ValueError(f'chi2 tables are uniform in x + log(x) and need x_min > 0, got {x_range}: '
+                         f'use a small positive x_min, points below it are evaluated exactly')
+
+def distribution_table(dist, func, df_range, x_range, tolerance=DEFAULT_TABLE_TOLERANCE, cache_dir=None):
+    _check(dist, func)
+    _check_ranges(dist, func, tuple(map(float, df_range)), tuple(map(float, x_range)))
+    return _cached_table(dist, func, tuple(map(float, df_range)), tuple(map(float, x_range)),
+                         float(tolerance), resolve_cache_dir(cache_dir))
@@ -0,0 +1,104 @@
+'''
+Single-pass, mergeable tail-index estimation for long-tailed data.
+
+NOTE: The Hill and Pickands estimators only look at the k largest observations, so a
+    stream never has to be kept in memory: TailSketch holds a bounded top-k buffer
+    (O(k) memory) that each chunk is merged into with one np.partition, which is the
+    vectorized equivalent of pushing the chunk through a size-k min-heap. Sketches from
+    different shards merge by keeping the top k of their union. hill_estimates and
+    pickands_estimates return the estimate for every number of order statistics j, and
+    tail_threshold_plot draws them against j so a stable region (the threshold) can be
+    picked by eye.
+'''
+
+import numpy as np
+
+from ._common import iter_chunks
+
+# Default number of top order statistics kept
+DEFAULT_TOP_K = 10_000
+
+# Values read per chunk when building a sketch from a data source
+DEFAULT_TAIL_CHUNK_SIZE = 1_000_000
+
+class TailSketch:
+    def __init__(self, k=DEFAULT_TOP_K):
+        self.k = k
+        self.top = np.zeros(0)
+        self.count = 0
+
+    # Keep the k largest of the current top values and the new ones
+    def _keep_top(self, values):
+        if len(values) > self.k:
+            values = np.partition(values, len(values) - self.k)[len(values) - self.k:]
+        self.top = values
+
+    # Add a chunk of raw values
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        self.count += len(values)
+        # Once the buffer is full, only values above its smallest entry can enter it
+        if len(self.top) == self.k:
+            values = values[values > self.top.min()]
+        self._keep_top(np.concatenate([self.top, values]))
+        return self
+
+    # Fold another sketch (e.g. from another shard) into this one
+    def merge(self, other):
+        self.count += other.count
+        self._keep_top(np.concatenate([self.top, other.top]))
+        return self
+
+    # The kept order statistics, largest first
+    def order_statistics(self):
+        return np.sort(self.top)[::-1]
+
+    def __repr__(self):
+        return f'TailSketch(k={self.k!r}, count={self.count}, kept={len(self.top)})'
+
+# Function to build a tail sketch in one streaming pass over an array, np.memmap, .npy path or iterable of arrays
+def build_tail_sketch(source, k=DEFAULT_TOP_K, chunk_size=DEFAULT_TAIL_CHUNK_SIZE):
+    sketch = TailSketch(k)
+    for chunk in iter_chunks(source, chunk_size):
+        sketch.update(chunk)
+    return sketch
+
+# Function to compute the Hill estimate of the tail index alpha for j = 1 .. k - 1 top order statistics:
+# 1 / alpha_j = mean(log X_(i), i < j) - log X_(j), with X_(0) the largest value.
+# Returns (j, alpha_j); only positive order statistics are used.
+def hill_estimates(sketch):
+    ordered = sketch.order_statistics()
+    logs = np.log(ordered[ordered > 0])
+    j = np.arange(1, len(logs))
+    with np.errstate(divide='ignore'):
+        gamma = np.cumsum(logs)[:-1] / j - logs[1:]
+        return j, 1 / gamma
+
+# Function to compute the Pickands estimate of the tail index for every j with 4j <= k:
+# 1 / alpha_j = log((X_(j) - X_(2j)) / (X_(2j) - X_(4j))) / log 2. Returns (j, alpha_j).
+def pickands_estimates(sketch):
+    ordered = sketch.order_statistics()
+    j = np.arange(1, len(ordered) // 4 + 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gamma = np.log((ordered[j - 1] - ordered[2 * j - 1]) / (ordered[2 * j - 1] - ordered[4 * j - 1])) / np.log(2)
+        return j, 1 / gamma
+
+# Function to draw the threshold-selection (Hill/Pickands) plot: alpha against the number of order statistics
+def tail_threshold_plot(sketch, ax=None, true_alpha=None):
+    import matplotlib.pyplot as plt
+    if ax is None:
+        ax = plt.gca()
+    j, hill = hill_estimates(sketch)
+    ax.plot(j, hill, color='blue', label='Hill')
+    j, pickands = pickands_estimates(sketch)
+    ax.plot(j, pickands, color='orange', alpha=0.7, label='Pickands')
+    if true_alpha is not None:
+        ax.axhline(true_alpha, linestyle='--', color='green', label=f'alpha={true_alpha}')
+    ax.set_xscale('log')
+    ax.set_xlabel('Number of Top Order Statistics (k)')
+    ax.set_ylabel('Tail Index Estimate (alpha)')
+    ax.set_title(f'Tail Threshold Selection ({sketch.count:,} values)')
+    ax.legend()
+    ax.grid(True)
+    return ax
@@ -0,0 +1,77 @@
+'''
+Tests of the vectorized binomial tails (exact, normal, Poisson and auto, both tails, log space) against scipy.
+'''
+
+import unittest
+
+import numpy as np
+from scipy.special import logsumexp
+from scipy.stats import binom
+
+from sampling_distributions import binomial_confidence_interval, binomial_tail
+from sampling_distributions.binomial import BERRY_ESSEEN_CONSTANT
+
+# (k, n, p) rows from tiny to huge n, rare to common successes, at 0, +-1 and +-3 standard deviations from the mean
+DEVIATIONS = np.array([-3, -1, 0, 1, 3])
+ROWS = np.array([(k, n, p) for n, p in [(10, 0.7), (1_000, 0.01), (1_000, 0.5), (50_000, 0.05),
+                                        (2_000_000, 0.3), (10 ** 9, 1e-7), (10 ** 9, 0.05)]
+                 for k in np.unique(np.round(n * p + DEVIATIONS * np.sqrt(n * p * (1 - p))).clip(0, n))])
+K, N, P = ROWS.T
+
+def scipy_log_tail(k, n, p, tail):
+    return binom.logsf(k - 1, n, p) if tail == 'upper' else binom.logcdf(k, n, p)
+
+class BinomialTailTest(unittest.TestCase):
+    def test_exact_tails_match_scipy_in_log_space(self):
+        for tail in ('upper', 'lower'):
+            with self.subTest(tail=tail):
+                np.testing.assert_allclose(binomial_tail(K, N, P, tail, method='exact', log=True),
+                                           scipy_log_tail(K, N, P, tail), rtol=1e-7, atol=1e-10)
+                np.testing.assert_allclose(binomial_tail(K, N, P, tail, method='exact'),
+                                           np.exp(scipy_log_tail(K, N, P, tail)), rtol=1e-7, atol=1e-12)
+
+    def test_approximations_are_within_their_error_bounds(self):
+        rare = np.minimum(P, 1 - P)
+        bounds = {'poisson': rare * -np.expm1(-N * rare),
+                  'normal': BERRY_ESSEEN_CONSTANT * (P ** 2 + (1 - P) ** 2) / np.sqrt(N * P * (1 - P))}
+        for method, bound in bounds.items():
+            for tail in ('upper', 'lower'):
+                with self.subTest(method=method, tail=tail):
+                    error = np.abs(binomial_tail(K, N, P, tail, method=method) - np.exp(scipy_log_tail(K, N, P, tail)))
+                    self.assertTrue(np.all(error <= bound + 1e-12), error - bound)
+
+    def test_auto_meets_the_tolerance(self):
+        for tolerance in (1e-3, 1e-6):
+            for tail in ('upper', 'lower'):
+                with self.subTest(tolerance=tolerance, tail=tail):
+                    auto = binomial_tail(K, N, P, tail, tolerance=tolerance)
+                    np.testing.assert_allclose(auto, np.exp(scipy_log_tail(K, N, P, tail)), rtol=0, atol=tolerance)
+                    log_auto = binomial_tail(K, N, P, tail, tolerance=tolerance, log=True)
+                    np.testing.assert_allclose(np.exp(log_auto), auto, rtol=1e-12, atol=0)
+
+    def test_extreme_tails_stay_finite_in_log_space(self):
+        # P(X <= 0) for n = 1e9, p = 1e-7 is exp(-100.000005): the Poisson path must not cancel to log(0)
+        for method in ('poisson', 'exact', 'auto'):
+            with self.subTest(method=method):
+                self.assertAlmostEqual(binomial_tail(0, 10 ** 9, 1e-7, tail='lower', method=method, log=True),
+                                       binom.logcdf(0, 10 ** 9, 1e-7), delta=1e-4)
+                self.assertAlmostEqual(binomial_tail(10 ** 9, 10 ** 9, 1 - 1e-7, tail='upper', method=method,
+                                                     log=True), binom.logsf(10 ** 9 - 1, 10 ** 9, 1 - 1e-7), delta=1e-4)
+        # Far beyond float64: P(X >= 900) for Binomial(1000, 0.1), summed in log space
+        expected = logsumexp(binom.logpmf(np.arange(900, 1001), 1000, 0.1))
+        self.assertAlmostEqual(binomial_tail(900, 1000, 0.1, method='exact', log=True) / expected, 1, places=6)
+        self.assertAlmostEqual(binomial_tail(100, 1000, 0.9, tail='lower', method='exact', log=True) / expected, 1,
+                               places=6)
+
+    def test_intervals_cover_the_estimate(self):
+        k, n = np.array([0, 3, 500, 1000]), np.array([1000, 1000, 1000, 1000])
+        for method in ('wilson', 'clopper-pearson'):
+            lower, upper = binomial_confidence_interval(k, n, 95, method=method)
+            self.assertTrue(np.all((lower <= k / n) & (k / n <= upper)))
+        lower, upper = binomial_confidence_interval(3, 1000, 95, method='clopper-pearson')
+        # Clopper-Pearson bounds are the beta quantiles at which the two tails equal 2.5%
+        self.assertAlmostEqual(binom.sf(2, 1000, lower), 0.025, places=9)
+        self.assertAlmostEqual(binom.cdf(3, 1000, upper), 0.025, places=9)
+
+if __name__ == '__main__':
+    unittest.main()
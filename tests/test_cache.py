@@ -0,0 +1,109 @@
+'''
+Tests of the result cache: statistic and data keys (edited globals, partials, memory maps) and LRU eviction.
+'''
+
+import functools
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from sampling_distributions import ResultCache, bootstrap_confidence_interval
+from sampling_distributions.cache import _statistic_key, bootstrap_cache_key
+
+DATA = np.random.default_rng(3).normal(0, 1, 500)
+
+# Function to define a module-level statistic that reads the global OFFSET, as a separate module would
+def _module_statistic():
+    namespace = {'__name__': 'statistic_module', 'np': np, 'OFFSET': 1.0}
+    exec('def shifted_mean(values):\n    return np.mean(values) + OFFSET', namespace)
+    return namespace
+
+class Unpinned:
+    def __call__(self, values):
+        return np.mean(values)
+
+    def __repr__(self):
+        return f'<Unpinned at {hex(id(self))}>'
+
+class StatisticKeyTest(unittest.TestCase):
+    def test_editing_a_global_changes_the_key(self):
+        namespace = _module_statistic()
+        before = _statistic_key(namespace['shifted_mean'])
+        self.assertIsNotNone(before)
+        self.assertEqual(_statistic_key(namespace['shifted_mean']), before)
+        namespace['OFFSET'] = 2.0
+        self.assertNotEqual(_statistic_key(namespace['shifted_mean']), before)
+        namespace['OFFSET'] = object()
+        self.assertIsNone(_statistic_key(namespace['shifted_mean']))
+
+    def test_partials_are_keyed_by_function_and_arguments(self):
+        tenth = _statistic_key(functools.partial(np.percentile, q=10))
+        self.assertIsNotNone(tenth)
+        self.assertNotIn(' at 0x', repr(tenth))
+        self.assertEqual(_statistic_key(functools.partial(np.percentile, q=10)), tenth)
+        self.assertNotEqual(_statistic_key(functools.partial(np.percentile, q=90)), tenth)
+        self.assertIsNone(_statistic_key(functools.partial(lambda values, q: np.percentile(values, q), q=10)))
+        self.assertIsNone(_statistic_key(functools.partial(np.percentile, q=object())))
+        self.assertIsNone(_statistic_key(Unpinned()))
+
+    def test_memmap_and_array_share_a_key(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'data.npy')
+            np.save(path, DATA)
+            mapped = np.load(path, mmap_mode='r')
+            key = bootstrap_cache_key(DATA, np.mean, 100, 95, 1, 1000, None, 'percentile')
+            self.assertEqual(bootstrap_cache_key(mapped, np.mean, 100, 95, 1, 1000, None, 'percentile'), key)
+            self.assertNotEqual(bootstrap_cache_key(DATA[::-1], np.mean, 100, 95, 1, 1000, None, 'percentile'), key)
+            del mapped
+
+    def test_uncacheable_calls_have_no_key(self):
+        self.assertIsNone(bootstrap_cache_key(DATA, np.mean, 100, 95, None, 1000, None, 'percentile'))
+        self.assertIsNone(bootstrap_cache_key(DATA, lambda values: values.mean(), 100, 95, 1, 1000, None,
+                                              'percentile'))
+
+class ResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_memory_tier_evicts_least_recently_used(self):
+        cache = ResultCache(max_memory_bytes=2000, cache_dir=False)
+        for key in 'abc':
+            cache.put(key, {'values': np.zeros(100)})
+        # Each entry holds 800 bytes, so the third evicts the least recently used one
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('b'))
+        cache.put('d', {'values': np.zeros(100)})
+        self.assertIsNone(cache.get('c'))
+        self.assertIsNotNone(cache.get('b'))
+        self.assertEqual(cache.info()['memory_bytes'], 1600)
+        cache.put('huge', {'values': np.zeros(1000)})
+        self.assertIsNone(cache.get('huge'))
+
+    def test_disk_tier_evicts_least_recently_used_files(self):
+        cache = ResultCache(cache_dir=self.directory, max_disk_bytes=10 ** 9)
+        for age, key in enumerate('abc'):
+            cache.put(key, {'values': np.zeros(1000)})
+            # Distinct modification times, oldest first
+            os.utime(cache._path(key), (1e9 + age, 1e9 + age))
+        size = os.path.getsize(cache._path('a'))
+        fresh = ResultCache(cache_dir=self.directory, max_disk_bytes=3 * size)
+        # A disk hit refreshes 'a', so 'b' is now the least recently used file
+        self.assertIsNotNone(fresh.get('a'))
+        self.assertEqual(fresh.info()['disk_hits'], 1)
+        fresh.put('d', {'values': np.zeros(1000)})
+        self.assertEqual(sorted(name[0] for name in os.listdir(fresh.cache_dir)), ['a', 'c', 'd'])
+
+    def test_cached_call_returns_the_stored_result(self):
+        cache = ResultCache(cache_dir=self.directory)
+        first = bootstrap_confidence_interval(DATA, np.median, 500, 95, random_state=4, cache=cache)
+        second = bootstrap_confidence_interval(DATA, np.median, 500, 95, random_state=4,
+                                               cache=ResultCache(cache_dir=self.directory))
+        np.testing.assert_array_equal(first[1], second[1])
+        np.testing.assert_array_equal(first[0], second[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+'''
+Tests of checkpointed and sharded bootstrap runs: resume after a torn log, shard merge, refusal of other runs.
+'''
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from sampling_distributions import bootstrap_confidence_interval, merge_bootstrap_shards
+from sampling_distributions.checkpoint import LOG_NAME
+
+DATA = np.random.default_rng(5).exponential(1.0, 300)
+RUN = dict(R=2000, confidence_level=95, random_state=11, chunk_size=250)
+
+def tenth_percentile(values):
+    return np.percentile(values, 10)
+
+def ninetieth_percentile(values):
+    return np.percentile(values, 90)
+
+class CheckpointTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.full_statistics, self.full_interval = bootstrap_confidence_interval(DATA, np.mean, **RUN)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_resume_after_torn_log_is_bit_identical(self):
+        bootstrap_confidence_interval(DATA, np.mean, **RUN, checkpoint_dir=self.path('run'))
+        log = os.path.join(self.path('run'), LOG_NAME)
+        # Keep three whole chunks, then half of the fourth, as a kill in the middle of a write would
+        record = 16 + 8 * RUN['chunk_size']
+        with open(log, 'r+b') as f:
+            f.truncate(3 * record + record // 2)
+        statistics, interval = bootstrap_confidence_interval(DATA, np.mean, **RUN, checkpoint_dir=self.path('run'))
+        np.testing.assert_array_equal(statistics, self.full_statistics)
+        np.testing.assert_array_equal(interval, self.full_interval)
+        self.assertEqual(os.path.getsize(log), 8 * record)
+
+    def test_merged_shards_equal_a_full_run(self):
+        for k in range(3):
+            bootstrap_confidence_interval(DATA, np.mean, **RUN, checkpoint_dir=self.path(f'shard-{k}'), shard=(k, 3))
+        paths = [self.path(f'shard-{k}') for k in range(3)]
+        statistics, interval = merge_bootstrap_shards(paths, 95)
+        np.testing.assert_array_equal(statistics, self.full_statistics)
+        np.testing.assert_array_equal(interval, self.full_interval)
+        _, bca = merge_bootstrap_shards(paths, 95, method='bca', data=DATA, statistic_func=np.mean)
+        np.testing.assert_array_equal(bca, bootstrap_confidence_interval(DATA, np.mean, **RUN, method='bca')[1])
+        with self.assertRaisesRegex(ValueError, 'statistic_func differs'):
+            merge_bootstrap_shards(paths, 95, method='bca', data=DATA, statistic_func=np.median)
+        with self.assertRaisesRegex(ValueError, 'missing'):
+            merge_bootstrap_shards(paths[:2], 95)
+
+    def test_resume_of_a_different_run_is_refused(self):
+        checkpoint = self.path('run')
+        bootstrap_confidence_interval(DATA, tenth_percentile, **RUN, checkpoint_dir=checkpoint)
+        with self.assertRaisesRegex(ValueError, 'R is'):
+            bootstrap_confidence_interval(DATA, tenth_percentile, **{**RUN, 'R': 3000}, checkpoint_dir=checkpoint)
+        with self.assertRaisesRegex(ValueError, 'data_hash'):
+            bootstrap_confidence_interval(DATA + 1, tenth_percentile, **RUN, checkpoint_dir=checkpoint)
+        with self.assertRaisesRegex(ValueError, 'statistic'):
+            bootstrap_confidence_interval(DATA, ninetieth_percentile, **RUN, checkpoint_dir=checkpoint)
+
+    def test_edited_statistic_is_refused(self):
+        checkpoint = self.path('run')
+        namespace = {'np': np}
+        exec('def statistic(values):\n    return np.percentile(values, 10)', namespace)
+        bootstrap_confidence_interval(DATA, namespace['statistic'], **RUN, checkpoint_dir=checkpoint)
+        exec('def statistic(values):\n    return np.percentile(values, 90)', namespace)
+        with self.assertRaisesRegex(ValueError, 'statistic_hash'):
+            bootstrap_confidence_interval(DATA, namespace['statistic'], **RUN, checkpoint_dir=checkpoint)
+
+    def test_lambdas_need_a_run_id(self):
+        lower, upper = (lambda values: np.percentile(values, 10)), (lambda values: np.percentile(values, 90))
+        with self.assertRaisesRegex(ValueError, 'run_id'):
+            bootstrap_confidence_interval(DATA, lower, **RUN, checkpoint_dir=self.path('run'))
+        with self.assertRaisesRegex(ValueError, 'run_id'):
+            bootstrap_confidence_interval(DATA, lower, **RUN, checkpoint_dir=self.path('shard'), shard=(0, 2))
+        _, lower_interval = bootstrap_confidence_interval(DATA, lower, **RUN, checkpoint_dir=self.path('run'),
+                                                          run_id='p10')
+        with self.assertRaisesRegex(ValueError, 'run_id'):
+            bootstrap_confidence_interval(DATA, upper, **RUN, checkpoint_dir=self.path('run'), run_id='p90')
+        _, upper_interval = bootstrap_confidence_interval(DATA, upper, **RUN)
+        self.assertGreater(upper_interval[0], lower_interval[1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+'''
+Tests of the bootstrap confidence intervals: worker-independent seeding, adaptive R, compact mode, the Poisson
+bootstrap, BCa and bootstrap-t intervals, and several statistics from one set of resamples.
+'''
+
+import unittest
+
+import numpy as np
+from scipy.stats import bootstrap
+
+from sampling_distributions import (bootstrap_confidence_interval, bootstrap_confidence_intervals,
+                                    bootstrap_resample_and_store_samples, poisson_bootstrap_confidence_interval,
+                                    poisson_bootstrap_means, quantile, simulate_sampling)
+from sampling_distributions.confidence_intervals import (_endpoint_monte_carlo_error, _jackknife_values,
+                                                         _leave_one_out_moments)
+
+DATA = np.random.default_rng(0).normal(170, 10, 2000)
+SKEWED = np.random.default_rng(7).exponential(1.0, 80)
+
+class ParallelBootstrapTest(unittest.TestCase):
+    def test_seeded_results_do_not_depend_on_workers_or_executor(self):
+        for method in ('percentile', 'studentized'):
+            expected, interval = bootstrap_confidence_interval(DATA[:500], np.mean, 2000, 95, random_state=5,
+                                                               chunk_size=250, method=method)
+            for executor in ('thread', 'process'):
+                for n_jobs in (1, 3, 4):
+                    with self.subTest(method=method, executor=executor, n_jobs=n_jobs):
+                        statistics, same = bootstrap_confidence_interval(
+                            DATA[:500], np.mean, 2000, 95, random_state=5, chunk_size=250, method=method,
+                            n_jobs=n_jobs, executor=executor)
+                        np.testing.assert_array_equal(statistics, expected)
+                        np.testing.assert_array_equal(same, interval)
+
+class AdaptiveBootstrapTest(unittest.TestCase):
+    def test_tolerance_stops_at_the_first_chunk_boundary_that_reaches_it(self):
+        tolerance = 0.01
+        statistics, interval = bootstrap_confidence_interval(DATA, np.mean, 100_000, 95, random_state=6,
+                                                             chunk_size=500, tolerance=tolerance)
+        used = len(statistics)
+        self.assertEqual(used % 500, 0)
+        self.assertLess(used, 100_000)
+        self.assertLessEqual(_endpoint_monte_carlo_error(statistics, 95), tolerance)
+        # At every earlier boundary (from the second chunk on) the endpoints were not yet stable enough
+        for boundary in range(1000, used, 500):
+            self.assertGreater(_endpoint_monte_carlo_error(statistics[:boundary], 95), tolerance)
+        # The stopped run is a prefix of the full run, and does not depend on the number of workers
+        full, _ = bootstrap_confidence_interval(DATA, np.mean, used + 1000, 95, random_state=6, chunk_size=500)
+        np.testing.assert_array_equal(statistics, full[:used])
+        threaded, same = bootstrap_confidence_interval(DATA, np.mean, 100_000, 95, random_state=6, chunk_size=500,
+                                                       tolerance=tolerance, n_jobs=3, executor='thread')
+        np.testing.assert_array_equal(threaded, statistics)
+        np.testing.assert_array_equal(same, interval)
+
+    def test_time_budget_bounds_the_run(self):
+        statistics, _ = bootstrap_confidence_interval(DATA, np.mean, 10 ** 7, 95, random_state=6, chunk_size=1000,
+                                                      time_budget=0.2)
+        self.assertEqual(len(statistics) % 1000, 0)
+        self.assertLess(len(statistics), 10 ** 7)
+
+class CompactModeTest(unittest.TestCase):
+    def test_compact_resamples_drift_only_by_float32_rounding(self):
+        # The same indices are drawn in both modes; gathering float32 values leaves relative errors of about 6e-8
+        for statistic in (np.mean, np.std, np.median):
+            with self.subTest(statistic=statistic.__name__):
+                default, interval = bootstrap_confidence_interval(DATA, statistic, 3000, 95, random_state=7)
+                compact, compact_interval = bootstrap_confidence_interval(DATA, statistic, 3000, 95, random_state=7,
+                                                                          compact=True)
+                np.testing.assert_allclose(compact, default, rtol=2e-7)
+                np.testing.assert_allclose(compact_interval, interval, rtol=2e-7)
+        _, default_means = bootstrap_resample_and_store_samples(DATA, 200, len(DATA), random_state=7)
+        samples, compact_means = bootstrap_resample_and_store_samples(DATA, 200, len(DATA), random_state=7,
+                                                                      store_samples=True, compact=True)
+        self.assertEqual(samples.dtype, np.float32)
+        np.testing.assert_allclose(compact_means, default_means, rtol=2e-7)
+
+    def test_compact_standard_error_is_within_monte_carlo_error(self):
+        num_samples = 20_000
+        _, default = simulate_sampling(0, 1, 50, num_samples, return_means=False, random_state=8)
+        _, compact = simulate_sampling(0, 1, 50, num_samples, return_means=False, random_state=8, compact=True)
+        # Different streams: the two estimates differ by Monte Carlo error, relative 1 / sqrt(num_samples - 1)
+        self.assertLess(abs(compact - default) / default, 4 / np.sqrt(num_samples - 1))
+
+class PoissonBootstrapTest(unittest.TestCase):
+    def test_intervals_agree_with_the_multinomial_bootstrap(self):
+        standard_error = DATA.std() / np.sqrt(len(DATA))
+        for statistic in (np.mean, np.std):
+            with self.subTest(statistic=statistic.__name__):
+                _, multinomial = bootstrap_confidence_interval(DATA, statistic, 4000, 95, random_state=1)
+                statistics, poisson = poisson_bootstrap_confidence_interval(DATA, statistic, 4000, 95, random_state=2)
+                self.assertEqual(len(statistics), 4000)
+                # Both intervals estimate the same endpoints, up to Monte Carlo error
+                np.testing.assert_allclose(poisson, multinomial, atol=0.2 * standard_error)
+        _, multinomial = bootstrap_confidence_interval(DATA, np.sum, 4000, 95, random_state=1)
+        _, poisson = poisson_bootstrap_confidence_interval(DATA, np.sum, 4000, 95, random_state=2)
+        # The Poisson sum also varies with the number of observations drawn, so its interval is wider
+        self.assertLess(poisson[0], multinomial[0])
+        self.assertGreater(poisson[1], multinomial[1])
+
+    # The weights are the same draws; only the summation order of the weighted sums may differ
+    def test_results_do_not_depend_on_the_memory_budget_or_chunking(self):
+        expected, interval = poisson_bootstrap_confidence_interval(DATA, np.var, 2500, 90, random_state=3)
+        chunks = [DATA[start:start + 333] for start in range(0, len(DATA), 333)]
+        for max_memory_bytes in (1, 100_000, 10 ** 9):
+            with self.subTest(max_memory_bytes=max_memory_bytes):
+                statistics, same = poisson_bootstrap_confidence_interval(DATA, np.var, 2500, 90, random_state=3,
+                                                                         max_memory_bytes=max_memory_bytes)
+                np.testing.assert_allclose(statistics, expected, rtol=1e-12)
+                np.testing.assert_allclose(same, interval, rtol=1e-12)
+        statistics, _ = poisson_bootstrap_confidence_interval(iter(chunks), np.var, 2500, 90, random_state=3,
+                                                              max_memory_bytes=50_000)
+        np.testing.assert_allclose(statistics, expected, rtol=1e-12)
+        np.testing.assert_allclose(poisson_bootstrap_means(DATA, 2500, 1, random_state=3),
+                                   poisson_bootstrap_means(DATA, 2500, random_state=3), rtol=1e-12)
+
+    def test_empty_replicates_count_as_zero_sums_and_are_dropped_for_means(self):
+        # With 3 observations a replicate draws nothing with probability exp(-3), about 5%
+        tiny = np.array([1.0, 2.0, 4.0])
+        sums, _ = poisson_bootstrap_confidence_interval(tiny, np.sum, 4000, 95, random_state=4)
+        means, _ = poisson_bootstrap_confidence_interval(tiny, np.mean, 4000, 95, random_state=4)
+        self.assertEqual(len(sums), 4000)
+        empty = np.count_nonzero(sums == 0)
+        self.assertAlmostEqual(empty / 4000, np.exp(-3), delta=0.015)
+        self.assertEqual(len(means), 4000 - empty)
+
+class SecondOrderIntervalTest(unittest.TestCase):
+    def test_closed_form_leave_one_out_values_match_brute_force(self):
+        values = np.random.default_rng(1).lognormal(5, 1, 300)
+        for name, statistic in (('mean', np.mean), ('sum', np.sum), ('var', np.var), ('std', np.std)):
+            with self.subTest(statistic=name):
+                brute_force = np.array([statistic(np.delete(values, i)) for i in range(len(values))])
+                np.testing.assert_allclose(_leave_one_out_moments(values, name), brute_force, rtol=1e-10)
+                # Along the last axis of a block of resamples too
+                block = np.stack([values, values[::-1]])
+                np.testing.assert_allclose(_leave_one_out_moments(block, name)[1], brute_force[::-1], rtol=1e-10)
+        # Batched statistics get their jackknife from blocks of leave-one-out rows
+        for statistic in (np.median, quantile(0.9)):
+            brute_force = np.array([statistic(np.delete(values, i)) for i in range(len(values))])
+            np.testing.assert_array_equal(_jackknife_values(values, statistic, max_memory_bytes=10_000), brute_force)
+
+    def test_bca_matches_scipy_on_a_skewed_sample(self):
+        standard_error = SKEWED.std() / np.sqrt(len(SKEWED))
+        for statistic in (np.mean, np.std):
+            with self.subTest(statistic=statistic.__name__):
+                _, interval = bootstrap_confidence_interval(SKEWED, statistic, 20_000, 95, method='bca',
+                                                            random_state=1)
+                expected = bootstrap((SKEWED,), statistic, n_resamples=20_000, method='BCa',
+                                     rng=2).confidence_interval
+                # Both are Monte Carlo estimates of the same endpoints
+                np.testing.assert_allclose(interval, [expected.low, expected.high], atol=0.1 * standard_error)
+                # On right-skewed data BCa shifts the percentile interval to the right
+                _, percentile = bootstrap_confidence_interval(SKEWED, statistic, 20_000, 95, random_state=1)
+                self.assertGreater(interval[1], percentile[1])
+
+    def test_studentized_interval_of_the_mean(self):
+        _, interval = bootstrap_confidence_interval(SKEWED, np.mean, 4000, 95, method='studentized', random_state=3)
+        _, bca = bootstrap_confidence_interval(SKEWED, np.mean, 4000, 95, method='bca', random_state=3)
+        self.assertTrue(interval[0] < SKEWED.mean() < interval[1])
+        np.testing.assert_allclose(interval, bca, atol=0.5 * SKEWED.std() / np.sqrt(len(SKEWED)))
+
+    def test_studentized_refuses_order_statistics(self):
+        for statistic in (np.median, np.min, np.max, quantile(0.25)):
+            with self.subTest(statistic=statistic):
+                with self.assertRaisesRegex(ValueError, "use method='bca'"):
+                    bootstrap_confidence_interval(SKEWED, statistic, 100, 95, method='studentized', random_state=0)
+
+class MultiStatisticTest(unittest.TestCase):
+    def test_shared_resamples_give_exactly_the_single_statistic_results(self):
+        values = np.random.default_rng(1).lognormal(0, 1, 301)
+        statistics = {'mean': np.mean, 'median': np.median, 'std': np.std, 'var': np.var, 'sum': np.sum,
+                      'min': np.min, 'max': np.max, 'p10': quantile(0.1), 'p975': quantile(0.975)}
+        for method in ('percentile', 'bca'):
+            all_statistics, intervals = bootstrap_confidence_intervals(values, statistics, 2500, [90, 95],
+                                                                       random_state=3, chunk_size=700, method=method)
+            for name, statistic in statistics.items():
+                for level in (90, 95):
+                    with self.subTest(method=method, statistic=name, level=level):
+                        single_statistics, single_interval = bootstrap_confidence_interval(
+                            values, statistic, 2500, level, random_state=3, chunk_size=700, method=method)
+                        np.testing.assert_array_equal(all_statistics[name], single_statistics)
+                        np.testing.assert_array_equal(intervals[name][level], single_interval)
+
+    def test_statistics_need_distinct_names_and_scalar_quantiles(self):
+        with self.assertRaisesRegex(ValueError, 'distinct names'):
+            bootstrap_confidence_intervals(DATA, [quantile(0.1), quantile(0.1)], 100)
+        with self.assertRaisesRegex(ValueError, 'one quantile'):
+            bootstrap_confidence_intervals(DATA, {'tails': quantile([0.1, 0.9])}, 100)
+
+if __name__ == '__main__':
+    unittest.main()
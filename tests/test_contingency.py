@@ -0,0 +1,40 @@
+'''
+Tests of the batched chi-square independence test against scipy, including tables with zero margins.
+'''
+
+import unittest
+
+import numpy as np
+from scipy.stats import chi2_contingency
+
+from sampling_distributions import chi2_independence_test
+
+TABLES = np.array([[[12, 5, 7], [3, 9, 4]],
+                   [[0, 0, 0], [6, 2, 9]],
+                   [[4, 0, 8], [1, 0, 3]],
+                   [[20, 11, 2], [8, 14, 6]]])
+
+class ChiSquareIndependenceTest(unittest.TestCase):
+    def test_asymptotic_results_match_scipy(self):
+        statistics, p_values, dof, expected = chi2_independence_test(TABLES)
+        self.assertEqual(dof, 2)
+        for i in (0, 3):
+            statistic, p_value, _, scipy_expected = chi2_contingency(TABLES[i])
+            self.assertAlmostEqual(statistics[i], statistic)
+            self.assertAlmostEqual(p_values[i], p_value)
+            np.testing.assert_allclose(expected[i], scipy_expected)
+
+    def test_zero_margins_give_nan_p_values(self):
+        for monte_carlo in (None, 999):
+            statistics, p_values, _, _ = chi2_independence_test(TABLES, monte_carlo=monte_carlo, random_state=0)
+            np.testing.assert_array_equal(np.isnan(statistics), [False, True, True, False])
+            np.testing.assert_array_equal(np.isnan(p_values), [False, True, True, False])
+            self.assertTrue(np.all((p_values[[0, 3]] > 0) & (p_values[[0, 3]] <= 1)))
+
+    def test_monte_carlo_p_values_are_close_to_asymptotic_ones(self):
+        _, asymptotic, _, _ = chi2_independence_test(TABLES[3])
+        _, simulated, _, _ = chi2_independence_test(TABLES[3], monte_carlo=20_000, random_state=1)
+        self.assertAlmostEqual(simulated, asymptotic, delta=0.01)
+
+if __name__ == '__main__':
+    unittest.main()
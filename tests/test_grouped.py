@@ -0,0 +1,70 @@
+'''
+Tests of the grouped bootstrap: per-group intervals against separate calls, offsets and labels, edge cases.
+'''
+
+import unittest
+
+import numpy as np
+
+from sampling_distributions import bootstrap_confidence_interval, grouped_bootstrap_confidence_interval, quantile
+
+RNG = np.random.default_rng(9)
+SIZES = np.array([150, 400, 60, 250])
+VALUES = np.concatenate([RNG.gamma(2.0 + g, 3.0, size) for g, size in enumerate(SIZES)])
+OFFSETS = np.concatenate([[0], np.cumsum(SIZES)[:-1]])
+LABELS = np.repeat(np.array(['a', 'b', 'c', 'd']), SIZES)
+
+class GroupedBootstrapTest(unittest.TestCase):
+    def test_each_group_matches_a_separate_call(self):
+        R = 6000
+        for statistic in (np.mean, np.std, np.sum):
+            with self.subTest(statistic=statistic.__name__):
+                table = grouped_bootstrap_confidence_interval(VALUES, statistic, R, 90, offsets=OFFSETS,
+                                                              random_state=1)
+                for row, start, size in zip(table, OFFSETS, SIZES):
+                    group = VALUES[start:start + size]
+                    replicates, interval = bootstrap_confidence_interval(group, statistic, R, 90, random_state=2)
+                    self.assertEqual(row['size'], size)
+                    self.assertAlmostEqual(row['estimate'], statistic(group), delta=1e-9 * abs(statistic(group)))
+                    # Different draws of the same bootstrap distribution: endpoints agree up to Monte Carlo error
+                    np.testing.assert_allclose([row['lower'], row['upper']], interval, atol=0.1 * replicates.std())
+
+    def test_offsets_and_labels_give_the_same_table(self):
+        by_offsets = grouped_bootstrap_confidence_interval(VALUES, quantile(0.25), 500, 95, offsets=OFFSETS,
+                                                           random_state=3)
+        # Labelled values may come in any order: they are laid out by group, then by value, either way
+        shuffled = np.random.default_rng(0).permutation(len(VALUES))
+        by_labels = grouped_bootstrap_confidence_interval(VALUES[shuffled], quantile(0.25), 500, 95,
+                                                          groups=LABELS[shuffled], random_state=3)
+        np.testing.assert_array_equal(by_labels['group'], ['a', 'b', 'c', 'd'])
+        for field in ('size', 'estimate', 'lower', 'upper'):
+            np.testing.assert_array_equal(by_labels[field], by_offsets[field])
+
+    def test_results_do_not_depend_on_the_memory_budget(self):
+        expected = grouped_bootstrap_confidence_interval(VALUES, np.var, 300, 95, groups=LABELS, random_state=4)
+        same = grouped_bootstrap_confidence_interval(VALUES, np.var, 300, 95, groups=LABELS, random_state=4,
+                                                     max_memory_bytes=1)
+        np.testing.assert_array_equal(same, expected)
+
+    def test_single_element_groups_have_degenerate_intervals(self):
+        table = grouped_bootstrap_confidence_interval([5.0, 1.0, 2.0, 3.0], np.mean, 200, 95, groups=[0, 1, 1, 1],
+                                                      random_state=5)
+        self.assertEqual(tuple(table[0])[1:], (1, 5.0, 5.0, 5.0))
+        self.assertLess(table[1]['lower'], table[1]['upper'])
+        table = grouped_bootstrap_confidence_interval([5.0, 1.0, 2.0], np.std, 200, 95, offsets=[0, 1],
+                                                      random_state=5)
+        self.assertEqual(tuple(table[0])[2:], (0.0, 0.0, 0.0))
+
+    def test_empty_groups_and_bad_arguments_are_refused(self):
+        for values, options in (([], {'groups': []}), ([], {'offsets': [0]}),
+                                ([1.0, 2.0, 3.0], {'offsets': [0, 1, 1]}), ([1.0, 2.0, 3.0], {'offsets': [0, 3]}),
+                                ([1.0, 2.0, 3.0], {'offsets': [1, 2]}), ([1.0, 2.0, 3.0], {'groups': [0, 1]}),
+                                ([1.0, 2.0, 3.0], {}), ([1.0, 2.0, 3.0], {'groups': [0, 0, 1], 'offsets': [0, 2]})):
+            with self.subTest(values=values, options=options):
+                with self.assertRaises(ValueError):
+                    grouped_bootstrap_confidence_interval(values, np.mean, 10, 95, **options)
+        with self.assertRaisesRegex(ValueError, 'statistic_func'):
+            grouped_bootstrap_confidence_interval([1.0, 2.0], np.max, 10, 95, groups=[0, 0])
+
+if __name__ == '__main__':
+    unittest.main()
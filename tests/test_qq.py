@@ -0,0 +1,43 @@
+'''
+Tests of the t-digest QuantileSketch: extreme-quantile accuracy and merging across shards.
+'''
+
+import unittest
+
+import numpy as np
+
+from sampling_distributions import QuantileSketch, build_quantile_sketch
+
+RNG = np.random.default_rng(10)
+VALUES = RNG.lognormal(0.0, 1.0, 400_000)
+LEVELS = np.array([0.001, 0.01, 0.1, 0.5, 0.9, 0.99, 0.999])
+
+class QuantileSketchTest(unittest.TestCase):
+    def test_extreme_quantiles_match_numpy(self):
+        sketch = build_quantile_sketch(VALUES, chunk_size=50_000)
+        self.assertEqual(sketch.count, len(VALUES))
+        # The k1 scale keeps tail centroids small, so the 0.1% and 99.9% quantiles stay within 1%
+        np.testing.assert_allclose(sketch.quantile(LEVELS), np.quantile(VALUES, LEVELS), rtol=0.01)
+        self.assertEqual(sketch.quantile(0.0), VALUES.min())
+        self.assertEqual(sketch.quantile(1.0), VALUES.max())
+
+    def test_merge_is_associative(self):
+        shards = np.array_split(VALUES, 3)
+        a, b, c = (QuantileSketch().update(shard) for shard in shards)
+        left = QuantileSketch().merge(QuantileSketch().update(shards[0]).merge(b)).merge(c)
+        right = QuantileSketch().merge(a).merge(QuantileSketch().update(shards[1]).merge(c))
+        self.assertEqual(left.count, right.count)
+        self.assertEqual((left.min, left.max), (right.min, right.max))
+        # Groupings differ, so centroids differ; quantiles agree with each other and with the data
+        np.testing.assert_allclose(left.quantile(LEVELS), right.quantile(LEVELS), rtol=0.01)
+        np.testing.assert_allclose(left.quantile(LEVELS), np.quantile(VALUES, LEVELS), rtol=0.01)
+
+    def test_nan_and_empty(self):
+        sketch = QuantileSketch()
+        self.assertTrue(np.isnan(sketch.quantile(0.5)))
+        sketch.update([np.nan, 1.0, np.nan, 3.0])
+        self.assertEqual(sketch.count, 2)
+        self.assertEqual(sketch.quantile(0.5), 2.0)
+
+if __name__ == '__main__':
+    unittest.main()
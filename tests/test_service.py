@@ -0,0 +1,107 @@
+'''
+Localhost tests of the asyncio bootstrap service: coalescing, seeded equality, error isolation, limits, backpressure,
+close.
+'''
+
+import asyncio
+import unittest
+
+import numpy as np
+
+from sampling_distributions import bootstrap_confidence_interval, simulate_standard_error_curve
+from sampling_distributions.service import BootstrapService, request_json
+
+DATA = np.random.default_rng(1).normal(170, 10, 200).tolist()
+
+class ServiceTest(unittest.IsolatedAsyncioTestCase):
+    async def start(self, **options):
+        self.service = BootstrapService(max_workers=2, executor='thread', **options)
+        await self.service.start(port=0)
+        self.addAsyncCleanup(self.service.close)
+
+    def post(self, path, payload):
+        return request_json('POST', path, payload, port=self.service.port)
+
+    async def test_concurrent_requests_are_coalesced_and_match_solo_calls(self):
+        await self.start(batch_window=0.05)
+        requests = [{'data': DATA, 'statistics': [name], 'R': 500, 'confidence_levels': [90, 95], 'random_state': 7}
+                    for name in ('mean', 'median')]
+        responses = await asyncio.gather(*(self.post('/bootstrap', request) for request in requests))
+        for status, body in responses:
+            self.assertEqual(status, 200)
+            self.assertEqual(body['batch_size'], 2)
+        _, median_interval = bootstrap_confidence_interval(np.array(DATA), np.median, 500, 95, random_state=7)
+        np.testing.assert_array_equal(responses[1][1]['intervals']['median']['95'], median_interval)
+
+        standard_errors = await asyncio.gather(*(self.post('/standard-error', {
+            'population_mean': 170, 'population_std': std, 'sample_size': 30, 'num_samples': 2000,
+            'random_state': 3}) for std in (5, 10)))
+        self.assertEqual([body['batch_size'] for _, body in standard_errors], [2, 2])
+        _, solo = simulate_standard_error_curve(170, 10, 30, 2000, random_state=3)
+        self.assertEqual(standard_errors[1][1]['standard_error'], float(solo))
+
+    async def test_invalid_request_does_not_fail_its_batch(self):
+        await self.start(batch_window=0.05)
+        valid = {'data': DATA, 'statistic': 'mean', 'R': 200, 'random_state': 1}
+        (good_status, good), (bad_status, bad), (zero_status, _) = await asyncio.gather(
+            self.post('/bootstrap', valid), self.post('/bootstrap', {**valid, 'confidence_levels': [150]}),
+            self.post('/bootstrap', {**valid, 'R': 0}))
+        self.assertEqual((good_status, bad_status, zero_status), (200, 400, 400))
+        self.assertIn('confidence levels', bad['error'])
+        self.assertIn('95', good['intervals']['mean'])
+        status, _ = await self.post('/standard-error', {'population_mean': 0, 'population_std': 1,
+                                                        'sample_size': 10, 'num_samples': 0})
+        self.assertEqual(status, 400)
+        status, _ = await self.post('/bootstrap', {'data': [], 'R': 10})
+        self.assertEqual(status, 400)
+
+    async def test_oversized_and_mistyped_requests_are_refused(self):
+        await self.start(batch_window=0.01, max_work=10 ** 6)
+        standard_error = {'population_mean': 0, 'population_std': 1, 'sample_size': 10, 'num_samples': 100}
+        for overrides in ({'num_samples': 1e30}, {'num_samples': 100.0}, {'sample_size': 10 ** 30},
+                          {'random_state': 1.0}):
+            status, _ = await self.post('/standard-error', {**standard_error, **overrides})
+            self.assertEqual(status, 400, overrides)
+        status, body = await self.post('/standard-error', {**standard_error, 'num_samples': 10 ** 6})
+        self.assertEqual(status, 400)
+        self.assertIn('request too large', body['error'])
+        bootstrap = {'data': DATA, 'R': 100}
+        for overrides in ({'R': 10 ** 5}, {'R': 1e3}, {'statistics': 'mean'}, {'statistics': ['mean', 1]},
+                          {'statistic': ['mean']}, {'confidence_levels': '95'}, {'data': DATA * 40, 'method': 'bca'}):
+            status, _ = await self.post('/bootstrap', {**bootstrap, **overrides})
+            self.assertEqual(status, 400, overrides)
+        status, _ = await self.post('/bootstrap', {**bootstrap, 'statistic': 'median'})
+        self.assertEqual(status, 200)
+
+    async def test_truncated_body_gets_400(self):
+        await self.start()
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.service.port)
+        writer.write(b'POST /bootstrap HTTP/1.1\r\nContent-Length: 100\r\n\r\n{"data": [1')
+        writer.write_eof()
+        response = await reader.read()
+        writer.close()
+        self.assertTrue(response.startswith(b'HTTP/1.1 400 '), response)
+        self.assertIn(b'request body ended after 11 of 100 bytes', response)
+
+    async def test_requests_beyond_max_pending_get_503(self):
+        await self.start(batch_window=0.2, max_pending=2)
+        request = {'population_mean': 0, 'population_std': 1, 'sample_size': 10, 'num_samples': 100}
+        statuses = [status for status, _ in await asyncio.gather(*(self.post('/standard-error', request)
+                                                                  for _ in range(5)))]
+        self.assertEqual(sorted(statuses), [200, 200, 503, 503, 503])
+        _, stats = await request_json('GET', '/stats', port=self.service.port)
+        self.assertEqual(stats['rejected'], 3)
+
+    async def test_close_answers_batches_still_in_their_window(self):
+        await self.start(batch_window=30)
+        response = asyncio.ensure_future(self.post('/standard-error', {
+            'population_mean': 0, 'population_std': 1, 'sample_size': 10, 'num_samples': 100, 'random_state': 2}))
+        while not self.service._pending:
+            await asyncio.sleep(0.01)
+        await asyncio.wait_for(self.service.close(), 5)
+        status, body = await asyncio.wait_for(response, 5)
+        self.assertEqual((status, body['batch_size']), (200, 1))
+        self.assertEqual((self.service._timers, self.service._batch_tasks), ({}, set()))
+
+if __name__ == '__main__':
+    unittest.main()
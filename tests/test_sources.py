@@ -0,0 +1,93 @@
+'''
+Tests of the file sources: memmap, raw binary and CSV inputs against in-memory arrays, and the coalesced gather.
+'''
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from sampling_distributions import (CSVColumn, bootstrap_confidence_interval, open_source,
+                                    poisson_bootstrap_confidence_interval, sample_standard_error, to_random_access)
+from sampling_distributions import sources
+from sampling_distributions.sources import gather
+
+DATA = np.random.default_rng(2).normal(170, 10, 5000)
+
+class FileSourceTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.paths = {suffix: os.path.join(directory.name, f'heights{suffix}') for suffix in ('.npy', '.bin', '.csv')}
+        np.save(self.paths['.npy'], DATA)
+        DATA.tofile(self.paths['.bin'])
+        # 17 significant digits, so the CSV round-trips exactly
+        np.savetxt(self.paths['.csv'], np.column_stack([np.arange(len(DATA)), DATA]), delimiter=',', fmt='%.17g',
+                   header='id,height', comments='')
+
+    def sources(self):
+        return {'npy': self.paths['.npy'], 'bin': self.paths['.bin'],
+                'memmap': np.load(self.paths['.npy'], mmap_mode='r'),
+                'csv': CSVColumn(self.paths['.csv'], column=1, chunk_rows=777)}
+
+    def test_suffixes_open_the_right_reader(self):
+        self.assertIsInstance(open_source(self.paths['.npy']), np.memmap)
+        self.assertIsInstance(open_source(self.paths['.bin']), np.memmap)
+        self.assertIsInstance(open_source(self.paths['.csv']), CSVColumn)
+        with self.assertRaisesRegex(ValueError, 'cannot tell how to read'):
+            open_source('heights.parquet')
+        # The plain .csv reader takes the first column; a header row is skipped
+        np.testing.assert_array_equal(to_random_access(self.paths['.csv']), np.arange(len(DATA)))
+
+    def test_file_sources_match_the_in_memory_array(self):
+        expected_statistics, expected_interval = bootstrap_confidence_interval(DATA, np.median, 300, 95,
+                                                                               random_state=3)
+        expected_mean, expected_error = sample_standard_error(DATA, max_memory_bytes=8000)
+        _, expected_poisson = poisson_bootstrap_confidence_interval(DATA, np.mean, 200, 95, random_state=4)
+        for name, source in self.sources().items():
+            with self.subTest(source=name):
+                np.testing.assert_array_equal(to_random_access(source), DATA)
+                statistics, interval = bootstrap_confidence_interval(source, np.median, 300, 95, random_state=3)
+                np.testing.assert_array_equal(statistics, expected_statistics)
+                np.testing.assert_array_equal(interval, expected_interval)
+                mean, error = sample_standard_error(source, max_memory_bytes=8000)
+                self.assertAlmostEqual(mean, expected_mean, places=9)
+                self.assertAlmostEqual(error, expected_error, places=12)
+                _, poisson = poisson_bootstrap_confidence_interval(source, np.mean, 200, 95, random_state=4)
+                np.testing.assert_array_equal(poisson, expected_poisson)
+
+class CoalescedGatherTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'values.bin')
+        np.arange(100_000, dtype=np.float64).tofile(path)
+        self.data = np.memmap(path, dtype=np.float64, mode='r')
+        self.addCleanup(lambda: setattr(self, 'data', None))
+        # Coalesce even this small map
+        patcher = mock.patch.object(sources, 'COALESCE_MIN_BYTES', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unsorted_and_duplicate_indices_match_fancy_indexing(self):
+        rng = np.random.default_rng(5)
+        cases = {'unsorted': rng.permutation(len(self.data))[:3000],
+                 'duplicates': rng.integers(0, 50, size=(40, 100)),
+                 'dense and sparse blocks': np.concatenate([rng.integers(0, 1000, 5000),
+                                                            rng.integers(0, len(self.data), 20)]),
+                 'narrow dtype': rng.integers(0, 2 ** 16, size=(3, 500)).astype(np.uint16),
+                 'descending': np.arange(len(self.data))[::-7]}
+        for name, indices in cases.items():
+            with self.subTest(case=name):
+                for block_bytes in (8 * 64, 8 * 4096, sources.DEFAULT_GATHER_BLOCK_BYTES):
+                    values = gather(self.data, indices, block_bytes=block_bytes)
+                    self.assertEqual(values.shape, indices.shape)
+                    np.testing.assert_array_equal(values, np.asarray(self.data)[indices])
+
+    def test_empty_indices(self):
+        self.assertEqual(gather(self.data, np.zeros((2, 0), dtype=np.int64)).shape, (2, 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+'''
+Tests of the distribution tables: interpolation error against scipy, grid cache eviction and on-disk rebuilds.
+'''
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from scipy import stats
+
+from sampling_distributions import tables
+from sampling_distributions.tables import distribution_table, evaluate_grid
+
+# One table per supported distribution and function, with the ranges a user would typically ask for
+TABLE_RANGES = {('t', 'pdf'): ((1, 200), (-8, 8)), ('t', 'cdf'): ((1, 200), (-8, 8)),
+                ('t', 'ppf'): ((1, 200), (0.001, 0.999)), ('chi2', 'pdf'): ((1, 100), (0.05, 150)),
+                ('chi2', 'cdf'): ((1, 100), (0.05, 150)), ('chi2', 'ppf'): ((1, 100), (0.001, 0.999))}
+
+class InterpolationErrorTest(unittest.TestCase):
+    def test_random_points_are_within_tolerance_of_scipy(self):
+        rng = np.random.default_rng(0)
+        tolerance = 1e-5
+        for (dist, func), (df_range, x_range) in TABLE_RANGES.items():
+            with self.subTest(dist=dist, func=func):
+                table = distribution_table(dist, func, df_range, x_range, tolerance, cache_dir=False)
+                self.assertLessEqual(table.error_bound * tables.TABLE_SAFETY_FACTOR, tolerance)
+                dfs = np.exp(rng.uniform(*np.log(df_range), 20_000))
+                x = rng.uniform(*x_range, 20_000)
+                exact = getattr(getattr(stats, dist), func)(x, dfs)
+                # Absolute error for values up to 1 in magnitude, relative above, as the tables promise
+                error = np.abs(table(dfs, x) - exact) / np.maximum(1.0, np.abs(exact))
+                self.assertLessEqual(error.max(), tolerance)
+
+    def test_points_outside_the_table_are_exact(self):
+        table = distribution_table('t', 'cdf', (1, 200), (-8, 8), cache_dir=False)
+        np.testing.assert_array_equal(table([0.5, 500, 10], [0, 1, 20]), stats.t.cdf([0, 1, 20], [0.5, 500, 10]))
+
+class GridCacheTest(unittest.TestCase):
+    def setUp(self):
+        with tables._grid_cache_lock:
+            tables._grid_cache.clear()
+            tables._grid_cache_bytes = 0
+
+    tearDown = setUp
+
+    def test_grid_cache_stays_within_its_byte_bound(self):
+        dfs = np.arange(1, 11, dtype=np.float64)
+        # Each grid is 10 x 100 values plus its 110 input values: 8880 bytes
+        with mock.patch.object(tables, 'GRID_CACHE_BYTES', 20_000):
+            grids = [evaluate_grid('t', 'pdf', dfs, np.linspace(-k, k, 100)) for k in (1, 2, 3)]
+            self.assertEqual(len(tables._grid_cache), 2)
+            self.assertLessEqual(tables._grid_cache_bytes, 20_000)
+            # The least recently used grid (k = 1) was evicted; the others come back as the same object
+            self.assertIs(evaluate_grid('t', 'pdf', dfs, np.linspace(-3, 3, 100)), grids[2])
+            self.assertIsNot(evaluate_grid('t', 'pdf', dfs, np.linspace(-1, 1, 100)), grids[0])
+            # A grid larger than the bound is returned but not kept
+            large = evaluate_grid('t', 'cdf', dfs, np.linspace(-4, 4, 1000))
+            np.testing.assert_array_equal(large, stats.t.cdf(np.linspace(-4, 4, 1000)[None, :], dfs[:, None]))
+            self.assertEqual(len(tables._grid_cache), 2)
+            self.assertFalse(large.flags.writeable)
+
+class DiskCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        tables._cached_table.cache_clear()
+        self.addCleanup(tables._cached_table.cache_clear)
+
+    def build(self):
+        return distribution_table('t', 'cdf', (1, 30), (-5, 5), cache_dir=self.directory)
+
+    def stored_path(self):
+        (name,) = [name for name in os.listdir(self.directory) if name.endswith('.npz')]
+        return os.path.join(self.directory, name)
+
+    def test_stored_table_is_loaded_instead_of_rebuilt(self):
+        built = self.build()
+        tables._cached_table.cache_clear()
+        with mock.patch.object(tables, '_build_table', side_effect=AssertionError('rebuilt')):
+            loaded = self.build()
+        np.testing.assert_array_equal(loaded.values, built.values)
+        self.assertEqual(loaded.error_bound, built.error_bound)
+
+    def test_corrupt_or_partial_file_is_rebuilt(self):
+        built = self.build()
+        path = self.stored_path()
+        with open(path, 'rb') as f:
+            content = f.read()
+        for damaged in (content[:len(content) // 2], b'not a table', b''):
+            with self.subTest(size=len(damaged)):
+                with open(path, 'wb') as f:
+                    f.write(damaged)
+                tables._cached_table.cache_clear()
+                rebuilt = self.build()
+                np.testing.assert_array_equal(rebuilt.values, built.values)
+                # The damaged file was replaced by a complete one
+                self.assertEqual(os.path.getsize(path), len(content))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+'''
+Tests of the streaming TailSketch: top-k buffer, shard merging and Hill/Pickands against in-memory estimates.
+'''
+
+import unittest
+
+import numpy as np
+
+from sampling_distributions import TailSketch, build_tail_sketch, hill_estimates, pickands_estimates
+
+RNG = np.random.default_rng(14)
+K = 2000
+# Pareto(2) on [1, inf): numpy's pareto is the Lomax form, shifted by one
+VALUES = RNG.pareto(2.0, 500_000) + 1.0
+
+# Function to compute the Hill estimates from the fully sorted sample
+def in_memory_hill(values, k):
+    logs = np.log(np.sort(values)[::-1][:k])
+    j = np.arange(1, k)
+    return 1 / (np.cumsum(logs)[:-1] / j - logs[1:])
+
+# Function to compute the Pickands estimates from the fully sorted sample
+def in_memory_pickands(values, k):
+    ordered = np.sort(values)[::-1]
+    j = np.arange(1, k // 4 + 1)
+    return np.log(2) / np.log((ordered[j - 1] - ordered[2 * j - 1]) / (ordered[2 * j - 1] - ordered[4 * j - 1]))
+
+class TailSketchTest(unittest.TestCase):
+    def test_keeps_the_top_k(self):
+        sketch = build_tail_sketch(VALUES, k=K, chunk_size=30_000)
+        self.assertEqual(sketch.count, len(VALUES))
+        np.testing.assert_array_equal(sketch.order_statistics(), np.sort(VALUES)[::-1][:K])
+
+    def test_estimates_match_in_memory(self):
+        sketch = build_tail_sketch(VALUES, k=K, chunk_size=30_000)
+        j, hill = hill_estimates(sketch)
+        np.testing.assert_array_equal(j, np.arange(1, K))
+        np.testing.assert_allclose(hill, in_memory_hill(VALUES, K), rtol=1e-12)
+        j, pickands = pickands_estimates(sketch)
+        np.testing.assert_array_equal(j, np.arange(1, K // 4 + 1))
+        np.testing.assert_allclose(pickands, in_memory_pickands(VALUES, K), rtol=1e-12)
+        # With the top 1,000 of 500,000 values the Hill estimate is within Monte Carlo error of alpha = 2
+        self.assertAlmostEqual(hill[999], 2.0, delta=0.15)
+
+    def test_merge_matches_a_single_pass(self):
+        shards = np.array_split(VALUES, 4)
+        merged = TailSketch(K)
+        for shard in shards:
+            merged.merge(build_tail_sketch(shard, k=K))
+        single = build_tail_sketch(VALUES, k=K)
+        self.assertEqual(merged.count, single.count)
+        np.testing.assert_array_equal(merged.order_statistics(), single.order_statistics())
+
+    def test_non_finite_values_are_skipped(self):
+        sketch = TailSketch(3).update([1.0, np.inf, np.nan, 5.0, 2.0, 4.0])
+        self.assertEqual(sketch.count, 4)
+        np.testing.assert_array_equal(sketch.order_statistics(), [5.0, 4.0, 2.0])
+
+if __name__ == '__main__':
+    unittest.main()